@@ -1,7 +1,7 @@
-
+import os
+import sys
+import pickle
 import torch
-import torch.nn as nn
-import torch.nn.functional as F
 import cv2
 import numpy as np
 import albumentations as A
@@ -9,104 +9,13 @@ from albumentations.pytorch import ToTensorV2
 from scipy import ndimage
 
 # --- 1. UNet Model Architecture --- #
-# These classes must be defined to load the full model object
-
-class DoubleConv(nn.Module):
-    """ (convolution => BN => ReLU) * 2 """
-    def __init__(self, in_channels, out_channels):
-        super().__init__()
-        self.double_conv = nn.Sequential(
-            nn.Conv2d(in_channels, out_channels, kernel_size=3, padding=1),
-            nn.BatchNorm2d(out_channels),
-            nn.ReLU(inplace=True),
-            nn.Conv2d(out_channels, out_channels, kernel_size=3, padding=1),
-            nn.BatchNorm2d(out_channels),
-            nn.ReLU(inplace=True)
-        )
-
-    def forward(self, x):
-        return self.double_conv(x)
-
-
-class Down(nn.Module):
-    """ Downscaling with maxpool then double conv """
-    def __init__(self, in_channels, out_channels):
-        super().__init__()
-        self.maxpool_conv = nn.Sequential(
-            nn.MaxPool2d(2),
-            DoubleConv(in_channels, out_channels)
-        )
-
-    def forward(self, x):
-        return self.maxpool_conv(x)
-
-
-class Up(nn.Module):
-    """ Upscaling then double conv """
-    def __init__(self, in_channels, out_channels, bilinear=True):
-        super().__init__()
-
-        # if bilinear, use the normal convolutions to reduce the number of channels
-        if bilinear:
-            self.up = nn.Upsample(scale_factor=2, mode='bilinear', align_corners=True)
-        else:
-            self.up = nn.ConvTranspose2d(in_channels // 2, in_channels // 2, kernel_size=2, stride=2)
-
-        self.conv = DoubleConv(in_channels, out_channels)
-
-    def forward(self, x1, x2):
-        x1 = self.up(x1)
-        # input is CHW
-        diffY = x2.size()[2] - x1.size()[2]
-        diffX = x2.size()[3] - x1.size()[3]
-
-        x1 = F.pad(x1, [diffX // 2, diffX - diffX // 2,
-                        diffY // 2, diffY - diffY // 2])
-        x = torch.cat([x2, x1], dim=1)
-        return self.conv(x)
-
-
-class OutConv(nn.Module):
-    def __init__(self, in_channels, out_channels):
-        super().__init__()
-        self.conv = nn.Conv2d(in_channels, out_channels, kernel_size=1)
-
-    def forward(self, x):
-        return self.conv(x)
-
-
-class UNet(nn.Module):
-    def __init__(self, n_channels, n_classes, bilinear=True):
-        super(UNet, self).__init__()
-        self.n_channels = n_channels
-        self.n_classes = n_classes
-        self.bilinear = bilinear
-
-        self.inc = DoubleConv(n_channels, 64)
-        self.down1 = Down(64, 128)
-        self.down2 = Down(128, 256)
-        self.down3 = Down(256, 512)
-        factor = 2 if bilinear else 1
-        self.down4 = Down(512, 1024 // factor)
-        self.up1 = Up(1024, 512 // factor, bilinear)
-        self.up2 = Up(512, 256 // factor, bilinear)
-        self.up3 = Up(256, 128 // factor, bilinear)
-        self.up4 = Up(128, 64, bilinear)
-        self.outc = OutConv(64, n_classes)
-
-    def forward(self, x):
-        x1 = self.inc(x)
-        x2 = self.down1(x1)
-        x3 = self.down2(x2)
-        x4 = self.down3(x3)
-        x5 = self.down4(x4)
-        x = self.up1(x5, x4)
-        x = self.up2(x, x3)
-        x = self.up3(x, x2)
-        x = self.up4(x, x1)
-        logits = self.outc(x)
-        return logits
+# The architecture lives in the repository-level `models` package so that the
+# ONNX export and weights-only checkpoint tooling apply to the model served here
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
+from models.unet_model import UNet
+from models.checkpoint import load_checkpoint, load_legacy_checkpoint
+from models.tta import tta_predict
 
 # --- 2. Preprocessing Steps --- #
 IMAGE_SIZE = 1024  # High resolution for detailed solar panel detection
@@ -123,21 +32,20 @@ inference_transform = A.Compose([
 # --- 3. Model Loading and Inference Function --- #
 
 def load_model(model_path, device='cpu'):
-    """Loads the full UNet model from a .pth file."""
-    # Create a context where the UNet class is available in __main__
-    import __main__
-    __main__.UNet = UNet
-    __main__.DoubleConv = DoubleConv
-    __main__.Down = Down
-    __main__.Up = Up
-    __main__.OutConv = OutConv
-    
-    model = torch.load(model_path, map_location=device, weights_only=False)
-    model.eval() # Set to evaluation mode
+    """Loads the UNet model from a weights-only or legacy .pth checkpoint."""
+    if model_path.endswith('.safetensors'):
+        model = load_checkpoint(model_path, device)
+    else:
+        try:
+            model = load_checkpoint(model_path, device, arch='unet')
+        except (pickle.UnpicklingError, RuntimeError):
+            # Full pickled model object as saved by the training notebook;
+            # convert once with convert_checkpoint.py to skip this path
+            model = load_legacy_checkpoint(model_path, device, arch='unet')
     print(f"Model loaded successfully from {model_path} to {device}.")
     return model
 
-def predict_mask(model, image_path, device='cpu', threshold=0.1):
+def predict_mask(model, image_path, device='cpu', threshold=0.1, tta=None):
     """ 
     Performs inference on a single image and returns the predicted binary mask.
 
@@ -146,6 +54,8 @@ def predict_mask(model, image_path, device='cpu', threshold=0.1):
         image_path (str): Path to the input image.
         device (str): Device to run inference on ('cpu' or 'cuda').
         threshold (float): Threshold to convert probabilities to binary mask.
+        tta (str, optional): Test-time augmentation mode ('flip' or 'd4'); all
+            views run as one batched forward pass and their probabilities are averaged.
 
     Returns:
         numpy.ndarray: The predicted binary mask (0s and 1s) as a NumPy array.
@@ -163,11 +73,14 @@ def predict_mask(model, image_path, device='cpu', threshold=0.1):
     input_tensor = transformed_image.unsqueeze(0).to(device)
 
     # Perform inference
-    with torch.no_grad():
-        output_logits = model(input_tensor)
-    
-    # Apply sigmoid and threshold for binary mask
-    predicted_probabilities = torch.sigmoid(output_logits)
+    if tta:
+        predicted_probabilities, _ = tta_predict(model, input_tensor, tta)
+    else:
+        with torch.no_grad():
+            output_logits = model(input_tensor)
+        predicted_probabilities = torch.sigmoid(output_logits)
+
+    # Threshold for binary mask
     predicted_mask = (predicted_probabilities > threshold).float()
 
     # Convert to numpy array and remove batch/channel dimensions
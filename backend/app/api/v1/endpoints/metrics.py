@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 from app.models.schemas import MetricsResponse
-from app.services.metrics_service import get_system_metrics
+from app.services.metrics_service import get_runtime_metrics, get_system_metrics
 
 router = APIRouter()
 
@@ -10,4 +10,13 @@ async def get_metrics_endpoint():
     Returns detection & quantification metrics (F1, MAE, RMSE) aggregated across dataset and per-state breakdown.
     """
     metrics = await get_system_metrics()
-    return metrics
\ No newline at end of file
+    return metrics
+
+@router.get("/runtime")
+async def get_runtime_metrics_endpoint():
+    """
+    Returns operational counters for this process (scratch space bytes held and
+    swept, result, certificate and chat response cache hits, chat log queue
+    depth and lag).
+    """
+    return await get_runtime_metrics()
@@ -1,9 +1,18 @@
-from fastapi import APIRouter, HTTPException
+import os
+from typing import Optional, Tuple
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, RedirectResponse, Response, StreamingResponse
+from app.core.config import settings
 from app.models.schemas import SiteVerificationResponse
 from app.services.site_service import get_site_verification
+from app.services.artifact_service import ARTIFACT_TYPES, get_artifact
+from app.services.minio_service import minio_service
 
 router = APIRouter()
 
+# Chunk size for streaming partial responses
+RANGE_CHUNK_SIZE = 64 * 1024
+
 @router.get("/{sample_id}", response_model=SiteVerificationResponse)
 async def get_site_verification_endpoint(sample_id: str):
     """
@@ -15,10 +24,97 @@ async def get_site_verification_endpoint(sample_id: str):
     return verification
 
 @router.get("/{sample_id}/artifact/{artifact_type}")
-async def get_site_artifact(sample_id: str, artifact_type: str):
+async def get_site_artifact(sample_id: str, artifact_type: str, request: Request):
     """
     Returns overlay image / certificate / raw images / mask.
     Artifact types: overlay, certificate, raw, mask
+
+    Artifacts are rendered once when the site is analysed and stored by
+    content hash, so the hash doubles as a strong ETag. Supports
+    If-None-Match (304) and single byte ranges (206). Artifacts mirrored to
+    MinIO are answered with a redirect to a presigned URL instead.
     """
-    # TODO: Implement artifact retrieval
-    return {"sample_id": sample_id, "artifact_type": artifact_type, "url": f"/data/outputs/{sample_id}/{artifact_type}"}
\ No newline at end of file
+    if artifact_type not in ARTIFACT_TYPES:
+        raise HTTPException(status_code=400, detail=f"Invalid artifact type. Allowed: {', '.join(ARTIFACT_TYPES)}")
+
+    try:
+        artifact = get_artifact(sample_id, artifact_type)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid sample_id")
+    if not artifact or not os.path.exists(artifact["path"]):
+        raise HTTPException(status_code=404, detail="Artifact not found")
+
+    if settings.MINIO_ARTIFACTS and artifact.get("object_name"):
+        try:
+            url = await minio_service.presigned_url(artifact["object_name"])
+            return RedirectResponse(url, status_code=307)
+        except Exception as e:
+            print(f"Presigning {artifact['object_name']} failed: {e}. Serving locally.")
+
+    etag = f'"{artifact["digest"]}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.ARTIFACT_CACHE_MAX_AGE}",
+        "Accept-Ranges": "bytes",
+    }
+
+    # Revalidation: the client already has these exact bytes
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        byte_range = _parse_range(range_header, artifact["size"])
+        if byte_range is None:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{artifact['size']}"})
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{artifact['size']}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(
+            _iter_file_range(artifact["path"], start, end),
+            status_code=206,
+            media_type=artifact["media_type"],
+            headers=headers
+        )
+
+    return FileResponse(artifact["path"], media_type=artifact["media_type"], headers=headers)
+
+def _parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single `bytes=` range into inclusive (start, end) offsets.
+
+    Returns None when the range can't be satisfied; multi-range requests
+    are answered with their first range.
+    """
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip() != "bytes" or not ranges:
+        return None
+    first, _, last = ranges.split(",")[0].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                return None
+            start, end = max(size - length, 0), size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        return None
+    return start, end
+
+def _iter_file_range(path: str, start: int, end: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(RANGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
@@ -1,9 +1,9 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from typing import Optional
-import uuid
-import os
 from app.models.schemas import SiteVerificationResponse
-from app.services.solar_detection_service import detect_solar_panels
+from app.services.solar_detection_service import detect_solar_panels, detection_model_version
+from app.services.scratch_service import get_scratch_space
+from app.services.upload_dedup_service import get_result_cache
 
 router = APIRouter()
 
@@ -13,7 +13,9 @@ async def detect_solar_panels_endpoint(
     sample_id: str = Form(...),
     lat: float = Form(...),
     lon: float = Form(...),
-    model_type: str = Form("mistral")  # Can be "mistral", "unet" or "yolov5"
+    model_type: str = Form("mistral"),  # Can be "mistral", "unet" or "yolov5"
+    tta: Optional[str] = Form(None),  # Optional UNet test-time augmentation: "flip" or "d4"
+    zoom: Optional[float] = Form(None)  # Optional Web Mercator zoom level of the image
 ):
     """
     Detect solar panels in an uploaded image using pretrained models.
@@ -24,9 +26,14 @@ async def detect_solar_panels_endpoint(
         lat: Latitude coordinate
         lon: Longitude coordinate
         model_type: Type of model to use ("mistral", "unet" or "yolov5")
+        tta: Optional test-time augmentation mode for the UNet ("flip": 4 views, "d4": 8 views),
+            run as a single batched forward pass and recorded in qc_notes
+        zoom: Optional zoom level the image was rendered at, used to derive the
+            ground sampling distance; defaults to the configured buffer radius
         
     Returns:
-        SiteVerificationResponse with detection results
+        SiteVerificationResponse with detection results; re-uploading the same
+        image for the same site and model returns the cached verification
     """
     # Validate file type
     allowed_extensions = ["jpg", "jpeg", "png", "tiff", "tif"]
@@ -34,30 +41,42 @@ async def detect_solar_panels_endpoint(
     if file_extension not in allowed_extensions:
         raise HTTPException(status_code=400, detail="Invalid file type. Allowed: JPG, PNG, TIFF")
     
-    # Generate a unique filename
-    unique_filename = f"{uuid.uuid4()}_{image.filename}"
-    file_path = f"data/temp/{unique_filename}"
+    # Validate test-time augmentation mode
+    allowed_tta_modes = ["flip", "d4"]
+    if tta and tta not in allowed_tta_modes:
+        raise HTTPException(status_code=400, detail="Invalid TTA mode. Allowed: flip, d4")
     
-    # Create directory if it doesn't exist
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    
-    # Save uploaded file
-    with open(file_path, "wb") as buffer:
-        content = await image.read()
-        buffer.write(content)
-    
-    try:
-        # Run solar panel detection
-        result = await detect_solar_panels(
-            file_path=file_path,
-            sample_id=sample_id,
-            lat=lat,
-            lon=lon,
-            model_type=model_type
+    # Store the upload by content hash for the duration of the request;
+    # identical concurrent uploads share one file
+    async with get_scratch_space().upload(image, file_extension) as (content_hash, file_path):
+        # The same image, site and options through the same model gives the same result
+        cache_key = (
+            content_hash,
+            model_type,
+            await detection_model_version(model_type),
+            sample_id,
+            round(lat, 6),
+            round(lon, 6),
+            tta,
+            zoom
         )
-        return result
-    except Exception as e:
-        # Clean up the temporary file
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
\ No newline at end of file
+        
+        try:
+            # Run solar panel detection unless this upload was already verified
+            result, _ = await get_result_cache().get_or_compute(
+                cache_key,
+                lambda: detect_solar_panels(
+                    file_path=file_path,
+                    sample_id=sample_id,
+                    lat=lat,
+                    lon=lon,
+                    model_type=model_type,
+                    tta=tta,
+                    zoom=zoom,
+                    # Hashed while streaming to disk; the evidence hash reuses it
+                    image_sha256=content_hash
+                )
+            )
+            return result
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
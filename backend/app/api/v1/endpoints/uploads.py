@@ -1,7 +1,10 @@
-from fastapi import APIRouter, UploadFile, File, Depends
+import re
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Request
 from uuid import uuid4
 from app.models.schemas import JobResponse
+from app.services.minio_service import minio_service
 from app.services.job_service import enqueue_csv_processing
+from app.services.scratch_service import get_scratch_space
 
 router = APIRouter()
 
@@ -14,17 +17,8 @@ async def upload_csv(file: UploadFile = File(...)):
     # Generate a unique job ID
     job_id = str(uuid4())
     
-    # Save the uploaded file temporarily
-    file_path = f"data/temp/{job_id}_{file.filename}"
-    
-    # Create directory if it doesn't exist
-    import os
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    
-    # Save file
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
+    # Save the uploaded file to scratch space; the job releases it when done
+    file_path = await get_scratch_space().save_bytes(await file.read(), file.filename)
     
     # Enqueue the job for processing
     await enqueue_csv_processing(job_id, file_path)
@@ -33,4 +27,22 @@ async def upload_csv(file: UploadFile = File(...)):
         job_id=job_id,
         status="queued",
         progress=0
-    )
\ No newline at end of file
+    )
+
+@router.post("/raw/{sample_id}")
+async def upload_raw_imagery(sample_id: str, request: Request):
+    """
+    Stream a raw request body (e.g. a large GeoTIFF) straight into object
+    storage without buffering it in the API. Returns the object name and a
+    presigned download URL.
+    """
+    if not re.fullmatch(r"[\w\-][\w.\-]*", sample_id):
+        raise HTTPException(status_code=400, detail="Invalid sample_id")
+    object_name = f"uploads/{sample_id}/{uuid4()}"
+    content_type = request.headers.get("content-type", "application/octet-stream")
+    try:
+        size = await minio_service.upload_stream(request.stream(), object_name, content_type)
+        url = await minio_service.presigned_url(object_name)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Object storage upload failed: {str(e)}")
+    return {"object_name": object_name, "size": size, "url": url}
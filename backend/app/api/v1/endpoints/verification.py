@@ -1,5 +1,8 @@
-from fastapi import APIRouter
-from app.models.schemas import SingleVerificationRequest, SiteVerificationResponse
+from fastapi import APIRouter, HTTPException
+from app.models.schemas import (
+    EvidenceProofRequest, EvidenceProofResponse, SingleVerificationRequest, SiteVerificationResponse
+)
+from app.services.blockchain_service import get_evidence_anchor
 from app.services.verification_service import verify_single_site
 
 router = APIRouter()
@@ -10,4 +13,41 @@ async def verify_single_site_endpoint(request: SingleVerificationRequest):
     Accepts JSON: { sample_id, lat, lon, optional image_urls } to run one-off verification synchronously.
     """
     result = await verify_single_site(request)
-    return result
\ No newline at end of file
+    return result
+
+@router.get("/evidence/{evidence_hash}", response_model=EvidenceProofResponse)
+async def get_evidence_proof_endpoint(evidence_hash: str):
+    """
+    Returns the Merkle inclusion proof of an anchored evidence hash, checked
+    against the anchored root.
+    """
+    anchor = get_evidence_anchor()
+    receipt = anchor.get_receipt(evidence_hash)
+    if not receipt:
+        raise HTTPException(status_code=404, detail="Evidence not anchored yet")
+    valid, batch = anchor.verify(evidence_hash, receipt["proof"], receipt["merkle_root"])
+    return EvidenceProofResponse(
+        evidence_hash=evidence_hash,
+        merkle_root=receipt["merkle_root"],
+        valid=valid,
+        tx_hash=batch["tx_hash"] if batch else None,
+        anchored_at=receipt["anchored_at"],
+        leaf_index=receipt["leaf_index"],
+        proof=receipt["proof"]
+    )
+
+@router.post("/evidence", response_model=EvidenceProofResponse)
+async def verify_evidence_proof_endpoint(request: EvidenceProofRequest):
+    """
+    Accepts JSON: { evidence_hash, merkle_root, proof } and checks that the proof
+    leads to the root and that the root was anchored (O(log n) hashes).
+    """
+    proof = [step.model_dump() for step in request.proof]
+    valid, batch = get_evidence_anchor().verify(request.evidence_hash, proof, request.merkle_root)
+    return EvidenceProofResponse(
+        evidence_hash=request.evidence_hash,
+        merkle_root=request.merkle_root,
+        valid=valid,
+        tx_hash=batch["tx_hash"] if batch else None,
+        anchored_at=batch["anchored_at"] if batch else None
+    )
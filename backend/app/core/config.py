@@ -8,6 +8,7 @@ class Settings:
     def __init__(self):
         self.PROJECT_NAME: str = "Karnan - Solar Verification Backend"
         self.API_V1_STR: str = "/api/v1"
+        self.PUBLIC_BASE_URL: str = os.getenv("PUBLIC_BASE_URL", "http://localhost:8000")
         self.SECRET_KEY: str = os.getenv("SECRET_KEY", "super-secret-key-change-in-production")
         self.BACKEND_CORS_ORIGINS: List[str] = []
         
@@ -22,17 +23,85 @@ class Settings:
         self.MINIO_ACCESS_KEY: str = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
         self.MINIO_SECRET_KEY: str = os.getenv("MINIO_SECRET_KEY", "minioadmin")
         self.MINIO_BUCKET: str = os.getenv("MINIO_BUCKET", "karnan")
+        self.MINIO_SECURE: bool = os.getenv("MINIO_SECURE", "false").lower() == "true"
+        self.MINIO_REGION: str = os.getenv("MINIO_REGION", "us-east-1")
+        self.MINIO_TRANSFER_WORKERS: int = int(os.getenv("MINIO_TRANSFER_WORKERS", "4"))
+        self.MINIO_PART_SIZE: int = int(os.getenv("MINIO_PART_SIZE", str(16 * 1024 ** 2)))
+        self.MINIO_PARALLEL_UPLOADS: int = int(os.getenv("MINIO_PARALLEL_UPLOADS", "4"))
+        self.MINIO_PRESIGN_EXPIRY_S: int = int(os.getenv("MINIO_PRESIGN_EXPIRY_S", "900"))
+        self.MINIO_ARTIFACTS: bool = os.getenv("MINIO_ARTIFACTS", "false").lower() == "true"  # mirror artifacts, serve presigned URLs
         
         # Model settings
         self.MODEL_TYPE: str = os.getenv("MODEL_TYPE", "mock")
+        self.UNET_WEIGHTS_PATH: str = os.getenv("UNET_WEIGHTS_PATH", "../weights/unet_final.safetensors")
+        self.UNET_IMAGE_SIZE: int = int(os.getenv("UNET_IMAGE_SIZE", "1024"))
+        self.UNET_THRESHOLD: float = float(os.getenv("UNET_THRESHOLD", "0.1"))
+        self.DECODE_WORKERS: int = int(os.getenv("DECODE_WORKERS", "2"))
+        self.INFERENCE_BATCH_SIZE: int = int(os.getenv("INFERENCE_BATCH_SIZE", "2"))
+        self.MASK_COMPRESSION: str = os.getenv("MASK_COMPRESSION", "zstd")  # zstd|zlib|none
+        self.RESULT_CACHE_SIZE: int = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+        
+        # Upload settings
+        self.UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "data/temp")
+        self.SCRATCH_MAX_AGE_S: float = float(os.getenv("SCRATCH_MAX_AGE_S", "3600"))
+        self.SCRATCH_MAX_BYTES: int = int(os.getenv("SCRATCH_MAX_BYTES", str(1024 ** 3)))
+        self.SCRATCH_SWEEP_INTERVAL_S: float = float(os.getenv("SCRATCH_SWEEP_INTERVAL_S", "300"))
+        self.SCRATCH_TMPFS_DIR: str = os.getenv("SCRATCH_TMPFS_DIR", "")  # e.g. /dev/shm/karnan
+        self.SCRATCH_TMPFS_MAX_FILE_BYTES: int = int(os.getenv("SCRATCH_TMPFS_MAX_FILE_BYTES", str(8 * 1024 ** 2)))
+        
+        # Artifact settings
+        self.ARTIFACT_DIR: str = os.getenv("ARTIFACT_DIR", "data/artifacts")
+        self.ARTIFACT_CACHE_MAX_AGE: int = int(os.getenv("ARTIFACT_CACHE_MAX_AGE", "3600"))
         
         # Imagery settings
         self.SATELLITE_PROVIDER: str = os.getenv("SATELLITE_PROVIDER", "mock")
         self.BUFFER_RADIUS_M: int = int(os.getenv("BUFFER_RADIUS_M", "20"))
         self.IMAGE_MIN_RESOLUTION_PX: int = int(os.getenv("IMAGE_MIN_RESOLUTION_PX", "512"))
+        # Coarsest effective GSD (m/px) accepted when the image's GSD is measured; a module still spans 2 x 3 px
+        self.QC_MAX_GSD_M: float = float(os.getenv("QC_MAX_GSD_M", "0.5"))
+        self.RASTER_MAX_WINDOW_PX: int = int(os.getenv("RASTER_MAX_WINDOW_PX", "2048"))
+        self.TILE_ZOOM: int = int(os.getenv("TILE_ZOOM", "19"))
+        self.TILE_URL_TEMPLATE: str = os.getenv("TILE_URL_TEMPLATE", "")  # for SATELLITE_PROVIDER=xyz
+        self.TILE_CACHE_DIR: str = os.getenv("TILE_CACHE_DIR", "data/tile_cache")
+        self.TILE_FETCH_CONCURRENCY: int = int(os.getenv("TILE_FETCH_CONCURRENCY", "8"))
+        self.TILE_FETCH_TIMEOUT_S: float = float(os.getenv("TILE_FETCH_TIMEOUT_S", "10"))
+        self.MAPBOX_TOKEN: str = os.getenv("MAPBOX_TOKEN", "")
+        
+        # Batch tile store settings
+        self.TILE_STORE_DIR: str = os.getenv("TILE_STORE_DIR", "data/tiles")
+        self.TILE_SIZE_PX: int = int(os.getenv("TILE_SIZE_PX", "512"))
+        self.TILE_CHUNK_SIZE: int = int(os.getenv("TILE_CHUNK_SIZE", "256"))
+        
+        # Certificate settings
+        self.CERTIFICATE_WORKERS: int = int(os.getenv("CERTIFICATE_WORKERS", "2"))
+        self.CERTIFICATE_CHUNK_SIZE: int = int(os.getenv("CERTIFICATE_CHUNK_SIZE", "64"))
+        self.CERTIFICATE_CACHE_MEMORY_ENTRIES: int = int(os.getenv("CERTIFICATE_CACHE_MEMORY_ENTRIES", "512"))
+        
+        # Evidence anchoring settings
+        self.ANCHOR_WINDOW_S: float = float(os.getenv("ANCHOR_WINDOW_S", "30"))
+        self.ANCHOR_MAX_BATCH: int = int(os.getenv("ANCHOR_MAX_BATCH", "4096"))
+        self.ANCHOR_DIR: str = os.getenv("ANCHOR_DIR", "data/anchors")
+        
+        # Chat settings
+        self.CHAT_CATALOG_PATH: str = os.getenv("CHAT_CATALOG_PATH", "data/chat_catalog.json")
+        self.CHAT_CATALOG_RELOAD_S: float = float(os.getenv("CHAT_CATALOG_RELOAD_S", "5"))
+        self.CHAT_CACHE_SIZE: int = int(os.getenv("CHAT_CACHE_SIZE", "4096"))
+        self.CHAT_LOG_BATCH_SIZE: int = int(os.getenv("CHAT_LOG_BATCH_SIZE", "200"))
+        self.CHAT_LOG_FLUSH_INTERVAL_S: float = float(os.getenv("CHAT_LOG_FLUSH_INTERVAL_S", "1"))
+        self.CHAT_LOG_MAX_PENDING: int = int(os.getenv("CHAT_LOG_MAX_PENDING", "10000"))
+        self.CHAT_LOG_SHUTDOWN_TIMEOUT_S: float = float(os.getenv("CHAT_LOG_SHUTDOWN_TIMEOUT_S", "10"))
         
         # QC settings
         self.CONFIDENCE_THRESHOLD_VERIFIABLE: float = float(os.getenv("CONFIDENCE_THRESHOLD_VERIFIABLE", "0.7"))
+        self.QC_MAX_CAPACITY_KW: float = float(os.getenv("QC_MAX_CAPACITY_KW", "100"))
+        self.QC_MIN_SHARPNESS: float = float(os.getenv("QC_MIN_SHARPNESS", "30"))  # Laplacian variance
+        self.QC_MAX_CLOUD_FRACTION: float = float(os.getenv("QC_MAX_CLOUD_FRACTION", "0.4"))
+        self.QC_MAX_CLIPPED_FRACTION: float = float(os.getenv("QC_MAX_CLIPPED_FRACTION", "0.3"))
+        self.CASCADE_ENABLED: bool = os.getenv("CASCADE_ENABLED", "false").lower() == "true"
+        self.CASCADE_MODELS: str = os.getenv("CASCADE_MODELS", "unet,mistral,roboflow")
+        self.CASCADE_PREFILTER_SIZE: int = int(os.getenv("CASCADE_PREFILTER_SIZE", "256"))
+        self.CASCADE_ESCALATE_ABOVE: float = float(os.getenv("CASCADE_ESCALATE_ABOVE", "0.2"))
+        self.QC_RULES: List[dict] = []  # from config.yml `qc_rules`; empty means the built-in rules
         
         # Capacity settings
         self.AREA_WP_PER_M2: int = int(os.getenv("AREA_WP_PER_M2", "170"))
@@ -7,17 +7,41 @@ from contextlib import asynccontextmanager
 
 # Add the parent directory to the Python path to import models
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+# Repository root, home of the shared `models` package (UNet, checkpoints, TTA)
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from app.api.routes import api_router
 from app.core.config import settings
 from app.core.database import create_db_and_tables
+from app.services.blockchain_service import shutdown_evidence_anchor
+from app.services.certificate_service import shutdown_certificate_engine
+from app.services.chat_log_service import start_chat_log_writer, stop_chat_log_writer
+from app.services.decode_pool_service import shutdown_decode_pool
+from app.services.minio_service import minio_service
+from app.services.scratch_service import start_scratch_sweeper, stop_scratch_sweeper
+from app.services.tile_provider_service import close_tile_client
+from app.services.unet_service import load_unet_model
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: Create database tables
     await create_db_and_tables()
+    # Sweep leftover uploads out of data/temp in the background
+    start_scratch_sweeper()
+    # Batch chat logs into the database off the request path
+    start_chat_log_writer()
+    # Load the UNet weights off the event loop, before the first request needs them
+    await load_unet_model()
     yield
-    # Shutdown: Any cleanup code would go here
+    # Shutdown: stop background work (writing queued chat logs) and worker
+    # pools (freeing the decode pool's shared memory), then close pooled clients
+    await stop_scratch_sweeper()
+    await stop_chat_log_writer()
+    await shutdown_evidence_anchor()
+    shutdown_decode_pool()
+    shutdown_certificate_engine()
+    await close_tile_client()
+    minio_service.close()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
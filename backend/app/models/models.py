@@ -20,7 +20,7 @@ class SiteVerification(Base):
     capacity_kw_est = Column(Float)
     qc_status = Column(String)  # VERIFIABLE | NOT_VERIFIABLE
     qc_notes = Column(JSONB)  # List of strings
-    bbox_or_mask = Column(JSONB)  # {type: bbox|mask, data: path-or-base64}
+    bbox_or_mask = Column(JSONB)  # {type: bbox, format: cxcywh, boxes, confidences} or {type: mask, encoding: rle|bitmap, size, counts, polygons, holes}; see mask_service. NULL when no model produced geometry (mock, Mistral, cascade prefilter negatives)
     image_metadata = Column(JSONB)  # {source: mock|provider, capture_date: YYYY-MM-DD}
     detection_evidence_hash = Column(String)
     certificate_url = Column(String)
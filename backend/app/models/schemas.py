@@ -29,7 +29,7 @@ class SiteVerificationResponse(BaseModel):
     capacity_kw_est: Optional[float]
     qc_status: str  # VERIFIABLE | NOT_VERIFIABLE
     qc_notes: List[str]
-    bbox_or_mask: Dict[str, Any]  # {type: bbox|mask, data: path-or-base64}
+    bbox_or_mask: Optional[Dict[str, Any]]  # {type: bbox, format: cxcywh, boxes, confidences} or {type: mask, encoding: rle|bitmap, size, counts, polygons, holes}; see mask_service. None when no model produced geometry (mock, Mistral, cascade prefilter negatives)
     image_metadata: Dict[str, Any]  # {source: mock|provider, capture_date: YYYY-MM-DD}
     detection_evidence_hash: str
     certificate_url: Optional[str]
@@ -37,6 +37,24 @@ class SiteVerificationResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
+class EvidenceProofStep(BaseModel):
+    hash: str
+    side: str  # left | right
+
+class EvidenceProofRequest(BaseModel):
+    evidence_hash: str
+    merkle_root: str
+    proof: List[EvidenceProofStep]
+
+class EvidenceProofResponse(BaseModel):
+    evidence_hash: str
+    merkle_root: Optional[str]
+    valid: bool
+    tx_hash: Optional[str] = None
+    anchored_at: Optional[str] = None
+    leaf_index: Optional[int] = None
+    proof: Optional[List[EvidenceProofStep]] = None
+
 class LeaderboardEntry(BaseModel):
     rank: int
     sample_id: str
@@ -0,0 +1,204 @@
+import os
+import re
+import json
+import asyncio
+import hashlib
+import threading
+from typing import Dict, Optional, Tuple
+import numpy as np
+import cv2
+from app.core.config import settings
+from app.services.minio_service import mirror_file
+from app.services.raster_service import is_geotiff
+
+ARTIFACT_TYPES = ["overlay", "mask", "raw", "certificate"]
+
+MEDIA_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".tif": "image/tiff",
+    ".tiff": "image/tiff",
+    ".pdf": "application/pdf",
+}
+
+# Overlay colour (RGB) and opacity for detected panels
+OVERLAY_COLOR = (0, 255, 0)
+OVERLAY_ALPHA = 0.5
+
+# sample_id -> {artifact_type: {"digest", "path", "media_type", "size"}}; mirrors
+# the index files so repeated views never touch the disk until the body is sent
+_index: Dict[str, Dict[str, Dict]] = {}
+_index_lock = threading.Lock()
+
+def render_overlay(
+    image: np.ndarray,
+    mask: np.ndarray,
+    color: Tuple[int, int, int] = OVERLAY_COLOR,
+    alpha: float = OVERLAY_ALPHA
+) -> np.ndarray:
+    """
+    Blend `color` over the masked pixels of an RGB image.
+
+    Only masked pixels are touched, in 8-bit fixed point, so the cost scales
+    with the panel area rather than the image size.
+
+    Args:
+        image: RGB uint8 image (H, W, 3)
+        mask: Binary mask, any resolution (nearest-neighbour resized to the image)
+        color: RGB overlay colour
+        alpha: Overlay opacity in [0, 1]
+
+    Returns:
+        New RGB uint8 image
+    """
+    height, width = image.shape[:2]
+    mask = np.asarray(mask, dtype=np.uint8)
+    if mask.shape != (height, width):
+        mask = cv2.resize(mask, (width, height), interpolation=cv2.INTER_NEAREST)
+
+    overlay = image.copy()
+    selected = mask.astype(bool)
+    weight = int(round(alpha * 256))
+    pixels = overlay[selected].astype(np.uint16)
+    tint = np.array(color, dtype=np.uint16) * weight
+    overlay[selected] = ((pixels * (256 - weight) + tint) >> 8).astype(np.uint8)
+    return overlay
+
+def render_mask(mask: np.ndarray, size: Optional[Tuple[int, int]] = None) -> np.ndarray:
+    """Binary mask as a black/white uint8 image, optionally resized to `size` (H, W)."""
+    mask = np.asarray(mask, dtype=np.uint8) * 255
+    if size and mask.shape != tuple(size):
+        mask = cv2.resize(mask, (size[1], size[0]), interpolation=cv2.INTER_NEAREST)
+    return mask
+
+def _index_path(sample_id: str) -> str:
+    # sample_id comes from the URL; keep it from escaping the artifact directory
+    if not re.fullmatch(r"[\w\-][\w.\-]*", sample_id):
+        raise ValueError(f"Invalid sample_id '{sample_id}'")
+    return os.path.join(settings.ARTIFACT_DIR, "index", f"{sample_id}.json")
+
+def _store_bytes(data: bytes, extension: str) -> Dict:
+    """Write `data` under its SHA-256; identical artifacts are stored once."""
+    digest = hashlib.sha256(data).hexdigest()
+    path = os.path.join(settings.ARTIFACT_DIR, digest[:2], digest + extension)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return {"digest": digest, "path": path, "media_type": MEDIA_TYPES[extension], "size": len(data)}
+
+def _encode_png(image: np.ndarray) -> bytes:
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    ok, encoded = cv2.imencode(".png", image)
+    if not ok:
+        raise ValueError("Could not encode artifact as PNG")
+    return encoded.tobytes()
+
+def _record(sample_id: str, entries: Dict[str, Dict]) -> None:
+    with _index_lock:
+        index = dict(_load_index(sample_id))
+        index.update(entries)
+        path = _index_path(sample_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(index, f)
+        _index[sample_id] = index
+
+def _load_index(sample_id: str) -> Dict[str, Dict]:
+    if sample_id not in _index:
+        path = _index_path(sample_id)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            _index[sample_id] = json.load(f)
+    return _index[sample_id]
+
+def _publish_sync(
+    sample_id: str,
+    image_path: str,
+    mask: Optional[np.ndarray],
+    image: Optional[np.ndarray]
+) -> Dict[str, Dict]:
+    if image is not None and is_geotiff(image_path):
+        # Keep the analysed window, not a multi-gigabyte raster browsers can't show
+        entries = {"raw": _store_bytes(_encode_png(image), ".png")}
+    else:
+        with open(image_path, "rb") as f:
+            raw = f.read()
+        extension = os.path.splitext(image_path)[1].lower()
+        entries = {"raw": _store_bytes(raw, extension if extension in MEDIA_TYPES else ".png")}
+        if mask is not None and image is None:
+            image = cv2.imdecode(np.frombuffer(raw, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                raise ValueError(f"Could not decode image at {image_path}")
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+    if mask is not None:
+        entries["mask"] = _store_bytes(_encode_png(render_mask(mask, image.shape[:2])), ".png")
+        entries["overlay"] = _store_bytes(_encode_png(render_overlay(image, mask)), ".png")
+
+    _record(sample_id, entries)
+    return entries
+
+async def publish_site_artifacts(
+    sample_id: str,
+    image_path: str,
+    mask: Optional[np.ndarray] = None,
+    image: Optional[np.ndarray] = None
+) -> Dict[str, Dict]:
+    """
+    Render and store the artifacts of a site once, at detection time.
+
+    Args:
+        sample_id: Sample the artifacts belong to
+        image_path: The analysed image; stored as the "raw" artifact
+        mask: Detection mask; when given, "mask" and "overlay" are rendered too
+        image: The already decoded RGB image, to avoid decoding it again; for
+            GeoTIFFs this is the analysed window and becomes the "raw" artifact
+
+    Returns:
+        Mapping of artifact type to its stored entry
+    """
+    loop = asyncio.get_running_loop()
+    entries = await loop.run_in_executor(None, _publish_sync, sample_id, image_path, mask, image)
+    if settings.MINIO_ARTIFACTS:
+        entries = await _mirror_to_object_storage(sample_id, entries)
+    return entries
+
+async def _mirror_to_object_storage(sample_id: str, entries: Dict[str, Dict]) -> Dict[str, Dict]:
+    """Copy artifacts to MinIO so downloads can be redirected to presigned URLs."""
+    mirrored = {}
+    for artifact_type, entry in entries.items():
+        object_name = await mirror_file(entry["path"], f"artifacts/{os.path.basename(entry['path'])}")
+        mirrored[artifact_type] = {**entry, "object_name": object_name} if object_name else entry
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, _record, sample_id, mirrored)
+    return mirrored
+
+def register_artifact(sample_id: str, artifact_type: str, file_path: str) -> Dict:
+    """Store an already rendered file (e.g. a certificate PDF) as an artifact."""
+    with open(file_path, "rb") as f:
+        entry = _store_bytes(f.read(), os.path.splitext(file_path)[1].lower())
+    _record(sample_id, {artifact_type: entry})
+    return entry
+
+def get_artifact(sample_id: str, artifact_type: str) -> Optional[Dict]:
+    """
+    Look up a stored artifact.
+
+    Certificates generated before they were registered are picked up from
+    data/certificates on first request.
+
+    Returns:
+        Entry with digest, path, media_type and size, or None
+    """
+    entry = _load_index(sample_id).get(artifact_type)
+    if entry is None and artifact_type == "certificate":
+        certificate_path = os.path.join("data", "certificates", f"{sample_id}_certificate.pdf")
+        if os.path.exists(certificate_path):
+            entry = register_artifact(sample_id, "certificate", certificate_path)
+    return entry
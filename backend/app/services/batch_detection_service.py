@@ -0,0 +1,129 @@
+import asyncio
+from typing import Any, AsyncIterator, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+import numpy as np
+from app.core.config import settings
+from app.models.schemas import SiteVerificationResponse
+from app.services.decode_pool_service import DecodePool, get_decode_pool
+from app.services.evidence_service import EvidenceHasher
+from app.services.geometry_service import ground_sampling_distance
+from app.services.image_quality_service import analyze_image_quality
+from app.services.qc_service import QCBatchResult, get_qc_engine
+from app.services.solar_detection_service import build_mock_response, build_unet_response, unet_geometry, unet_qc_values
+from app.services.unet_service import mask_and_confidence, predict_batch_probabilities
+
+def _analyse_batch(
+    tiles: np.ndarray,
+    probabilities: np.ndarray,
+    gsds: Sequence[float]
+) -> List[Tuple[np.ndarray, float, dict, dict]]:
+    """(mask, confidence, image quality, geometry) of every tile of a batch."""
+    analysed = []
+    for tile, site_probabilities, gsd_m in zip(tiles, probabilities, gsds):
+        mask, confidence = mask_and_confidence(site_probabilities)
+        analysed.append((mask, confidence, analyze_image_quality(tile), unet_geometry(mask, gsd_m, tile.shape[:2])))
+    return analysed
+
+def _qc_batch(values: List[Dict[str, Any]]) -> QCBatchResult:
+    """
+    QC of a whole batch in one vectorised evaluation, over the same inputs
+    single uploads pass to apply_quality_control (see unet_qc_values).
+    """
+    columns = {
+        column: [site[column] for site in values]
+        for column in ("confidence", "reason_codes", "capacity_kw_est", "image_resolution", "effective_gsd_m")
+    }
+    for signal in values[0]["image_quality"]:
+        columns[signal] = [site["image_quality"].get(signal) for site in values]
+    return get_qc_engine().evaluate(**columns)
+
+async def detect_tile_store(
+    store,
+    sites: Mapping[str, Tuple[float, float]],
+    batch_size: Optional[int] = None,
+    buffer_radius_m: Optional[float] = None,
+    source: Optional[str] = None,
+    predict: Optional[Callable[[np.ndarray], Tuple[np.ndarray, int]]] = None,
+    pool: Optional[DecodePool] = None
+) -> AsyncIterator[List[SiteVerificationResponse]]:
+    """
+    Run UNet detection over the tiles of a TileStore, one batch at a time.
+
+    Batches are read in slot order, which for a planned batch job is the
+    spatial order the imagery was fetched in. The decode pool's workers
+    resize and normalize each batch from the store's memmap straight into
+    shared memory, and that array is the forward pass's input, so the
+    workers prepare the next batches while the model runs. Masks and
+    geometry follow per site, and QC runs once over the whole batch.
+
+    Args:
+        store: TileStore holding the site crops
+        sites: (lat, lon) of every sample_id in the store
+        batch_size: Tiles per forward pass; defaults to the pool's batch size
+            (INFERENCE_BATCH_SIZE)
+        buffer_radius_m: Radius the crops cover; defaults to BUFFER_RADIUS_M
+        source: Imagery provider, recorded in image_metadata; defaults to SATELLITE_PROVIDER
+        predict: Forward pass over an (N, 3, S, S) batch; defaults to the UNet
+        pool: Decode pool to preprocess in; defaults to the process-wide pool
+
+    Yields:
+        The sealed verification results of each batch, in store order
+    """
+    pool = pool or get_decode_pool()
+    if buffer_radius_m is None:
+        buffer_radius_m = settings.BUFFER_RADIUS_M
+    source = source or settings.SATELLITE_PROVIDER
+    predict = predict or predict_batch_probabilities
+
+    async for batch in pool.tile_batches(store, batch_size):
+        probabilities, _ = await asyncio.to_thread(predict, batch.tensor)
+        coordinates = [sites[sample_id] for sample_id in batch.sample_ids]
+        # Tiles are cropped to exactly the buffer, so their GSD is measured
+        gsds = [
+            ground_sampling_distance(lat, buffer_radius_m=buffer_radius_m, image_width_px=batch.tiles.shape[2])
+            for lat, _ in coordinates
+        ]
+        analysed = await asyncio.to_thread(_analyse_batch, batch.tiles, probabilities, gsds)
+        qc = _qc_batch([
+            unet_qc_values(mask, confidence, quality, geometry, gsd_m, batch.tiles.shape[1:3], gsd_measured=True)
+            for (mask, confidence, quality, geometry), gsd_m in zip(analysed, gsds)
+        ])
+
+        results = []
+        for i, (sample_id, tile, (lat, lon)) in enumerate(zip(batch.sample_ids, batch.tiles, coordinates)):
+            mask, confidence, quality, geometry = analysed[i]
+            # The stored pixels are the analysed image
+            evidence = EvidenceHasher()
+            evidence.update_image(tile)
+            results.append(await build_unet_response(
+                sample_id, lat, lon, mask, confidence, quality, gsds[i], tile.shape[:2], evidence,
+                image_metadata={"source": source, "georeferenced": False},
+                gsd_measured=True,
+                geometry=geometry,
+                qc=(str(qc.statuses[i]), qc.notes(i))
+            ))
+        yield results
+
+async def mock_detect_tile_store(
+    store,
+    sites: Mapping[str, Tuple[float, float]],
+    batch_size: Optional[int] = None,
+    source: Optional[str] = None
+) -> AsyncIterator[List[SiteVerificationResponse]]:
+    """
+    Mock detection over the tiles of a TileStore, for when the UNet weights
+    aren't available. Yields batches in store order like detect_tile_store,
+    with each result's evidence hash still covering its stored tile.
+    """
+    source = source or settings.SATELLITE_PROVIDER
+    for sample_ids, tiles in store.iter_batches(batch_size or settings.INFERENCE_BATCH_SIZE):
+        results = []
+        for sample_id, tile in zip(sample_ids, tiles):
+            lat, lon = sites[sample_id]
+            evidence = EvidenceHasher()
+            evidence.update_image(tile)
+            results.append(await build_mock_response(
+                sample_id, lat, lon, "unet", evidence,
+                image_metadata={"source": source, "georeferenced": False},
+                notes=["UNet weights unavailable (UNET_WEIGHTS_PATH): mock result"]
+            ))
+        yield results
@@ -0,0 +1,213 @@
+import csv
+import asyncio
+from typing import Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+import numpy as np
+from app.core.config import settings
+from app.services.imagery_service import fetch_imagery_to_tile_store
+from app.services.tile_provider_service import (
+    MAX_LATITUDE, TileKey, XYZTileProvider, covering_tiles, get_tile_provider, site_pixel_window
+)
+
+class PlannedSite(NamedTuple):
+    sample_id: str
+    lat: float
+    lon: float
+    # XYZ tiles the site's imagery footprint overlaps
+    tiles: Tuple[TileKey, ...]
+
+class BatchPlan:
+    """
+    Sites of a batch in spatial order, grouped by the tile they sit on.
+
+    Every group holds the sites whose centre falls on the same XYZ tile, and
+    groups follow the Z-order (quadkey) curve of those tiles, so consecutive
+    groups are neighbours on the ground and share most of their tiles.
+    """
+
+    def __init__(self, zoom: int, groups: List[List[PlannedSite]]):
+        self.zoom = zoom
+        self.groups = groups
+
+    @property
+    def sites(self) -> List[PlannedSite]:
+        """All sites in processing order."""
+        return [site for group in self.groups for site in group]
+
+    @property
+    def tiles(self) -> List[TileKey]:
+        """Unique tiles in the order they are first needed."""
+        seen: Dict[TileKey, None] = {}
+        for group in self.groups:
+            for site in group:
+                for tile in site.tiles:
+                    seen.setdefault(tile)
+        return list(seen)
+
+    @property
+    def tile_requests(self) -> int:
+        """Tile fetches if every site were fetched independently."""
+        return sum(len(site.tiles) for group in self.groups for site in group)
+
+    def summary(self) -> Dict[str, float]:
+        sites = sum(len(group) for group in self.groups)
+        unique = len(self.tiles)
+        requests = self.tile_requests
+        return {
+            "sites": sites,
+            "groups": len(self.groups),
+            "tile_requests": requests,
+            "unique_tiles": unique,
+            "reduction": round(requests / unique, 2) if unique else 0.0
+        }
+
+def read_sites_csv(path: str) -> List[Tuple[str, float, float]]:
+    """
+    (sample_id, lat, lon) for every valid row of a batch CSV.
+
+    Rows with a missing sample_id or unparseable coordinates are skipped.
+    """
+    sites = []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            sample_id = (row.get("sample_id") or "").strip()
+            try:
+                lat, lon = float(row["lat"]), float(row["lon"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if sample_id and -90 <= lat <= 90 and -180 <= lon <= 180:
+                sites.append((sample_id, lat, lon))
+    return sites
+
+def _spread_bits(v: np.ndarray) -> np.ndarray:
+    """Insert a zero bit between each of the low 32 bits of `v`."""
+    v = v.astype(np.uint64) & np.uint64(0xFFFFFFFF)
+    for shift, mask in ((16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF), (4, 0x0F0F0F0F0F0F0F0F),
+                        (2, 0x3333333333333333), (1, 0x5555555555555555)):
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+def site_tile_coordinates(lats: np.ndarray, lons: np.ndarray, zoom: int) -> Tuple[np.ndarray, np.ndarray]:
+    """XYZ tile column and row containing each point, vectorized."""
+    n = 2 ** zoom
+    lats = np.clip(np.asarray(lats, dtype=np.float64), -MAX_LATITUDE, MAX_LATITUDE)
+    lons = np.asarray(lons, dtype=np.float64)
+    x = np.floor((lons + 180.0) / 360.0 * n).astype(np.int64) % n
+    sin_lat = np.sin(np.radians(lats))
+    y = np.floor((0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * np.pi)) * n).astype(np.int64)
+    return x, np.clip(y, 0, n - 1)
+
+def plan_batch(
+    sites: Sequence[Tuple[str, float, float]],
+    zoom: Optional[int] = None,
+    buffer_radius_m: Optional[float] = None
+) -> BatchPlan:
+    """
+    Plan imagery fetching and inference for a batch of sites.
+
+    Args:
+        sites: (sample_id, lat, lon) rows
+        zoom: Tile zoom level; defaults to TILE_ZOOM
+        buffer_radius_m: Footprint radius around each site; defaults to BUFFER_RADIUS_M
+
+    Returns:
+        BatchPlan with the sites grouped by centre tile, in Z-order
+    """
+    if zoom is None:
+        zoom = settings.TILE_ZOOM
+    if buffer_radius_m is None:
+        buffer_radius_m = settings.BUFFER_RADIUS_M
+    if not sites:
+        return BatchPlan(zoom, [])
+
+    lats = np.fromiter((site[1] for site in sites), dtype=np.float64, count=len(sites))
+    lons = np.fromiter((site[2] for site in sites), dtype=np.float64, count=len(sites))
+    tile_x, tile_y = site_tile_coordinates(lats, lons, zoom)
+    # Morton code of the centre tile: sorting by it walks the quadtree, so
+    # sites close on the ground end up close in the schedule
+    keys = _spread_bits(tile_x) | (_spread_bits(tile_y) << np.uint64(1))
+    order = np.argsort(keys, kind="stable")
+
+    groups: List[List[PlannedSite]] = []
+    previous_key = None
+    for i in order.tolist():
+        sample_id, lat, lon = sites[i]
+        window = site_pixel_window(lat, lon, buffer_radius_m, zoom)
+        site = PlannedSite(sample_id, lat, lon, tuple(covering_tiles(window, zoom)))
+        if keys[i] != previous_key:
+            groups.append([])
+            previous_key = keys[i]
+        groups[-1].append(site)
+    return BatchPlan(zoom, groups)
+
+async def prefetch_group_tiles(
+    provider: XYZTileProvider,
+    group: Iterable[PlannedSite],
+    fetched: Set[TileKey]
+) -> int:
+    """
+    Download the tiles a group needs that no earlier group has fetched.
+
+    Downloads run concurrently up to the provider's limit and land in its
+    disk cache, where the per-site mosaicking picks them up.
+
+    Returns:
+        Number of tiles fetched for this group
+    """
+    needed = []
+    for site in group:
+        for tile in site.tiles:
+            if tile not in fetched:
+                fetched.add(tile)
+                needed.append(tile)
+    await asyncio.gather(*(provider.get_tile_bytes(*tile) for tile in needed))
+    return len(needed)
+
+async def run_batch_imagery(
+    plan: BatchPlan,
+    store,
+    provider: Optional[str] = None,
+    buffer_radius_m: Optional[float] = None,
+    on_progress: Optional[Callable[[int, int], Awaitable[None]]] = None
+) -> Dict[str, float]:
+    """
+    Fetch imagery for every planned site into a TileStore, group by group.
+
+    Each tile is fetched once, just before the first group that needs it,
+    and sites are written to the store in plan order so batch inference
+    (TileStore.iter_batches) also runs in spatial order.
+
+    Args:
+        plan: Plan from plan_batch
+        store: TileStore opened for appending
+        provider: Imagery provider; defaults to SATELLITE_PROVIDER
+        buffer_radius_m: Radius around each site; defaults to BUFFER_RADIUS_M
+        on_progress: Awaited with (sites done, total sites) after each group
+
+    Returns:
+        The plan summary plus `tiles_fetched`
+    """
+    provider = provider or settings.SATELLITE_PROVIDER
+    if buffer_radius_m is None:
+        buffer_radius_m = settings.BUFFER_RADIUS_M
+    tile_provider = get_tile_provider(provider)
+
+    fetched: Set[TileKey] = set()
+    tiles_fetched = 0
+    done, total = 0, sum(len(group) for group in plan.groups)
+    for group in plan.groups:
+        if tile_provider is not None:
+            try:
+                tiles_fetched += await prefetch_group_tiles(tile_provider, group, fetched)
+            except Exception as e:
+                # Sites whose tiles failed fall back per site in fetch_imagery_to_tile_store
+                print(f"Tile prefetch failed: {e}")
+        for site in group:
+            await fetch_imagery_to_tile_store(store, site.sample_id, site.lat, site.lon, buffer_radius_m, provider)
+        done += len(group)
+        if on_progress:
+            await on_progress(done, total)
+    store.flush()
+
+    summary = plan.summary()
+    summary["tiles_fetched"] = tiles_fetched
+    return summary
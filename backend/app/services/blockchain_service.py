@@ -1,34 +1,274 @@
-import hashlib
+import os
 import json
+import asyncio
+import hashlib
 from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
 
-async def store_evidence_on_blockchain(evidence_hash: str) -> dict:
+# Domain separation between leaves and inner nodes (as in RFC 6962), so an
+# inner node can never be passed off as a leaf
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+def _send_transaction(payload: dict) -> dict:
+    """
+    Write `payload` to the (mock) network.
+
+    In a real implementation this would submit an actual transaction; here
+    the transaction hash is derived from the payload and the time.
+    """
+    tx_data = {**payload, "timestamp": datetime.now().isoformat(), "network": "mock"}
+    tx_string = json.dumps(tx_data, sort_keys=True)
+    return {
+        "network": "mock",
+        "tx_hash": hashlib.sha256(tx_string.encode()).hexdigest(),
+        "block": None  # In a real implementation, this would be the block number
+    }
+
+async def store_evidence_on_blockchain(evidence_hash: str, batched: bool = False) -> dict:
     """
     Store evidence hash on a mock blockchain.
-    
+
     Args:
         evidence_hash: SHA256 hash of the evidence
-        
+        batched: Queue the hash for the next Merkle batch (see EvidenceAnchor)
+            instead of writing a transaction of its own. The returned record
+            starts out pending and is filled in place once the batch is
+            anchored, so results holding it (e.g. in the ResultCache) report
+            the transaction. Copies made before then, such as stored rows,
+            keep "proof_url", which serves the transaction and inclusion proof.
+
     Returns:
         Dictionary with blockchain transaction details
     """
-    # In a real implementation, this would interact with an actual blockchain
-    # For now, we'll just create a mock transaction
-    
-    # Create a deterministic "transaction hash" based on the evidence hash
-    # In reality, this would be a real transaction hash from the blockchain
-    tx_data = {
-        "evidence_hash": evidence_hash,
-        "timestamp": datetime.now().isoformat(),
-        "network": "mock"
-    }
-    
-    # Create a mock transaction hash
-    tx_string = json.dumps(tx_data, sort_keys=True)
-    tx_hash = hashlib.sha256(tx_string.encode()).hexdigest()
-    
-    return {
-        "network": "mock",
-        "tx_hash": tx_hash,
-        "block": None  # In a real implementation, this would be the block number
-    }
\ No newline at end of file
+    if batched:
+        record = {
+            "network": "mock",
+            "tx_hash": None,
+            "block": None,
+            "status": "pending",
+            "anchoring": "merkle_batch",
+            "proof_url": f"{settings.API_V1_STR}/verify/evidence/{evidence_hash}"
+        }
+        get_evidence_anchor().enqueue(evidence_hash).add_done_callback(
+            lambda future: _backfill_anchor_record(record, future)
+        )
+        return record
+    return _send_transaction({"evidence_hash": evidence_hash})
+
+def _backfill_anchor_record(record: dict, future: asyncio.Future) -> None:
+    if future.cancelled():
+        return
+    if future.exception() is not None:
+        print(f"Evidence anchoring failed: {future.exception()}")
+        record["status"] = "failed"
+        return
+    receipt = future.result()
+    record.update(
+        tx_hash=receipt["tx_hash"],
+        block=receipt["block"],
+        status="anchored",
+        merkle_root=receipt["merkle_root"],
+        anchored_at=receipt["anchored_at"]
+    )
+
+def merkle_leaf(evidence_hash: str) -> bytes:
+    return hashlib.sha256(LEAF_PREFIX + evidence_hash.encode("utf-8")).digest()
+
+def merkle_node(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+def build_merkle_tree(leaves: List[bytes]) -> List[List[bytes]]:
+    """
+    All levels of the tree, leaves first and the root last.
+
+    A node without a sibling moves up a level unchanged rather than being
+    paired with a copy of itself.
+    """
+    levels = [leaves]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [merkle_node(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+def merkle_proof(levels: List[List[bytes]], index: int) -> List[Dict[str, str]]:
+    """Sibling hashes from leaf `index` up to the root, each tagged with its side."""
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append({"hash": level[sibling].hex(), "side": "left" if sibling < index else "right"})
+        index //= 2
+    return proof
+
+def verify_merkle_proof(evidence_hash: str, proof: List[Dict[str, str]], merkle_root: str) -> bool:
+    """Whether `proof` links `evidence_hash` to `merkle_root`; O(log n) hashes."""
+    try:
+        node = merkle_leaf(evidence_hash)
+        for step in proof:
+            sibling = bytes.fromhex(step["hash"])
+            node = merkle_node(sibling, node) if step["side"] == "left" else merkle_node(node, sibling)
+    except (KeyError, TypeError, ValueError):
+        return False
+    return node.hex() == merkle_root
+
+class EvidenceAnchor:
+    """
+    Batch evidence hashes and anchor only their Merkle root.
+
+    Hashes submitted within `window_s` of each other (or until `max_batch`
+    are waiting) go into one tree; the root is written to the network in a
+    single transaction, and every hash gets an inclusion proof stored under
+    `<directory>/proofs/`. Anyone holding a proof can check it against the
+    anchored root without the rest of the batch.
+    """
+
+    def __init__(self, window_s: Optional[float] = None, max_batch: Optional[int] = None, directory: Optional[str] = None):
+        self.window_s = settings.ANCHOR_WINDOW_S if window_s is None else window_s
+        self.max_batch = max_batch or settings.ANCHOR_MAX_BATCH
+        self.directory = directory or settings.ANCHOR_DIR
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _proof_path(self, evidence_hash: str) -> str:
+        name = hashlib.sha256(evidence_hash.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, "proofs", name[:2], f"{name}.json")
+
+    def _batch_path(self, merkle_root: str) -> str:
+        return os.path.join(self.directory, "batches", f"{merkle_root}.json")
+
+    def enqueue(self, evidence_hash: str) -> asyncio.Future:
+        """Add a hash to the current batch; the future resolves to its receipt once anchored."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Hashes queued on an event loop that has since closed (e.g. in a
+            # script or test run) stay queued; only their waiters are dropped
+            self._pending = {h: [] for h in self._pending}
+            self._timer = None
+            self._flushes = []
+            self._loop = loop
+        future = loop.create_future()
+        self._pending.setdefault(evidence_hash, []).append(future)
+        if len(self._pending) >= self.max_batch:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_s, self._start_flush)
+        return future
+
+    async def submit(self, evidence_hash: str) -> dict:
+        """Anchor a hash with the next batch and wait for its receipt."""
+        return await self.enqueue(evidence_hash)
+
+    def _start_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        task = asyncio.get_running_loop().create_task(self._anchor(batch))
+        self._flushes.append(task)
+        task.add_done_callback(self._flushes.remove)
+
+    async def _anchor(self, batch: Dict[str, List[asyncio.Future]]) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            receipts = await loop.run_in_executor(None, self._anchor_sync, list(batch))
+        except Exception as e:
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        for evidence_hash, futures in batch.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(receipts[evidence_hash])
+
+    def _anchor_sync(self, hashes: List[str]) -> Dict[str, dict]:
+        levels = build_merkle_tree([merkle_leaf(h) for h in hashes])
+        merkle_root = levels[-1][0].hex()
+        tx = _send_transaction({"merkle_root": merkle_root, "leaf_count": len(hashes)})
+        anchored_at = datetime.utcnow().isoformat() + "Z"
+
+        self._write_json(self._batch_path(merkle_root), {
+            "merkle_root": merkle_root,
+            "leaf_count": len(hashes),
+            "anchored_at": anchored_at,
+            **tx
+        })
+        receipts = {}
+        for index, evidence_hash in enumerate(hashes):
+            receipt = {
+                **tx,
+                "evidence_hash": evidence_hash,
+                "merkle_root": merkle_root,
+                "leaf_index": index,
+                "proof": merkle_proof(levels, index),
+                "anchored_at": anchored_at
+            }
+            self._write_json(self._proof_path(evidence_hash), receipt)
+            receipts[evidence_hash] = receipt
+        return receipts
+
+    @staticmethod
+    def _write_json(path: str, data: dict) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def get_receipt(self, evidence_hash: str) -> Optional[dict]:
+        """The stored receipt (root, transaction and proof) of an anchored hash."""
+        try:
+            with open(self._proof_path(evidence_hash)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def get_batch(self, merkle_root: str) -> Optional[dict]:
+        """The anchored batch record for a root, or None if this root was never anchored."""
+        if not all(c in "0123456789abcdef" for c in merkle_root) or len(merkle_root) != 64:
+            return None
+        try:
+            with open(self._batch_path(merkle_root)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def verify(self, evidence_hash: str, proof: List[Dict[str, str]], merkle_root: str) -> Tuple[bool, Optional[dict]]:
+        """
+        Check a proof and that its root was actually anchored.
+
+        Returns:
+            Tuple of (valid, anchored batch record or None)
+        """
+        batch = self.get_batch(merkle_root)
+        return batch is not None and verify_merkle_proof(evidence_hash, proof, merkle_root), batch
+
+    async def flush(self) -> None:
+        """Anchor whatever is pending now and wait for every batch in flight."""
+        self._start_flush()
+        if self._flushes:
+            await asyncio.gather(*list(self._flushes), return_exceptions=True)
+
+_anchor: Optional[EvidenceAnchor] = None
+
+def get_evidence_anchor() -> EvidenceAnchor:
+    """The process-wide evidence anchor."""
+    global _anchor
+    if _anchor is None:
+        _anchor = EvidenceAnchor()
+    return _anchor
+
+async def shutdown_evidence_anchor() -> None:
+    """Anchor any pending hashes (called on app shutdown)."""
+    if _anchor is not None:
+        await _anchor.flush()
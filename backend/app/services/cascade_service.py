@@ -0,0 +1,148 @@
+import time
+import asyncio
+import cv2
+import numpy as np
+from typing import Callable, Dict, List, Optional
+from PIL import Image
+from app.core.config import settings
+from app.services.unet_service import (
+    MODEL_IMPORTS_AVAILABLE, unet_available, preprocess_image, predict_batch_probabilities
+)
+
+# JPEG/PNG decode reductions OpenCV can apply while decoding
+REDUCED_DECODE_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+class CascadePolicy:
+    """
+    Which detections go through the cascade and where it draws the line.
+
+    A site whose prefilter score is at or below `escalate_above` is reported
+    as having no solar without running `models`; every other site escalates
+    to the full model (the 1024² UNet or a remote API).
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        models: Optional[List[str]] = None,
+        prefilter_size: Optional[int] = None,
+        escalate_above: Optional[float] = None
+    ):
+        self.enabled = settings.CASCADE_ENABLED if enabled is None else enabled
+        self.models = models if models is not None else [m.strip() for m in settings.CASCADE_MODELS.split(",") if m.strip()]
+        self.prefilter_size = prefilter_size or settings.CASCADE_PREFILTER_SIZE
+        self.escalate_above = settings.CASCADE_ESCALATE_ABOVE if escalate_above is None else escalate_above
+
+    def covers(self, model_type: str) -> bool:
+        return self.enabled and model_type in self.models
+
+    def describe(self) -> str:
+        return f"cascade:{self.prefilter_size}:{self.escalate_above:g}"
+
+def unet_prefilter_score(image: np.ndarray, size: int) -> float:
+    """Highest panel probability from one UNet pass at `size`² instead of full resolution."""
+    probabilities, _ = predict_batch_probabilities(preprocess_image(image, size))
+    return float(probabilities[0].max())
+
+def decode_for_prefilter(path: str, size: int) -> np.ndarray:
+    """
+    Decode an image at the smallest JPEG/PNG reduction that still covers
+    `size` pixels; the prefilter never needs the full-resolution pixels.
+    """
+    try:
+        with Image.open(path) as header:
+            shorter = min(header.size)
+    except Exception:
+        shorter = 0
+    flag = cv2.IMREAD_COLOR
+    for factor, reduced in REDUCED_DECODE_FLAGS:
+        if shorter // factor >= size:
+            flag = reduced
+            break
+    image = cv2.imread(path, flag)
+    if image is None:
+        raise FileNotFoundError(f"Image not found at {path}")
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+class Cascade:
+    """
+    Cheap prefilter in front of expensive detection.
+
+    `scorer(image, size)` returns how likely the image shows solar panels;
+    by default a UNet pass at CASCADE_PREFILTER_SIZE² (about 1/16 of the
+    full-resolution compute), available wherever the UNet is. Without a
+    scorer every site escalates. Counts escalations and prefilter and
+    full-model time, so the saving can be watched in /metrics/runtime.
+    """
+
+    def __init__(self, policy: Optional[CascadePolicy] = None, scorer: Optional[Callable[[np.ndarray, int], float]] = None):
+        self.policy = policy or CascadePolicy()
+        self._scorer = scorer
+        self.scored = 0
+        self.escalated = 0
+        self.screened_out = 0
+        self.prefilter_s = 0.0
+        self.full_model_runs = 0
+        self.full_model_s = 0.0
+
+    @property
+    def scorer(self) -> Optional[Callable[[np.ndarray, int], float]]:
+        if self._scorer is None and MODEL_IMPORTS_AVAILABLE and unet_available():
+            self._scorer = unet_prefilter_score
+        return self._scorer
+
+    def applies(self, model_type: str) -> bool:
+        """Whether detections with `model_type` are prefiltered."""
+        return self.policy.covers(model_type) and self.scorer is not None
+
+    async def score(self, image: np.ndarray) -> float:
+        start = time.perf_counter()
+        score = await asyncio.to_thread(self.scorer, image, self.policy.prefilter_size)
+        self.prefilter_s += time.perf_counter() - start
+        self.scored += 1
+        return score
+
+    async def score_path(self, path: str) -> float:
+        """Score an image file, decoding only as much of it as the prefilter needs."""
+        start = time.perf_counter()
+        image = await asyncio.to_thread(decode_for_prefilter, path, self.policy.prefilter_size)
+        self.prefilter_s += time.perf_counter() - start
+        return await self.score(image)
+
+    def escalate(self, score: float) -> bool:
+        """Decide (and count) whether a scored site goes to the full model."""
+        if score > self.policy.escalate_above:
+            self.escalated += 1
+            return True
+        self.screened_out += 1
+        return False
+
+    def record_full_model(self, seconds: float) -> None:
+        self.full_model_runs += 1
+        self.full_model_s += seconds
+
+    def stats(self) -> Dict[str, float]:
+        mean_full_s = self.full_model_s / self.full_model_runs if self.full_model_runs else 0.0
+        saved_s = self.screened_out * mean_full_s
+        return {
+            "enabled": self.policy.enabled,
+            "prefilter_available": self._scorer is not None,
+            "escalate_above": self.policy.escalate_above,
+            "scored": self.scored,
+            "escalated": self.escalated,
+            "screened_out": self.screened_out,
+            "escalation_rate": round(self.escalated / self.scored, 4) if self.scored else 0.0,
+            "mean_prefilter_ms": round(1000 * self.prefilter_s / self.scored, 2) if self.scored else 0.0,
+            "mean_full_model_ms": round(1000 * mean_full_s, 2),
+            # Full-model time the screened-out sites would have taken, less the prefilter's own cost
+            "saved_compute_s": round(saved_s - self.prefilter_s, 3)
+        }
+
+_cascade: Optional[Cascade] = None
+
+def get_cascade() -> Cascade:
+    """The process-wide detection cascade."""
+    global _cascade
+    if _cascade is None:
+        _cascade = Cascade()
+    return _cascade
@@ -1,12 +1,382 @@
 import os
+import json
 import uuid
+import asyncio
+import hashlib
+import zipfile
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from io import BytesIO
+from typing import Any, Dict, Iterable, List, Optional, Sequence
 from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+from reportlab.platypus import BaseDocTemplate, Flowable, Frame, PageBreak, PageTemplate, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import inch
 import qrcode
-from io import BytesIO
+from app.core.config import settings
+from app.services.artifact_service import get_artifact, register_artifact
+
+CERTIFICATE_DIR = "data/certificates"
+
+# Side of the QR code linking to the verification JSON
+QR_SIZE = 1.5 * inch
+QR_MASK_PATTERN = 0
+
+class _CertificateTemplate:
+    """
+    What every certificate shares, built once per process: the stylesheet
+    and the page layout.
+    """
+
+    def __init__(self):
+        styles = getSampleStyleSheet()
+        self.title_style = styles['Title']
+        self.normal_style = styles['Normal']
+        width, height = letter
+        self.frame_args = (inch, inch, width - 2 * inch, height - 2 * inch)
+
+    def doc(self, output) -> BaseDocTemplate:
+        # Frames keep layout state, so each document gets its own
+        frame = Frame(*self.frame_args, id='body')
+        return BaseDocTemplate(
+            output,
+            pagesize=letter,
+            pageTemplates=[PageTemplate(id='certificate', frames=[frame])],
+            title="Solar Installation Verification Certificate",
+            # No creation timestamp or random document ID: the same record
+            # always renders to the same bytes
+            invariant=1
+        )
+
+    def story(self, record: Dict[str, Any]) -> List:
+        sample_id = record["sample_id"]
+        story = [
+            Paragraph("Solar Installation Verification Certificate", self.title_style),
+            Spacer(1, 0.2 * inch),
+            Paragraph(f"Certificate ID: {record['certificate_id']}", self.normal_style),
+            Spacer(1, 0.2 * inch),
+        ]
+
+        details = [
+            f"Sample ID: {sample_id}",
+            f"Location: {record['lat']}, {record['lon']}",
+            f"Estimated Capacity: {record['capacity_kw_est']} kW",
+            f"Confidence Score: {record['confidence']}",
+            f"QC Status: {record['qc_status']}",
+            f"Issue Date: {record['issue_date']}"
+        ]
+        for detail in details:
+            story.append(Paragraph(detail, self.normal_style))
+            story.append(Spacer(1, 0.1 * inch))
+
+        # QR code linking to the verification JSON
+        story.append(Spacer(1, 0.2 * inch))
+        story.append(_QRCode(f"{settings.PUBLIC_BASE_URL}{settings.API_V1_STR}/site/{sample_id}", QR_SIZE))
+        return story
+
+class _QRCode(Flowable):
+    """QR code drawn as a single filled vector path: sharp at any zoom, cheap to render."""
+
+    def __init__(self, data: str, size: float):
+        super().__init__()
+        # A fixed mask pattern skips scoring all eight, most of qrcode's run time
+        qr = qrcode.QRCode(border=2, error_correction=qrcode.constants.ERROR_CORRECT_M, mask_pattern=QR_MASK_PATTERN)
+        qr.add_data(data)
+        qr.make(fit=True)
+        self.matrix = qr.get_matrix()
+        self.width = self.height = size
+
+    def draw(self):
+        modules = len(self.matrix)
+        step = self.width / modules
+        path = self.canv.beginPath()
+        for row, values in enumerate(self.matrix):
+            y = self.height - (row + 1) * step
+            column = 0
+            while column < modules:
+                if not values[column]:
+                    column += 1
+                    continue
+                # One rectangle per horizontal run of dark modules
+                start = column
+                while column < modules and values[column]:
+                    column += 1
+                path.rect(start * step, y, (column - start) * step, step)
+        self.canv.setFillColorRGB(0, 0, 0)
+        self.canv.drawPath(path, stroke=0, fill=1)
+
+_template: Optional[_CertificateTemplate] = None
+
+def _get_template() -> _CertificateTemplate:
+    global _template
+    if _template is None:
+        _template = _CertificateTemplate()
+    return _template
+
+# Certificate IDs are UUIDv5s in this namespace, named by the evidence hash
+CERTIFICATE_NAMESPACE = uuid.UUID("5f1d7a52-3c1e-4b8e-9a57-6d0f2b8c4e11")
+
+# Record fields that determine a certificate's content (the issue date is
+# fixed when the certificate is first rendered)
+CERTIFICATE_FIELDS = ("sample_id", "lat", "lon", "capacity_kw_est", "confidence", "qc_status", "evidence_hash")
+
+def certificate_fingerprint(record: Dict[str, Any]) -> str:
+    """SHA-256 over the canonical JSON of the fields printed on a certificate."""
+    canonical = json.dumps({key: record.get(key) for key in CERTIFICATE_FIELDS}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def certificate_record(
+    sample_id: str,
+    lat: float,
+    lon: float,
+    capacity_kw_est: float,
+    confidence: float,
+    qc_status: str,
+    evidence_hash: Optional[str] = None,
+    issue_date: Optional[str] = None,
+    **extra: Any
+) -> Dict[str, Any]:
+    """
+    The fields printed on a certificate, plus any extra keys (e.g. district).
+
+    The certificate ID is derived from the verification's evidence hash (or,
+    without one, from the printed fields), so re-issuing an unchanged
+    verification yields the same ID.
+    """
+    record = {
+        "sample_id": sample_id,
+        "lat": lat,
+        "lon": lon,
+        "capacity_kw_est": capacity_kw_est,
+        "confidence": confidence,
+        "qc_status": qc_status,
+        "evidence_hash": evidence_hash,
+        "issue_date": issue_date or datetime.now().strftime('%Y-%m-%d'),
+        **extra
+    }
+    record["fingerprint"] = certificate_fingerprint(record)
+    record["certificate_id"] = str(uuid.uuid5(CERTIFICATE_NAMESPACE, evidence_hash or record["fingerprint"]))
+    return record
+
+class CertificateCache:
+    """
+    Rendered certificates by record fingerprint.
+
+    PDFs live on disk as `<directory>/<fingerprint>.pdf`, with the most
+    recently used ones also kept in memory. An unchanged record is served
+    from here with its original bytes (and issue date) instead of being
+    rendered again.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_memory_entries: Optional[int] = None):
+        self.directory = directory or os.path.join(CERTIFICATE_DIR, "cache")
+        self.max_memory_entries = max_memory_entries or settings.CERTIFICATE_CACHE_MEMORY_ENTRIES
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, fingerprint: str) -> str:
+        return os.path.join(self.directory, f"{fingerprint}.pdf")
+
+    def _remember(self, fingerprint: str, pdf: bytes) -> None:
+        with self._lock:
+            self._memory[fingerprint] = pdf
+            self._memory.move_to_end(fingerprint)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, fingerprint: str) -> Optional[bytes]:
+        """Cached PDF bytes, counting the lookup as a hit or a miss."""
+        with self._lock:
+            pdf = self._memory.get(fingerprint)
+            if pdf is not None:
+                self._memory.move_to_end(fingerprint)
+                self.hits += 1
+                return pdf
+        try:
+            with open(self._path(fingerprint), "rb") as f:
+                pdf = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        self._remember(fingerprint, pdf)
+        with self._lock:
+            self.hits += 1
+        return pdf
+
+    def put(self, fingerprint: str, pdf: bytes) -> None:
+        path = self._path(fingerprint)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(pdf)
+        os.replace(tmp_path, path)
+        self._remember(fingerprint, pdf)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+_certificate_cache: Optional[CertificateCache] = None
+
+def get_certificate_cache() -> CertificateCache:
+    """The process-wide certificate cache."""
+    global _certificate_cache
+    if _certificate_cache is None:
+        _certificate_cache = CertificateCache()
+    return _certificate_cache
+
+def render_certificate_pdf(record: Dict[str, Any]) -> bytes:
+    """Render one certificate to PDF bytes."""
+    template = _get_template()
+    buffer = BytesIO()
+    template.doc(buffer).build(template.story(record))
+    return buffer.getvalue()
+
+def render_bulk_pdf(records: Sequence[Dict[str, Any]]) -> bytes:
+    """Render many certificates as the pages of a single PDF."""
+    template = _get_template()
+    story = []
+    for i, record in enumerate(records):
+        if i:
+            story.append(PageBreak())
+        story.extend(template.story(record))
+    buffer = BytesIO()
+    template.doc(buffer).build(story)
+    return buffer.getvalue()
+
+def _render_chunk(records: Sequence[Dict[str, Any]]) -> List[bytes]:
+    return [render_certificate_pdf(record) for record in records]
+
+def _init_worker() -> None:
+    # Build the stylesheet and layout before the first task arrives
+    _get_template()
+
+class CertificateEngine:
+    """
+    Render certificates in a pool of worker processes.
+
+    ReportLab layout is pure Python and holds the GIL, so certificates for a
+    district batch are spread over processes in chunks; each worker builds
+    the shared template once at start-up.
+    """
+
+    def __init__(self, workers: Optional[int] = None, chunk_size: Optional[int] = None):
+        self.workers = workers or settings.CERTIFICATE_WORKERS
+        self.chunk_size = chunk_size or settings.CERTIFICATE_CHUNK_SIZE
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+
+    async def render(self, record: Dict[str, Any]) -> bytes:
+        """PDF bytes of one certificate."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, render_certificate_pdf, record)
+
+    async def render_many(
+        self,
+        records: Sequence[Dict[str, Any]],
+        cache: Optional[CertificateCache] = None
+    ) -> List[bytes]:
+        """
+        PDF bytes of every certificate, in order.
+
+        With a cache, only records whose fingerprint isn't cached are rendered.
+        """
+        pdfs: List[Optional[bytes]] = [None] * len(records)
+        pending = list(range(len(records)))
+        if cache is not None:
+            pending = []
+            for i, record in enumerate(records):
+                pdfs[i] = cache.get(record["fingerprint"])
+                if pdfs[i] is None:
+                    pending.append(i)
+
+        loop = asyncio.get_running_loop()
+        chunks = [pending[i:i + self.chunk_size] for i in range(0, len(pending), self.chunk_size)]
+        rendered = await asyncio.gather(*(
+            loop.run_in_executor(self._executor, _render_chunk, [records[i] for i in chunk]) for chunk in chunks
+        ))
+        for chunk, chunk_pdfs in zip(chunks, rendered):
+            for i, pdf in zip(chunk, chunk_pdfs):
+                pdfs[i] = pdf
+                if cache is not None:
+                    cache.put(records[i]["fingerprint"], pdf)
+        return pdfs
+
+    async def render_bulk(self, records: Sequence[Dict[str, Any]]) -> bytes:
+        """One multi-page PDF holding every certificate."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, render_bulk_pdf, list(records))
+
+    async def write_district_zips(
+        self,
+        records: Sequence[Dict[str, Any]],
+        output_dir: str,
+        district_key: str = "district",
+        cache: Optional[CertificateCache] = None
+    ) -> Dict[str, str]:
+        """
+        Write one zip of certificate PDFs per district.
+
+        Records without `district_key` go into "unassigned.zip".
+
+        Returns:
+            Mapping of district to zip path
+        """
+        by_district: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for record in records:
+            by_district[str(record.get(district_key) or "unassigned")].append(record)
+
+        os.makedirs(output_dir, exist_ok=True)
+        loop = asyncio.get_running_loop()
+        paths = {}
+        for district, district_records in by_district.items():
+            pdfs = await self.render_many(district_records, cache)
+            path = os.path.join(output_dir, f"{_safe_filename(district)}.zip")
+            await loop.run_in_executor(None, _write_zip, path, district_records, pdfs)
+            paths[district] = path
+        return paths
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+def _safe_filename(name: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in name) or "unassigned"
+
+def _write_zip(path: str, records: Iterable[Dict[str, Any]], pdfs: Iterable[bytes]) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    # PDFs are already compressed; storing them keeps zipping I/O-bound
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_STORED) as archive:
+        for record, pdf in zip(records, pdfs):
+            archive.writestr(f"{_safe_filename(record['sample_id'])}_certificate.pdf", pdf)
+    os.replace(tmp_path, path)
+
+_engine: Optional[CertificateEngine] = None
+_engine_lock = threading.Lock()
+
+def get_certificate_engine() -> CertificateEngine:
+    """The process-wide certificate engine, started on first use."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = CertificateEngine()
+    return _engine
+
+def shutdown_certificate_engine() -> None:
+    """Stop the engine's workers if it was started (called on app shutdown)."""
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.close()
+            _engine = None
 
 async def generate_certificate(
     sample_id: str,
@@ -14,11 +384,15 @@ async def generate_certificate(
     lon: float,
     capacity_kw_est: float,
     confidence: float,
-    qc_status: str
+    qc_status: str,
+    evidence_hash: Optional[str] = None
 ) -> str:
     """
     Generate a digital certificate PDF for a verified solar installation.
-    
+
+    Re-issuing an unchanged verification returns the existing PDF; only a
+    changed record is rendered again.
+
     Args:
         sample_id: The sample ID
         lat: Latitude
@@ -26,63 +400,34 @@ async def generate_certificate(
         capacity_kw_est: Estimated capacity in kW
         confidence: Confidence score
         qc_status: Quality control status
-        
+        evidence_hash: The verification's detection_evidence_hash; the
+            certificate ID is derived from it
+
     Returns:
         Path to the generated certificate PDF
     """
     # Create certificates directory if it doesn't exist
-    cert_dir = "data/certificates"
-    os.makedirs(cert_dir, exist_ok=True)
-    
-    # Generate certificate filename
-    cert_filename = f"{sample_id}_certificate.pdf"
-    cert_path = os.path.join(cert_dir, cert_filename)
-    
-    # Create PDF
-    doc = SimpleDocTemplate(cert_path, pagesize=letter)
-    styles = getSampleStyleSheet()
-    story = []
-    
-    # Title
-    title = Paragraph("Solar Installation Verification Certificate", styles['Title'])
-    story.append(title)
-    story.append(Spacer(1, 0.2*inch))
-    
-    # Certificate ID
-    cert_id = str(uuid.uuid4())
-    cert_id_para = Paragraph(f"Certificate ID: {cert_id}", styles['Normal'])
-    story.append(cert_id_para)
-    story.append(Spacer(1, 0.2*inch))
-    
-    # Details
-    details = [
-        f"Sample ID: {sample_id}",
-        f"Location: {lat}, {lon}",
-        f"Estimated Capacity: {capacity_kw_est} kW",
-        f"Confidence Score: {confidence}",
-        f"QC Status: {qc_status}",
-        f"Issue Date: {datetime.now().strftime('%Y-%m-%d')}"
-    ]
-    
-    for detail in details:
-        para = Paragraph(detail, styles['Normal'])
-        story.append(para)
-        story.append(Spacer(1, 0.1*inch))
-    
-    # QR Code linking to verification JSON
-    qr_data = f"http://localhost:8000/api/v1/site/{sample_id}"
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(qr_data)
-    qr.make(fit=True)
-    
-    qr_img = qr.make_image(fill_color="black", back_color="white")
-    qr_buffer = BytesIO()
-    qr_img.save(qr_buffer, format='PNG')
-    
-    # Note: In a real implementation, we would add the QR code to the PDF
-    # For simplicity, we're just generating it here
-    
-    # Build PDF
-    doc.build(story)
-    
-    return cert_path
\ No newline at end of file
+    os.makedirs(CERTIFICATE_DIR, exist_ok=True)
+    cert_path = os.path.join(CERTIFICATE_DIR, f"{sample_id}_certificate.pdf")
+
+    record = certificate_record(sample_id, lat, lon, capacity_kw_est, confidence, qc_status, evidence_hash)
+    cache = get_certificate_cache()
+    pdf = cache.get(record["fingerprint"])
+    if pdf is None:
+        pdf = await get_certificate_engine().render(record)
+        cache.put(record["fingerprint"], pdf)
+
+    # Nothing to write when the site already serves these exact bytes
+    current = get_artifact(sample_id, "certificate")
+    if current and current["digest"] == hashlib.sha256(pdf).hexdigest() and os.path.exists(cert_path):
+        return cert_path
+
+    tmp_path = f"{cert_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(pdf)
+    os.replace(tmp_path, cert_path)
+
+    # Serve it through GET /site/{sample_id}/artifact/certificate
+    register_artifact(sample_id, "certificate", cert_path)
+
+    return cert_path
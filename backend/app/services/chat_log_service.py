@@ -0,0 +1,163 @@
+import time
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.models import ChatMessage
+
+class ChatLogWriter:
+    """
+    Write-behind log of chat messages.
+
+    The chat endpoint only appends to an in-memory queue and answers straight
+    away. A background task inserts the queued rows in batches: as soon as
+    `batch_size` rows are waiting, and otherwise every `flush_interval_s`
+    seconds. When `max_pending` rows are already waiting (the database is
+    down or too slow) new rows are dropped and counted rather than letting
+    the queue grow without bound.
+    """
+
+    def __init__(
+        self,
+        max_pending: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        flush_interval_s: Optional[float] = None,
+        session_factory=None
+    ):
+        self.max_pending = max_pending or settings.CHAT_LOG_MAX_PENDING
+        self.batch_size = batch_size or settings.CHAT_LOG_BATCH_SIZE
+        self.flush_interval_s = flush_interval_s or settings.CHAT_LOG_FLUSH_INTERVAL_S
+        self.session_factory = session_factory or AsyncSessionLocal
+        self._pending: Deque[Tuple[float, Dict[str, Any]]] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._closing = False
+        self._in_flight = 0
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_lag_s = 0.0
+        self.max_lag_s = 0.0
+
+    def _event(self) -> asyncio.Event:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        return self._wakeup
+
+    def submit(self, lang: str, message: str, response: str, context: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Queue a chat message for the database.
+
+        Returns:
+            False if the queue was full and the message was dropped
+        """
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return False
+        self._pending.append((time.monotonic(), {
+            "lang": lang,
+            "message": message,
+            "response": response,
+            "context": context
+        }))
+        self.enqueued += 1
+        if len(self._pending) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    async def _write_batch(self, batch: List[Tuple[float, Dict[str, Any]]]) -> None:
+        try:
+            async with self.session_factory() as session:
+                session.add_all([ChatMessage(**row) for _, row in batch])
+                await session.commit()
+        except Exception as e:
+            # Logging must never take the chatbot down; count the loss instead
+            self.failed += len(batch)
+            print(f"Error writing {len(batch)} chat log rows: {e}")
+            return
+        lag = time.monotonic() - batch[0][0]
+        self.written += len(batch)
+        self.batches += 1
+        self.last_lag_s = lag
+        self.max_lag_s = max(self.max_lag_s, lag)
+
+    async def flush(self) -> None:
+        """Write everything queued so far, in batches of at most `batch_size`."""
+        while self._pending:
+            batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            self._in_flight = len(batch)
+            try:
+                await self._write_batch(batch)
+            finally:
+                self._in_flight = 0
+
+    async def run(self) -> None:
+        """Flush on size or time until close() is called."""
+        wakeup = self._event()
+        while not self._closing:
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=self.flush_interval_s)
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+            await self.flush()
+
+    def close(self) -> None:
+        """Ask run() to write what is left and return."""
+        self._closing = True
+        self._event().set()
+
+    def stats(self) -> Dict[str, float]:
+        oldest = time.monotonic() - self._pending[0][0] if self._pending else 0.0
+        return {
+            "pending": len(self._pending),
+            "oldest_pending_s": round(oldest, 3),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "last_lag_s": round(self.last_lag_s, 3),
+            "max_lag_s": round(self.max_lag_s, 3)
+        }
+
+_writer: Optional[ChatLogWriter] = None
+_writer_task: Optional[asyncio.Task] = None
+
+def get_chat_log_writer() -> ChatLogWriter:
+    """The process-wide chat log writer."""
+    global _writer
+    if _writer is None:
+        _writer = ChatLogWriter()
+    return _writer
+
+def start_chat_log_writer() -> None:
+    """Start the background writer (called on app startup)."""
+    global _writer_task
+    if _writer_task is None:
+        _writer_task = asyncio.get_running_loop().create_task(get_chat_log_writer().run())
+
+async def stop_chat_log_writer(timeout_s: Optional[float] = None) -> None:
+    """
+    Write the queued chat messages and stop the writer (called on app
+    shutdown). Whatever can't be written within `timeout_s` is counted as
+    dropped.
+    """
+    global _writer_task
+    if _writer_task is None:
+        return
+    writer = get_chat_log_writer()
+    writer.close()
+    try:
+        await asyncio.wait_for(_writer_task, timeout=timeout_s or settings.CHAT_LOG_SHUTDOWN_TIMEOUT_S)
+    except asyncio.TimeoutError:
+        # The task was cancelled, possibly halfway through a batch
+        writer.dropped += len(writer._pending) + writer._in_flight
+        writer._pending.clear()
+        print("Timed out writing queued chat log rows on shutdown")
+    # Ready to be started again (e.g. by the next app lifespan in tests)
+    writer._closing = False
+    writer._wakeup = None
+    _writer_task = None
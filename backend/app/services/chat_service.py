@@ -1,80 +1,289 @@
+import os
+import re
+import json
+import time
+import hashlib
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 from app.models.schemas import ChatRequest, ChatResponse
-from app.core.database import get_db
-from app.models.models import ChatMessage
+from app.core.config import settings
+from app.services.chat_log_service import get_chat_log_writer
 
-async def process_chat_message(request: ChatRequest) -> ChatResponse:
+GENERAL_INTENT = "general"
+
+def keyword_forms(keyword: str) -> Set[str]:
     """
-    Process a chat message.
-    This is a mock implementation for demonstration.
+    The forms of a keyword to match: case-folded, both composed (NFC) and
+    decomposed (NFD). Devanagari nukta letters, for one, are typed either way.
+    Covering both here means messages need only case folding.
+    """
+    folded = keyword.strip().casefold()
+    return {unicodedata.normalize("NFC", folded), unicodedata.normalize("NFD", folded)} - {""}
+
+def normalize_query(message: str) -> str:
+    """Canonical form of a chat message: NFC, case-folded, whitespace collapsed."""
+    if not message.isascii():
+        message = unicodedata.normalize("NFC", message)
+    return " ".join(message.casefold().split())
+
+class KeywordMatcher:
+    """
+    Keyword trie over every intent in every language, compiled to one regex.
+
+    The trie becomes nested alternations grouped by shared prefix, so the regex
+    engine scans a message once, in C, with a single branch per character
+    however many keywords there are. Matches are leftmost-longest and do not
+    overlap. Each keyword carries the rank of its intent. The lowest-ranked
+    intent matched wins, so intents listed first in the catalog take
+    precedence, as the old chain of `if` checks did.
+    """
+
+    def __init__(self, keywords: Iterable[Tuple[str, int]]):
+        self._rank: Dict[str, int] = {}
+        for keyword, rank in keywords:
+            for form in keyword_forms(keyword):
+                self._rank[form] = min(self._rank.get(form, rank), rank)
+        trie: dict = {}
+        for keyword in self._rank:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[""] = True
+        self._pattern = re.compile(self._trie_pattern(trie)) if self._rank else None
+
+    @classmethod
+    def _trie_pattern(cls, node: dict) -> str:
+        branches = [re.escape(char) + cls._trie_pattern(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # A keyword ending here: the longer keywords through this node are optional
+        return f"(?:{pattern})?" if "" in node else pattern
+
+    def __len__(self) -> int:
+        return len(self._rank)
+
+    def best_rank(self, text: str) -> Optional[int]:
+        """Lowest rank of any keyword in `text`, or None."""
+        if self._pattern is None:
+            return None
+        best = None
+        for keyword in self._pattern.findall(text.casefold()):
+            rank = self._rank[keyword]
+            if best is None or rank < best:
+                best = rank
+                if best == 0:
+                    break
+        return best
+
+class ChatCatalog:
     """
-    # Mock responses based on intent
-    intent_responses = {
-        "eligibility_check": {
-            "en": "To check your eligibility for PM Surya Ghar, you need to be a resident of India with a suitable rooftop. The roof should have adequate space and structural integrity for solar panel installation.",
-            "hi": "पीएम सूर्य घर के लिए पात्रता की जांच करने के लिए, आपको भारत का निवासी होना चाहिए जिसके पास सौर पैनल स्थापना के लिए पर्याप्त स्थान और संरचनात्मक अखंडता वाली एक उपयुक्त छत हो।",
-            "ml": "പിഎം സൂര്യ ഘർ എന്നതിന് പാത്രത പരിശോധിക്കാൻ, നിങ്ങൾ സൗര പാനൽ ഇൻസ്റ്റാളേഷന് ആവശ്യമായ മതിയായ സ്ഥലവും ഘടനാപരമായ അഖണ്ഡതയുള്ള ഒരു ഉചിതമായ മേൽക്കൂരയുള്ള ഇന്ത്യയിലെ ഒരു താമസക്കാരനായിരിക്കണം.",
-            "ta": "பிஎம் சூரியா காட்டிற்கு தகுதி சோதிக்க, நீங்கள் சோலார் பேனல் நிறுவலுக்கு போதுமான இடம் மற்றும் கட்டுமான நேர்மையைக் கொண்ட ஏற்ற வகையிலான கூரையைக் கொண்ட இந்தியாவின் குடிமகனாக இருக்க வேண்டும்."
-        },
-        "application_steps": {
-            "en": "To apply for PM Surya Ghar: 1) Register on the official portal, 2) Submit required documents, 3) Get your rooftop assessed, 4) Receive approval and subsidy details, 5) Install solar panels through empaneled vendors.",
-            "hi": "पीएम सूर्य घर के लिए आवेदन करने के लिए: 1) आधिकारिक पोर्टल पर पंजीकरण करें, 2) आवश्यक दस्तावेज जमा करें, 3) अपनी छत का आकलन करवाएं, 4) अनुमोदन और सब्सिडी विवरण प्राप्त करें, 5) सूचीबद्ध विक्रेताओं के माध्यम से सौर पैनल स्थापित करें।",
-            "ml": "പിഎം സൂര്യഘർ എന്നതിന് അപേക്ഷിക്കാൻ: 1) ഔദ്യോഗിക പോർട്ടലിൽ രജിസ്റ്റർ ചെയ്യുക, 2) ആവശ്യമായ പ്രമാണങ്ങൾ സമർപ്പിക്കുക, 3) നിങ്ങളുടെ മേൽക്കൂര വിലയിരുത്താൻ നൽകുക, 4) അംഗീകാരവും സബ്സിഡി വിശദാംശങ്ങളും സ്വീകരിക്കുക, 5) എംപനൽ ചെയ്ത വിൽപ്പനക്കാരന്മാർ വഴി സൗര പാനൽ ഇൻസ്റ്റാൾ ചെയ്യുക.",
-            "ta": "பிஎம் சூரியா காட்டிற்கு விண்ணப்பிக்க: 1) அதிகாரபூர்வ வலைத்தளத்தில் பதிவு செய்யவும், 2) தேவையான ஆவணங்களை சமர்ப்பிக்கவும், 3) உங்கள் கூரையை மதிப்பீடு செய்ய வைக்கவும், 4) அங்கீகாரம் மற்றும் மானிய விவரங்களைப் பெறுங்கள், 5) பட்டியலிடப்பட்ட விற்பனையாளர்கள் மூலம் சோலார் பேனல்களை நிறுவவும்."
-        },
-        "required_documents": {
-            "en": "Required documents for PM Surya Ghar: 1) Aadhaar card, 2) Electricity bill, 3) Property ownership proof, 4) Bank account details, 5) Passport size photo.",
-            "hi": "पीएम सूर्य घर के लिए आवश्यक दस्तावेज: 1) आधार कार्ड, 2) बिजली बिल, 3) संपत्ति स्वामित्व प्रमाण, 4) बैंक खाता विवरण, 5) पासपोर्ट आकार की तस्वीर।",
-            "ml": "പിഎം സൂര്യഘർ എന്നതിന് ആവശ്യമായ പ്രമാണങ്ങൾ: 1) ആധാർ കാർഡ്, 2) വൈദ്യുതി ബിൽ, 3) സ്വത്തിന്റെ ഉടമസ്ഥാവകാശ തെളിവ്, 4) ബാങ്ക് അക്കൗണ്ട് വിശദാംശങ്ങൾ, 5) പാസ്പോർട്ട് വലിപ്പ ഫോട്ടോ.",
-            "ta": "பிஎம் சூரியா காட்டிற்கு தேவையான ஆவணங்கள்: 1) ஆதார் கார்டு, 2) மின்சார பில், 3) சொத்து உரிமை சான்று, 4) வங்கி கணக்கு விவரங்கள், 5) கடமை அளவு புகைப்படம்."
-        },
-        "grievance_procedure": {
-            "en": "For grievances related to PM Surya Ghar: Contact the helpline number 1800-123-4567 or email support@pmsuryaghar.gov.in. You can also visit the nearest district office with your application number and details of the issue.",
-            "hi": "पीएम सूर्य घर से संबंधित शिकायतों के लिए: हेल्पलाइन नंबर 1800-123-4567 पर संपर्क करें या support@pmsuryaghar.gov.in पर ईमेल करें। आप अपने आवेदन संख्या और समस्या के विवरण के साथ निकटतम जिला कार्यालय भी जा सकते हैं।",
-            "ml": "പിഎം സൂര്യഘർ എന്നതുമായി ബന്ധപ്പെട്ട പരാതികൾക്ക്: ഹെൽപ്പ് ലൈൻ നമ്പർ 1800-123-4567 എന്നതിൽ ബന്ധപ്പെടുക അല്ലെങ്കിൽ support@pmsuryaghar.gov.in എന്നതിലേക്ക് ഇമെയിൽ ചെയ്യുക. നിങ്ങളുടെ അപേക്ഷണ നമ്പറും പ്രശ്നത്തിന്റെ വിശദാംശങ്ങളും കൊണ്ട് ഏറ്റവും അടുത്തുള്ള ജില്ലാ ഓഫീസിലേക്ക് ചെന്ന് സന്ദർശിക്കാം.",
-            "ta": "பிஎம் சூரியா காட்டுடன் தொடர்புடைய மனநிலைகளுக்கு: உதவி எண் 1800-123-4567 ஐ தொடர்பு கொள்ளவும் அல்லது support@pmsuryaghar.gov.in க்கு மின்னஞ்சல் அனுப்பவும். உங்கள் விண்ணப்ப எண் மற்றும் சிக்கலின் விவரங்களுடன் அருகிலுள்ள மாவட்ட அலுவலகத்தை நீங்கள் பார்வையிடலாம்."
+    One loaded version of the response catalog (intents, their keywords and
+    responses per language) with its keyword matcher compiled. Never
+    modified after construction; a reload builds a new one.
+    """
+
+    def __init__(self, data: dict, version: str):
+        self.version = version
+        self.default_lang: str = data.get("default_lang", "en")
+        self.unsupported_language_response: str = data["unsupported_language_response"]
+        self.general: Dict[str, str] = data["general"]
+        self.intents: List[str] = [entry["intent"] for entry in data["intents"]]
+        self.responses: Dict[str, Dict[str, str]] = {
+            entry["intent"]: entry["responses"] for entry in data["intents"]
         }
-    }
-    
-    # Determine intent from message (simplified)
-    message_lower = request.message.lower()
-    intent = "general"
-    if "eligibility" in message_lower or "eligible" in message_lower:
-        intent = "eligibility_check"
-    elif "apply" in message_lower or "application" in message_lower or "step" in message_lower:
-        intent = "application_steps"
-    elif "document" in message_lower or "paper" in message_lower:
-        intent = "required_documents"
-    elif "complaint" in message_lower or "issue" in message_lower or "problem" in message_lower:
-        intent = "grievance_procedure"
-    
-    # Get response based on intent and language
-    response_text = intent_responses.get(intent, {}).get(request.lang, "I'm sorry, I didn't understand your question. Please try rephrasing or ask about eligibility, application steps, required documents, or grievance procedures.")
-    
-    # If no specific intent found, provide a general response
-    if intent == "general":
-        response_text = "I'm here to help with PM Surya Ghar information. You can ask about eligibility, application steps, required documents, or grievance procedures."
-        if request.lang != "en":
-            # Add translation for non-English languages
-            translations = {
-                "hi": "मैं पीएम सूर्य घर की जानकारी में मदद करने के लिए यहां हूं। आप पात्रता, आवेदन चरणों, आवश्यक दस्तावेजों या शिकायत प्रक्रिया के बारे में पूछ सकते हैं।",
-                "ml": "പിഎം സൂര്യഘർ വിവരങ്ങളിൽ ഞാൻ സഹായിക്കാൻ ഇവിടെയുണ്ട്. പാത്രത, അപേക്ഷണ ഘട്ടങ്ങൾ, ആവശ്യമായ പ്രമാണങ്ങൾ അല്ലെങ്കിൽ പരാതി നടപടികൾ എന്നിവയെക്കുറിച്ച് നിങ്ങൾക്ക് ചോദിക്കാം.",
-                "ta": "பிஎம் சூரியா காட்டு தகவல்களில் உதவ நான் இங்கே உள்ளேன். தகுதி, விண்ணப்ப படிகள், தேவையான ஆவணங்கள் அல்லது மனநிலை நடபடிகள் பற்றி நீங்கள் கேட்கலாம்."
-            }
-            response_text = translations.get(request.lang, response_text)
-    
-    # Save chat message to database
-    async with get_db() as db:
-        chat_message = ChatMessage(
-            lang=request.lang,
-            message=request.message,
-            response=response_text,
-            context=request.context
+        self.matcher = KeywordMatcher(
+            (keyword, rank)
+            for rank, entry in enumerate(data["intents"])
+            for keywords in entry["keywords"].values()
+            for keyword in keywords
         )
-        db.add(chat_message)
-        await db.commit()
-    
+
+    @classmethod
+    def from_file(cls, path: str) -> "ChatCatalog":
+        with open(path, "rb") as f:
+            raw = f.read()
+        return cls(json.loads(raw), hashlib.sha256(raw).hexdigest()[:16])
+
+    def classify(self, message: str) -> str:
+        """Intent of a message in any of the catalog's languages."""
+        rank = self.matcher.best_rank(message)
+        return GENERAL_INTENT if rank is None else self.intents[rank]
+
+    def response(self, intent: str, lang: str) -> str:
+        if intent == GENERAL_INTENT:
+            return self.general.get(lang, self.general[self.default_lang])
+        return self.responses[intent].get(lang, self.unsupported_language_response)
+
+class ChatResponseCache:
+    """
+    LRU cache of (intent, response) by language and message.
+
+    Entries are stored under the normalised message and also under the
+    message exactly as received, so a repeated question is answered with a
+    single dict lookup, without normalising or classifying it again.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or settings.CHAT_CACHE_SIZE
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, lang: str, message: str) -> Optional[Tuple[str, str]]:
+        key = (lang, message)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, lang: str, message: str, entry: Tuple[str, str]) -> None:
+        key = (lang, message)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.invalidations += 1
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations
+        }
+
+class ChatEngine:
+    """
+    Serves chat responses from a catalog file loaded once.
+
+    The file is checked for changes (mtime and size) at most every
+    `reload_interval_s` seconds and reloaded when it changes, so responses
+    and keywords can be edited without a restart. A catalog that fails to
+    load is reported and the previous one kept.
+
+    Answers are cached per catalog version: the cache is emptied whenever a
+    different catalog is loaded.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        reload_interval_s: Optional[float] = None,
+        cache_size: Optional[int] = None
+    ):
+        self.path = path or settings.CHAT_CATALOG_PATH
+        self.reload_interval_s = settings.CHAT_CATALOG_RELOAD_S if reload_interval_s is None else reload_interval_s
+        self.cache = ChatResponseCache(cache_size)
+        self._cached_version: Optional[str] = None
+        self._catalog: Optional[ChatCatalog] = None
+        self._file_key: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+        self.reloads = 0
+
+    def _stat_key(self) -> Tuple[int, int]:
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload(self) -> bool:
+        """
+        Load the catalog file now.
+
+        Returns:
+            True if the catalog was (re)loaded, False if the file was invalid
+            and the current catalog kept
+        """
+        try:
+            file_key = self._stat_key()
+            catalog = ChatCatalog.from_file(self.path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            if self._catalog is None:
+                raise
+            print(f"Error reloading chat catalog {self.path}: {e}")
+            return False
+        self._catalog, self._file_key = catalog, file_key
+        self.reloads += 1
+        return True
+
+    @property
+    def catalog(self) -> ChatCatalog:
+        """The current catalog, reloaded first if the file has changed."""
+        now = time.monotonic()
+        if self._catalog is None:
+            self.reload()
+            self._checked_at = now
+        elif now - self._checked_at >= self.reload_interval_s:
+            self._checked_at = now
+            try:
+                changed = self._stat_key() != self._file_key
+            except OSError:
+                changed = False
+            if changed:
+                self.reload()
+        return self._catalog
+
+    def respond(self, message: str, lang: str) -> Tuple[str, str]:
+        """
+        Returns:
+            Tuple of (intent, response text)
+        """
+        catalog = self.catalog
+        if catalog.version != self._cached_version:
+            if self._cached_version is not None:
+                self.cache.clear()
+            self._cached_version = catalog.version
+
+        entry = self.cache.get(lang, message)
+        if entry is not None:
+            self.cache.hits += 1
+            return entry
+
+        normalized = normalize_query(message)
+        entry = self.cache.get(lang, normalized)
+        if entry is not None:
+            self.cache.hits += 1
+        else:
+            self.cache.misses += 1
+            intent = catalog.classify(normalized)
+            entry = (intent, catalog.response(intent, lang))
+            self.cache.put(lang, normalized, entry)
+        if normalized != message:
+            self.cache.put(lang, message, entry)
+        return entry
+
+_engine: Optional[ChatEngine] = None
+
+def get_chat_engine() -> ChatEngine:
+    """The process-wide chat engine."""
+    global _engine
+    if _engine is None:
+        _engine = ChatEngine()
+    return _engine
+
+async def process_chat_message(request: ChatRequest) -> ChatResponse:
+    """
+    Process a chat message.
+
+    The intent is recognised from keywords in English, Hindi, Malayalam or
+    Tamil, whatever `lang` the answer is requested in.
+    """
+    _, response_text = get_chat_engine().respond(request.message, request.lang)
+
+    # Logged write-behind; the answer doesn't wait for the database
+    get_chat_log_writer().submit(request.lang, request.message, response_text, request.context)
+
     return ChatResponse(
         response=response_text,
         lang=request.lang,
         context=request.context
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,302 @@
+import asyncio
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from multiprocessing import shared_memory
+from typing import AsyncIterator, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+import cv2
+from app.core.config import settings
+from app.services.tile_store_service import TileStore
+from app.services.unet_service import preprocess_image_into
+
+class DecodedImage(NamedTuple):
+    path: str
+    # (1, 3, S, S) float32 view into shared memory; only valid until the next
+    # item is requested from DecodePool.imap (or the decode() block exits)
+    tensor: np.ndarray
+    # (height, width) of the image before resizing
+    shape: Tuple[int, int]
+
+class TileBatch(NamedTuple):
+    sample_ids: List[str]
+    # (N, H, W, C) uint8 memmap view of the stored tiles
+    tiles: np.ndarray
+    # (N, 3, S, S) float32 view into shared memory, valid until the next
+    # batch is requested from DecodePool.tile_batches
+    tensor: np.ndarray
+
+# Shared-memory slots attached in each worker process, by slot number
+_worker_buffers: List[shared_memory.SharedMemory] = []
+
+def _init_worker(names: List[str]) -> None:
+    # One OpenCV thread per process; the pool itself provides the parallelism
+    cv2.setNumThreads(1)
+    # Pool workers share the parent's resource tracker, so attaching doesn't
+    # register the segments a second time; the parent unlinks them in close()
+    _worker_buffers[:] = [shared_memory.SharedMemory(name=name) for name in names]
+
+def _decode_into_slot(path: str, slot: int, size: int) -> Tuple[int, int]:
+    image = cv2.imread(path, cv2.IMREAD_COLOR)
+    if image is None:
+        raise FileNotFoundError(f"Image not found at {path}")
+    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    out = np.ndarray((3, size, size), dtype=np.float32, buffer=_worker_buffers[slot].buf)
+    preprocess_image_into(image, out)
+    return image.shape[:2]
+
+def _preprocess_tiles_into_slot(
+    root: str,
+    tile_shape: Sequence[int],
+    chunk_size: int,
+    start: int,
+    stop: int,
+    slot: int,
+    size: int
+) -> int:
+    # Only the memmapped chunk is opened, not the store's index
+    tiles = TileStore(root, tile_shape, chunk_size, [], mode="r").tiles(start, stop)
+    out = np.ndarray((stop - start, 3, size, size), dtype=np.float32, buffer=_worker_buffers[slot].buf)
+    for tile, target in zip(tiles, out):
+        preprocess_image_into(tile, target)
+    return stop - start
+
+class DecodePool:
+    """
+    Decode and preprocess images in worker processes, handing them to the
+    inference process through shared memory.
+
+    A fixed ring of shared-memory slots, each holding up to `batch_size`
+    preprocessed (3, S, S) float32 tensors, is allocated up front. Workers
+    write straight into a slot and return only the image shape, so no pixel
+    data is pickled. A slot holds one decoded image, or one batch of
+    TileStore tiles for batch jobs. While the model runs on one slot the
+    workers are already filling the next ones.
+
+    Several consumers can share the pool. One only reads ahead into slots
+    that are free at the time and never waits for a slot while holding
+    one: it hands its oldest item back first, so consumers can't deadlock
+    each other by sitting on part of the ring.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        image_size: Optional[int] = None,
+        slots: Optional[int] = None,
+        batch_size: Optional[int] = None
+    ):
+        self.workers = workers or settings.DECODE_WORKERS
+        self.image_size = image_size or settings.UNET_IMAGE_SIZE
+        self.slots = slots or 2 * self.workers
+        self.batch_size = batch_size or settings.INFERENCE_BATCH_SIZE
+        nbytes = self.batch_size * 3 * self.image_size * self.image_size * np.dtype(np.float32).itemsize
+
+        self._buffers = [shared_memory.SharedMemory(create=True, size=nbytes) for _ in range(self.slots)]
+        self._views = [
+            np.ndarray((self.batch_size, 3, self.image_size, self.image_size), dtype=np.float32, buffer=buffer.buf)
+            for buffer in self._buffers
+        ]
+        self._free: "queue.Queue[int]" = queue.Queue()
+        for slot in range(self.slots):
+            self._free.put(slot)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=([buffer.name for buffer in self._buffers],)
+        )
+
+    def submit(self, path: str) -> Tuple[int, Future]:
+        """
+        Start decoding `path` into a free slot, waiting for one if all are in use.
+
+        Returns:
+            Tuple of (slot, future resolving to the original (height, width));
+            pass the slot to release() once the tensor has been consumed
+        """
+        slot = self._free.get()
+        return slot, self._decode_into(slot, path)
+
+    def submit_tiles(self, store: TileStore, start: int, stop: int) -> Tuple[int, Future]:
+        """
+        Start preprocessing slots start..stop of a flushed TileStore (one
+        chunk, at most `batch_size` tiles) into a free slot, waiting for one
+        if all are in use.
+
+        Returns:
+            Tuple of (slot, future resolving to the number of tiles)
+        """
+        if stop - start > self.batch_size:
+            raise ValueError(f"At most {self.batch_size} tiles fit in a slot")
+        slot = self._free.get()
+        return slot, self._tiles_into(slot, store, start, stop)
+
+    def _decode_into(self, slot: int, path: str) -> Future:
+        try:
+            return self._executor.submit(_decode_into_slot, path, slot, self.image_size)
+        except Exception:
+            self.release(slot)
+            raise
+
+    def _tiles_into(self, slot: int, store: TileStore, start: int, stop: int) -> Future:
+        try:
+            return self._executor.submit(
+                _preprocess_tiles_into_slot, store.root, store.tile_shape, store.chunk_size,
+                start, stop, slot, self.image_size
+            )
+        except Exception:
+            self.release(slot)
+            raise
+
+    def _try_acquire(self) -> Optional[int]:
+        """A free slot, or None if all are in use."""
+        try:
+            return self._free.get_nowait()
+        except queue.Empty:
+            return None
+
+    async def _acquire(self) -> int:
+        """Wait for a free slot without blocking the event loop."""
+        slot = self._try_acquire()
+        if slot is not None:
+            return slot
+        waiter = asyncio.get_running_loop().run_in_executor(None, self._free.get)
+        try:
+            return await asyncio.shield(waiter)
+        except asyncio.CancelledError:
+            # The thread still takes a slot when one frees up; hand it straight back
+            waiter.add_done_callback(lambda w: w.cancelled() or w.exception() or self.release(w.result()))
+            raise
+
+    def tensor(self, slot: int) -> np.ndarray:
+        """(1, 3, S, S) view of a slot's first image."""
+        return self._views[slot][:1]
+
+    def release(self, slot: int) -> None:
+        self._free.put(slot)
+
+    def imap(self, paths: Iterable[str]) -> Iterator[DecodedImage]:
+        """
+        Decode `paths` in order, keeping every slot busy ahead of the consumer.
+
+        Each yielded tensor is a shared-memory view that is recycled when the
+        next item is requested; copy it to keep it longer.
+        """
+        pending = deque()
+        for path in paths:
+            slot = self._try_acquire()
+            # Never wait for a slot while holding one
+            while slot is None and pending:
+                yield from self._finish(*pending.popleft())
+                slot = self._try_acquire()
+            if slot is None:
+                slot = self._free.get()
+            pending.append((path, slot, self._decode_into(slot, path)))
+        while pending:
+            yield from self._finish(*pending.popleft())
+
+    def _finish(self, path: str, slot: int, future: Future) -> Iterator[DecodedImage]:
+        try:
+            shape = future.result()
+            yield DecodedImage(path, self.tensor(slot), shape)
+        finally:
+            self.release(slot)
+
+    async def tile_batches(self, store: TileStore, batch_size: Optional[int] = None) -> AsyncIterator[TileBatch]:
+        """
+        Preprocess a TileStore batch by batch in the workers, in slot order,
+        keeping every free slot busy ahead of the consumer:
+
+            async for batch in pool.tile_batches(store):
+                probabilities, views = predict_batch_probabilities(batch.tensor)
+
+        Each tensor is a shared-memory view that is recycled when the next
+        batch is requested; the tiles are memmap views of the store.
+        """
+        sample_ids = store.sample_ids
+        pending = deque()
+
+        async def finish(start: int, stop: int, slot: int, future: Future) -> TileBatch:
+            count = await asyncio.wrap_future(future)
+            return TileBatch(sample_ids[start:stop], store.tiles(start, stop), self._views[slot][:count])
+
+        try:
+            for start, stop in store.batch_ranges(min(batch_size or self.batch_size, self.batch_size)):
+                slot = self._try_acquire()
+                # Never wait for a slot while holding one: other consumers of
+                # the pool may be waiting for ours
+                while slot is None and pending:
+                    entry = pending.popleft()
+                    try:
+                        yield await finish(*entry)
+                    finally:
+                        self.release(entry[2])
+                    slot = self._try_acquire()
+                if slot is None:
+                    slot = await self._acquire()
+                pending.append((start, stop, slot, self._tiles_into(slot, store, start, stop)))
+            while pending:
+                entry = pending.popleft()
+                try:
+                    yield await finish(*entry)
+                finally:
+                    self.release(entry[2])
+        finally:
+            # Abandoned early: let in-flight work finish before its slot is reused
+            for _, _, slot, future in pending:
+                if not future.cancel():
+                    try:
+                        await asyncio.wrap_future(future)
+                    except Exception:
+                        pass
+                self.release(slot)
+
+    @asynccontextmanager
+    async def decode(self, path: str):
+        """
+        Decode one image without blocking the event loop:
+
+            async with pool.decode(path) as decoded:
+                probabilities, views = predict_batch_probabilities(decoded.tensor)
+        """
+        slot = await self._acquire()
+        future = self._decode_into(slot, path)
+        try:
+            shape = await asyncio.wrap_future(future)
+            yield DecodedImage(path, self.tensor(slot), shape)
+        finally:
+            self.release(slot)
+
+    def close(self) -> None:
+        """Stop the workers and free the shared memory."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._views = []
+        for buffer in self._buffers:
+            try:
+                buffer.close()
+            except BufferError:
+                # A caller still holds a tensor view; the mapping goes away with it
+                pass
+            buffer.unlink()
+        self._buffers = []
+
+_pool: Optional[DecodePool] = None
+_pool_lock = threading.Lock()
+
+def get_decode_pool() -> DecodePool:
+    """The process-wide decode pool, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DecodePool()
+    return _pool
+
+def shutdown_decode_pool() -> None:
+    """Stop the process-wide pool if it was started (called on app shutdown)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
@@ -0,0 +1,87 @@
+import json
+import hashlib
+from typing import Any, Optional
+from pydantic import BaseModel
+
+# Bumped whenever the canonical layout below changes
+EVIDENCE_VERSION = b"karnan-evidence-v1"
+
+# Response fields that are not evidence: the hash itself, what is derived
+# from it, and timestamps (so an unchanged verification hashes the same)
+NON_EVIDENCE_FIELDS = {"detection_evidence_hash", "blockchain_tx", "certificate_url", "created_at", "updated_at"}
+
+# Read size when an image has to be hashed from disk
+HASH_CHUNK_SIZE = 1024 * 1024
+
+class EvidenceHasher:
+    """
+    Incremental SHA-256 over the evidence of one detection.
+
+    Each part is hashed as it is produced, so nothing is read twice: the
+    image while the upload streams to disk (or take the digest the upload
+    path already computed), the mask while it is run-length encoded, and
+    the result while it is serialised. The evidence hash is
+
+        SHA-256("karnan-evidence-v1" || SHA-256(image) || SHA-256(mask) || SHA-256(result JSON))
+
+    where the mask is its (height, width) followed by its column-major run
+    lengths as little-endian uint32 (independent of MASK_COMPRESSION), and
+    the result JSON is canonical: sorted keys, no whitespace, UTF-8.
+    """
+
+    def __init__(self, image_sha256: Optional[str] = None):
+        self._image = hashlib.sha256()
+        self._image_digest = bytes.fromhex(image_sha256) if image_sha256 else None
+        self._image_seen = self._image_digest is not None
+        self._mask = hashlib.sha256()
+
+    @property
+    def has_image(self) -> bool:
+        """Whether the image part is known (supplied up front or fed in)."""
+        return self._image_seen
+
+    def update_image(self, chunk: bytes) -> None:
+        if self._image_digest is not None:
+            raise ValueError("Image digest was supplied up front")
+        self._image_seen = True
+        self._image.update(chunk)
+
+    def hash_image_file(self, path: str) -> None:
+        """
+        Hash an image from disk. Only for images that didn't come through the
+        upload path, which hashes them as they stream in.
+        """
+        if self.has_image:
+            return
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                self.update_image(chunk)
+
+    def update_mask(self, chunk: bytes) -> None:
+        self._mask.update(chunk)
+
+    @property
+    def image_sha256(self) -> str:
+        return (self._image_digest or self._image.digest()).hex()
+
+    def _result_digest(self, result: Any) -> bytes:
+        if isinstance(result, BaseModel):
+            result = result.model_dump(mode="json", exclude=NON_EVIDENCE_FIELDS)
+        else:
+            result = {k: v for k, v in result.items() if k not in NON_EVIDENCE_FIELDS}
+        digest = hashlib.sha256()
+        encoder = json.JSONEncoder(sort_keys=True, separators=(",", ":"), ensure_ascii=False, allow_nan=False)
+        for chunk in encoder.iterencode(result):
+            digest.update(chunk.encode("utf-8"))
+        return digest.digest()
+
+    def finalize(self, result: Any) -> str:
+        """
+        The evidence hash, serialising `result` (a response model or dict)
+        straight into the hash.
+        """
+        evidence = hashlib.sha256(EVIDENCE_VERSION)
+        evidence.update(self._image_digest or self._image.digest())
+        evidence.update(self._mask.digest())
+        evidence.update(self._result_digest(result))
+        return evidence.hexdigest()
@@ -0,0 +1,113 @@
+import cv2
+import numpy as np
+from typing import Dict, Optional, Sequence
+from app.services.geometry_service import Gsd, gsd_xy
+
+# A pixel is cloud or haze when it is bright, nearly grey and smooth
+# (HSV value and saturation on OpenCV's 0-255 scale)
+CLOUD_MIN_VALUE = 200
+CLOUD_MAX_SATURATION = 32
+CLOUD_MAX_LAPLACIAN = 8.0
+
+# Grey levels treated as clipped shadows / highlights
+DARK_CLIP = 5
+BRIGHT_CLIP = 250
+
+# Detail finer than f pixels must hold at least this share of the detail
+# finer than 2f pixels for the image to count as resolved at scale f
+DETAIL_MIN_RATIO = 0.2
+UPSAMPLE_FACTORS = (2, 4)
+
+def _detail_energy(gray: np.ndarray, factor: int) -> float:
+    """Mean squared difference from the image averaged over factor x factor blocks."""
+    height, width = gray.shape
+    down = cv2.resize(gray, (width // factor, height // factor), interpolation=cv2.INTER_AREA)
+    up = cv2.resize(down, (width, height), interpolation=cv2.INTER_LINEAR)
+    return float(cv2.norm(gray, up, cv2.NORM_L2SQR)) / gray.size
+
+def effective_resolution(gray: np.ndarray) -> int:
+    """
+    Shorter side of the image in pixels that carry real detail.
+
+    An image upscaled by a factor f (a zoomed-in tile, an upsampled crop) or
+    blurred over f pixels has almost no detail finer than f pixels compared
+    with the detail between f and 2f pixels. Measuring it as a ratio of
+    scales keeps flat regions (cloud, bare roofs) from looking like lost
+    detail. The effective resolution is the size divided by the largest such f.
+    """
+    resolution = min(gray.shape)
+    factor = 1
+    for f in UPSAMPLE_FACTORS:
+        if resolution < f * 16:
+            break
+        coarser = _detail_energy(gray, 2 * f)
+        if coarser == 0 or _detail_energy(gray, f) / coarser >= DETAIL_MIN_RATIO:
+            break
+        factor = f
+    return resolution // factor
+
+def analyze_image_quality(image: np.ndarray) -> Dict[str, float]:
+    """
+    Quality signals of a decoded image, for QC.
+
+    Runs on the array detection already decoded (RGB uint8, H x W x 3, or
+    greyscale), so nothing is read or decoded again; every measure is a
+    whole-image array operation.
+
+    Returns:
+        Dictionary with
+            sharpness: variance of the Laplacian of the grey image (low = blurred)
+            cloud_fraction: share of bright, grey, smooth pixels (cloud or haze)
+            clipped_fraction: share of pixels clipped to black or white
+            brightness: mean grey level, 0-1
+            saturation: mean HSV saturation, 0-1
+            effective_resolution_px: shorter side in pixels that carry detail
+    """
+    image = np.asarray(image)
+    if image.dtype != np.uint8:
+        image = np.clip(image, 0, 255).astype(np.uint8)
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+    rgb = np.ascontiguousarray(image[..., :3])
+    gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+    hsv = cv2.cvtColor(rgb, cv2.COLOR_RGB2HSV)
+
+    laplacian = cv2.Laplacian(gray, cv2.CV_32F)
+    _, laplacian_std = cv2.meanStdDev(laplacian)
+    smooth = cv2.inRange(laplacian, -CLOUD_MAX_LAPLACIAN, CLOUD_MAX_LAPLACIAN)
+    bright_grey = cv2.inRange(hsv, (0, 0, CLOUD_MIN_VALUE), (255, CLOUD_MAX_SATURATION, 255))
+    cloud_pixels = cv2.countNonZero(cv2.bitwise_and(smooth, bright_grey))
+
+    histogram = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+    clipped = histogram[:DARK_CLIP + 1].sum() + histogram[BRIGHT_CLIP:].sum()
+
+    return {
+        "sharpness": round(float(laplacian_std[0, 0]) ** 2, 2),
+        "cloud_fraction": round(cloud_pixels / gray.size, 4),
+        "clipped_fraction": round(float(clipped) / gray.size, 4),
+        "brightness": round(float(np.dot(histogram, np.arange(256))) / gray.size / 255.0, 4),
+        "saturation": round(float(cv2.mean(hsv)[1]) / 255.0, 4),
+        "effective_resolution_px": effective_resolution(gray.astype(np.float32))
+    }
+
+def resolution_qc_columns(
+    quality: Dict[str, float],
+    image_shape: Sequence[int],
+    measured_gsd_m: Optional[Gsd] = None
+) -> Dict[str, Optional[float]]:
+    """
+    The QC columns that judge an image's resolution.
+
+    With a measured GSD (a georeferenced raster, a tile cropped at a known
+    zoom) resolution is ground detail: the GSD times the detail lost to
+    upsampling or blur (shorter side / effective_resolution_px). A window
+    cropped from a fine raster is small in pixels without being coarse.
+    Otherwise only the pixel count is known.
+
+    Returns:
+        Dictionary with image_resolution and effective_gsd_m, one of them None
+    """
+    if measured_gsd_m is None:
+        return {"image_resolution": quality["effective_resolution_px"], "effective_gsd_m": None}
+    detail_loss = min(image_shape[:2]) / max(quality["effective_resolution_px"], 1)
+    return {"image_resolution": None, "effective_gsd_m": round(max(gsd_xy(measured_gsd_m)) * detail_loss, 4)}
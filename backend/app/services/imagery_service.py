@@ -4,6 +4,8 @@ from typing import Tuple, Optional
 from PIL import Image, ImageDraw
 import uuid
 import json
+import numpy as np
+from app.services.tile_provider_service import get_tile_provider
 
 async def fetch_imagery(
     sample_id: str,
@@ -20,7 +22,8 @@ async def fetch_imagery(
         lat: Latitude
         lon: Longitude
         buffer_radius_m: Buffer radius in meters
-        provider: Imagery provider (mock, mapbox, sentinel, etc.)
+        provider: Imagery provider (mock, openstreetmap, or an XYZ tile
+            provider: esri, mapbox, xyz)
         
     Returns:
         Tuple of (image_path, metadata)
@@ -29,7 +32,22 @@ async def fetch_imagery(
     images_dir = "data/images"
     os.makedirs(images_dir, exist_ok=True)
     
-    if provider == "openstreetmap":
+    tile_provider = get_tile_provider(provider)
+    if tile_provider is not None:
+        try:
+            image, metadata = await _fetch_tile_imagery(tile_provider, lat, lon, buffer_radius_m)
+            image_path = os.path.join(images_dir, f"{sample_id}_imagery.png")
+            Image.fromarray(image).save(image_path)
+            metadata = json.dumps(metadata)
+        except Exception as e:
+            # Fallback to mock if the tile server fails
+            image_path = await _generate_mock_image(sample_id, images_dir)
+            metadata = json.dumps({
+                "source": "mock", 
+                "capture_date": "2023-01-15",
+                "error": str(e)
+            })
+    elif provider == "openstreetmap":
         # Try to fetch real location data from OpenStreetMap
         try:
             location_data = await _fetch_location_data(lat, lon)
@@ -65,6 +83,70 @@ async def fetch_imagery(
     
     return image_path, metadata
 
+async def fetch_imagery_to_tile_store(
+    store,
+    sample_id: str,
+    lat: float,
+    lon: float,
+    buffer_radius_m: int = 20,
+    provider: str = "mock"
+) -> str:
+    """
+    Fetch imagery for a batch site straight into a TileStore.
+    
+    Batch runs keep every crop in one memory-mapped store instead of a PNG
+    per site, so inference workers read tiles without decoding them.
+    
+    Args:
+        store: TileStore opened for appending (see tile_store_service)
+        sample_id: The sample ID
+        lat: Latitude
+        lon: Longitude
+        buffer_radius_m: Buffer radius in meters
+        provider: Imagery provider (mock, openstreetmap, ...)
+        
+    Returns:
+        Metadata JSON, as returned by fetch_imagery
+    """
+    tile_provider = get_tile_provider(provider)
+    if tile_provider is not None:
+        try:
+            image, metadata = await _fetch_tile_imagery(tile_provider, lat, lon, buffer_radius_m)
+        except Exception as e:
+            image = _draw_mock_image(sample_id)
+            metadata = {"source": "mock", "capture_date": "2023-01-15", "error": str(e)}
+    elif provider == "openstreetmap":
+        try:
+            location_data = await _fetch_location_data(lat, lon)
+            image = _draw_location_based_image(location_data)
+            metadata = {"source": "openstreetmap", "capture_date": "2023-01-15", "location_data": location_data}
+        except Exception as e:
+            image = _draw_mock_image(sample_id)
+            metadata = {"source": "mock", "capture_date": "2023-01-15", "error": str(e)}
+    else:
+        image = _draw_mock_image(sample_id)
+        metadata = {"source": provider, "capture_date": "2023-01-15"}
+    
+    store.put(sample_id, np.asarray(image))
+    return json.dumps(metadata)
+
+async def _fetch_tile_imagery(tile_provider, lat: float, lon: float, buffer_radius_m: int) -> Tuple[np.ndarray, dict]:
+    """
+    Mosaic the site's crop from an XYZ tile provider.
+    
+    Returns:
+        Tuple of (RGB image, metadata dictionary)
+    """
+    image, gsd_m, tile_count = await tile_provider.fetch_site_image(lat, lon, buffer_radius_m)
+    metadata = {
+        "source": tile_provider.name,
+        "capture_date": None,  # XYZ tile servers don't report acquisition dates
+        "zoom": tile_provider.zoom,
+        "gsd_m": round(gsd_m, 4),
+        "tiles": tile_count
+    }
+    return image, metadata
+
 async def _fetch_location_data(lat: float, lon: float) -> dict:
     """
     Fetch location data from OpenStreetMap Nominatim.
@@ -104,6 +186,19 @@ async def _generate_location_based_image(sample_id: str, images_dir: str, locati
     Returns:
         Path to the generated image
     """
+    image = _draw_location_based_image(location_data)
+    
+    # Save image
+    image_filename = f"{sample_id}_imagery.png"
+    image_path = os.path.join(images_dir, image_filename)
+    image.save(image_path)
+    
+    return image_path
+
+def _draw_location_based_image(location_data: dict) -> Image.Image:
+    """
+    Draw an image based on location data.
+    """
     # Create a simple image with location information
     image = Image.new('RGB', (512, 512), color='lightblue')
     draw = ImageDraw.Draw(image)
@@ -131,12 +226,7 @@ async def _generate_location_based_image(sample_id: str, images_dir: str, locati
         address_parts = location_data.get('address', {})
         place_name = address_parts.get('city', address_parts.get('town', address_parts.get('village', 'Unknown Location')))
     
-    # Save image
-    image_filename = f"{sample_id}_imagery.png"
-    image_path = os.path.join(images_dir, image_filename)
-    image.save(image_path)
-    
-    return image_path
+    return image
 
 async def _generate_mock_image(sample_id: str, images_dir: str) -> str:
     """
@@ -149,6 +239,19 @@ async def _generate_mock_image(sample_id: str, images_dir: str) -> str:
     Returns:
         Path to the generated image
     """
+    image = _draw_mock_image(sample_id)
+    
+    # Save image
+    image_filename = f"{sample_id}_imagery.png"
+    image_path = os.path.join(images_dir, image_filename)
+    image.save(image_path)
+    
+    return image_path
+
+def _draw_mock_image(sample_id: str) -> Image.Image:
+    """
+    Draw a mock rooftop image.
+    """
     # Create a simple mock image with some shapes to represent a rooftop
     image = Image.new('RGB', (512, 512), color='lightblue')
     draw = ImageDraw.Draw(image)
@@ -166,9 +269,4 @@ async def _generate_mock_image(sample_id: str, images_dir: str) -> str:
                 y = 250 + j * 20
                 draw.rectangle([x, y, x + 25, y + 15], fill='black')
     
-    # Save image
-    image_filename = f"{sample_id}_imagery.png"
-    image_path = os.path.join(images_dir, image_filename)
-    image.save(image_path)
-    
-    return image_path
\ No newline at end of file
+    return image
\ No newline at end of file
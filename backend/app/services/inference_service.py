@@ -1,14 +1,17 @@
 import os
+import time
 import uuid
-from typing import Tuple, Optional
+from typing import Tuple, Optional, Dict, Any
 from PIL import Image
 import numpy as np
+from app.services.geometry_service import PANEL_AREA_SQM, capacity_kw_from_area
+from app.services.cascade_service import get_cascade
 
 async def run_model_inference(
     sample_id: str,
     image_path: str,
     model_type: str = "mock"
-) -> Tuple[bool, float, Optional[int], Optional[float], Optional[float], str, str]:
+) -> Tuple[bool, float, Optional[int], Optional[float], Optional[float], Optional[Dict[str, Any]], str]:
     """
     Run model inference on a rooftop image.
     
@@ -20,6 +23,24 @@ async def run_model_inference(
     Returns:
         Tuple of (has_solar, confidence, panel_count_est, pv_area_sqm_est, capacity_kw_est, bbox_or_mask, reason_codes)
     """
+    cascade = get_cascade()
+    if cascade.applies(model_type):
+        # Cheap prefilter first; only likely sites go on to the model
+        score = await cascade.score_path(image_path)
+        if not cascade.escalate(score):
+            return False, round(1.0 - score, 4), None, None, None, None, "cascade_prefilter_negative"
+        start = time.perf_counter()
+        result = await _run_inference(sample_id, image_path, model_type)
+        cascade.record_full_model(time.perf_counter() - start)
+        return result
+    return await _run_inference(sample_id, image_path, model_type)
+
+async def _run_inference(
+    sample_id: str,
+    image_path: str,
+    model_type: str
+) -> Tuple[bool, float, Optional[int], Optional[float], Optional[float], Optional[Dict[str, Any]], str]:
+    """Run the model for `model_type` itself, without the cascade."""
     if model_type == "roboflow":
         # Use Roboflow API for inference
         # Import here to avoid circular imports
@@ -33,7 +54,7 @@ async def run_model_inference(
         # For now, we'll just run the mock inference
         return await _run_mock_inference(sample_id, image_path)
 
-async def _run_mock_inference(sample_id: str, image_path: str) -> Tuple[bool, float, Optional[int], Optional[float], Optional[float], str, str]:
+async def _run_mock_inference(sample_id: str, image_path: str) -> Tuple[bool, float, Optional[int], Optional[float], Optional[float], Optional[Dict[str, Any]], str]:
     """
     Run mock model inference.
     
@@ -52,17 +73,17 @@ async def _run_mock_inference(sample_id: str, image_path: str) -> Tuple[bool, fl
     
     if has_solar:
         confidence = 0.92
-        panel_count_est = 12
         pv_area_sqm_est = 20.5
-        capacity_kw_est = 3.5
-        bbox_or_mask = "bbox_data_mock"
+        panel_count_est = round(pv_area_sqm_est / PANEL_AREA_SQM)
+        capacity_kw_est = round(capacity_kw_from_area(pv_area_sqm_est), 2)
+        bbox_or_mask = None
         reason_codes = "module_grid,rectilinear_array"
     else:
         confidence = 0.3
         panel_count_est = None
         pv_area_sqm_est = None
         capacity_kw_est = None
-        bbox_or_mask = "no_solar_detected"
+        bbox_or_mask = None
         reason_codes = "no_panels_detected"
     
     return (
@@ -1,8 +1,17 @@
+import os
+import shutil
 import asyncio
 from typing import Optional
+from app.core.config import settings
 from app.models.schemas import JobStatusResponse
 from app.core.database import get_db
 from app.models.models import Job
+from app.services.batch_detection_service import detect_tile_store, mock_detect_tile_store
+from app.services.batch_planner_service import plan_batch, read_sites_csv, run_batch_imagery
+from app.services.scratch_service import get_scratch_space
+from app.services.tile_store_service import open_tile_store
+from app.services.unet_service import load_unet_model
+from app.services.verification_service import save_verification_results
 
 async def enqueue_csv_processing(job_id: str, file_path: str):
     """
@@ -22,7 +31,12 @@ async def enqueue_csv_processing(job_id: str, file_path: str):
 async def process_csv_job(job_id: str, file_path: str):
     """
     Process the CSV file and update job status.
-    This is a mock implementation for demonstration.
+
+    Sites are planned spatially (see batch_planner_service) so each imagery
+    tile is fetched once, written to a per-job TileStore in that order, and
+    then run through the UNet batch by batch in the same order. Without the
+    UNet weights the sites get mock results, as single uploads do. The store
+    is removed when the job ends, whether it succeeded or not.
     """
     async with get_db() as db:
         # Update job status to processing
@@ -31,18 +45,43 @@ async def process_csv_job(job_id: str, file_path: str):
             job.status = "processing"
             job.progress = 10
             await db.commit()
-        
-        # Simulate processing time
-        await asyncio.sleep(2)
-        
-        # Update progress
-        if job:
-            job.progress = 50
-            await db.commit()
-        
-        # Simulate more processing time
-        await asyncio.sleep(2)
-        
+
+        async def report_progress(start: int, span: int, done: int, total: int):
+            if job:
+                job.progress = start + int(span * done / total)
+                await db.commit()
+
+        store_root = os.path.join(settings.TILE_STORE_DIR, job_id)
+        try:
+            if await load_unet_model():
+                detect = detect_tile_store
+            else:
+                print(f"Job {job_id}: UNet weights unavailable, using mock detection")
+                detect = mock_detect_tile_store
+            plan = plan_batch(read_sites_csv(file_path))
+            store = open_tile_store(store_root)
+            # Imagery takes the job to 50%, detection the rest of the way
+            summary = await run_batch_imagery(
+                plan, store, on_progress=lambda done, total: report_progress(10, 40, done, total)
+            )
+            sites = {site.sample_id: (site.lat, site.lon) for site in plan.sites}
+            detected = 0
+            async for results in detect(store, sites):
+                await save_verification_results(results)
+                detected += len(results)
+                await report_progress(50, 49, detected, len(store))
+            summary["detected"] = detected
+            print(f"Job {job_id}: {summary}")
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            if job:
+                job.status = "failed"
+                await db.commit()
+            return
+        finally:
+            get_scratch_space().release(file_path)
+            shutil.rmtree(store_root, ignore_errors=True)
+
         # Mark job as done
         if job:
             job.status = "done"
@@ -0,0 +1,144 @@
+import base64
+import zlib
+from typing import Any, Dict, Optional
+import numpy as np
+import cv2
+from app.core.config import settings
+
+# zstd compresses run lengths about as small as zlib in half the time;
+# without the zstandard package masks are written with zlib
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+COMPRESSIONS = ["zstd", "zlib", "none"]
+
+def _column_major(mask: np.ndarray) -> np.ndarray:
+    # cv2.transpose is about 4x faster than NumPy's strided Fortran-order copy
+    return cv2.transpose(np.asarray(mask, dtype=bool).view(np.uint8)).ravel()
+
+def encode_rle(mask: np.ndarray) -> np.ndarray:
+    """
+    Run-length encode a binary mask in COCO order.
+
+    Pixels are read column by column (Fortran order) and the counts alternate
+    between background and foreground, starting with background, so a mask
+    starting with a foreground pixel gets a leading zero count.
+
+    Args:
+        mask: Binary mask (H, W)
+
+    Returns:
+        uint32 array of run lengths
+    """
+    if np.size(mask) == 0:
+        return np.zeros(0, dtype=np.uint32)
+    flat = _column_major(mask)
+    changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    boundaries = np.concatenate(([0], changes, [flat.size]))
+    counts = np.diff(boundaries)
+    if flat[0]:
+        counts = np.concatenate(([0], counts))
+    return counts.astype(np.uint32)
+
+def decode_rle(counts: np.ndarray, size) -> np.ndarray:
+    """
+    Decode COCO-order run lengths back into a boolean mask of `size` (H, W).
+    """
+    height, width = size
+    counts = np.asarray(counts, dtype=np.int64)
+    values = (np.arange(len(counts)) % 2).astype(bool)
+    flat = np.repeat(values, counts)
+    if flat.size != height * width:
+        raise ValueError(f"Run lengths cover {flat.size} pixels, expected {height * width}")
+    return flat.reshape(width, height).T
+
+def _compress(data: bytes, compression: str) -> bytes:
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    if compression == "zlib":
+        return zlib.compress(data, 6)
+    return data
+
+def _decompress(data: bytes, compression: str) -> bytes:
+    if compression == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise ValueError("Mask is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if compression == "zlib":
+        return zlib.decompress(data)
+    return data
+
+def _resolve_compression(compression: Optional[str]) -> str:
+    compression = compression or settings.MASK_COMPRESSION
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown mask compression '{compression}'. Expected one of: {', '.join(COMPRESSIONS)}")
+    if compression == "zstd" and not ZSTD_AVAILABLE:
+        return "zlib"
+    return compression
+
+def encode_mask(mask: np.ndarray, compression: Optional[str] = None, evidence=None) -> Dict[str, Any]:
+    """
+    Encode a binary mask for the bbox_or_mask column and API responses.
+
+    With compression "none" the result is a plain COCO uncompressed RLE
+    (`counts` is a list of ints). Otherwise the run lengths are stored as
+    little-endian uint16/uint32, compressed and base64 encoded. Masks so
+    fragmented that the run lengths outgrow a bit-packed bitmap are stored
+    as the bitmap instead.
+
+    Args:
+        mask: Binary mask (H, W)
+        compression: "zstd", "zlib" or "none"; defaults to settings.MASK_COMPRESSION
+        evidence: Optional EvidenceHasher; the mask's size and run lengths are
+            fed to it as they are encoded, whatever the compression
+
+    Returns:
+        JSON-serialisable dictionary understood by decode_mask
+    """
+    mask = np.asarray(mask, dtype=bool)
+    height, width = mask.shape
+    compression = _resolve_compression(compression)
+    counts = encode_rle(mask)
+    if evidence is not None:
+        evidence.update_mask(np.array([height, width], dtype="<u4").tobytes())
+        evidence.update_mask(counts.astype("<u4", copy=False).tobytes())
+
+    if compression == "none":
+        return {"type": "mask", "encoding": "rle", "size": [height, width], "counts": counts.tolist()}
+
+    dtype = "<u2" if counts.size == 0 or counts.max() <= np.iinfo(np.uint16).max else "<u4"
+    raw = counts.astype(dtype).tobytes()
+    encoding = "rle"
+    if len(raw) > mask.size // 8:
+        raw = np.packbits(_column_major(mask)).tobytes()
+        encoding, dtype = "bitmap", "u1"
+
+    return {
+        "type": "mask",
+        "encoding": encoding,
+        "size": [height, width],
+        "dtype": dtype,
+        "compression": compression,
+        "counts": base64.b64encode(_compress(raw, compression)).decode("ascii"),
+    }
+
+def decode_mask(payload: Dict[str, Any]) -> np.ndarray:
+    """
+    Decode a mask produced by encode_mask (or a COCO uncompressed RLE).
+
+    Returns:
+        Boolean mask (H, W)
+    """
+    height, width = payload["size"]
+    counts = payload["counts"]
+    if isinstance(counts, list):
+        return decode_rle(counts, (height, width))
+
+    raw = _decompress(base64.b64decode(counts), payload.get("compression", "none"))
+    if payload.get("encoding") == "bitmap":
+        flat = np.unpackbits(np.frombuffer(raw, dtype=np.uint8), count=height * width).astype(bool)
+        return flat.reshape(width, height).T
+    return decode_rle(np.frombuffer(raw, dtype=payload.get("dtype", "<u4")), (height, width))
@@ -1,4 +1,11 @@
+from typing import Any, Dict
 from app.models.schemas import MetricsResponse
+from app.services.cascade_service import get_cascade
+from app.services.certificate_service import get_certificate_cache
+from app.services.chat_log_service import get_chat_log_writer
+from app.services.chat_service import get_chat_engine
+from app.services.scratch_service import get_scratch_space
+from app.services.upload_dedup_service import get_result_cache
 
 async def get_system_metrics() -> MetricsResponse:
     """
@@ -38,4 +45,20 @@ async def get_system_metrics() -> MetricsResponse:
         capacity_rmse=0.45,
         per_state_breakdown=per_state_breakdown,
         top_failure_examples=top_failure_examples
-    )
\ No newline at end of file
+    )
+
+async def get_runtime_metrics() -> Dict[str, Any]:
+    """
+    Operational counters of this API process: scratch space usage, the
+    detection result, certificate and chat response cache hit rates, and
+    the chat log queue (rows pending, dropped and how far writes lag behind),
+    and the detection cascade (escalation rate and model time saved).
+    """
+    return {
+        "scratch": get_scratch_space().stats(),
+        "result_cache": get_result_cache().stats(),
+        "certificate_cache": get_certificate_cache().stats(),
+        "chat_cache": get_chat_engine().cache.stats(),
+        "chat_log": get_chat_log_writer().stats(),
+        "cascade": get_cascade().stats()
+    }
@@ -1,73 +1,256 @@
 import os
-from minio import Minio
-from minio.error import S3Error
+import asyncio
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import AsyncIterator, Optional
 from app.core.config import settings
 
-class MinIOService:
-    def __init__(self):
-        self.client = Minio(
-            settings.MINIO_ENDPOINT,
-            access_key=settings.MINIO_ACCESS_KEY,
-            secret_key=settings.MINIO_SECRET_KEY,
-            secure=False  # Set to True if using HTTPS
-        )
-        self.bucket_name = settings.MINIO_BUCKET
-        
-        # Create bucket if it doesn't exist
-        self._create_bucket()
-    
-    def _create_bucket(self):
-        """Create bucket if it doesn't exist."""
+try:
+    from minio import Minio
+    from minio.error import S3Error
+    MINIO_AVAILABLE = True
+except ImportError:
+    MINIO_AVAILABLE = False
+    S3Error = Exception
+    print("Warning: minio client not available. Object storage is disabled...")
+
+# S3 requires every part but the last to be at least 5 MiB
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+class _AsyncStreamReader:
+    """
+    File-like view of an async byte stream for the synchronous MinIO client.
+
+    read() runs on an executor thread and pulls the next chunk from the event
+    loop, so a request body is forwarded part by part without ever being
+    held in memory or written to disk.
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes], loop: asyncio.AbstractEventLoop):
+        self._chunks = chunks.__aiter__()
+        self._loop = loop
+        self._buffer = bytearray()
+        self._eof = False
+        self.bytes_read = 0
+
+    def _next_chunk(self) -> bytes:
+        future = asyncio.run_coroutine_threadsafe(self._chunks.__anext__(), self._loop)
         try:
-            if not self.client.bucket_exists(self.bucket_name):
-                self.client.make_bucket(self.bucket_name)
-        except S3Error as e:
-            print(f"Error creating bucket: {e}")
-    
-    async def upload_file(self, file_path: str, object_name: str) -> str:
+            return future.result()
+        except StopAsyncIteration:
+            return b""
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            chunk = self._next_chunk()
+            if not chunk:
+                self._eof = True
+                break
+            self._buffer += chunk
+        if size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        self.bytes_read += len(data)
+        return data
+
+class MinIOService:
+    """
+    Async access to the MinIO (S3) bucket.
+
+    Nothing touches the network until the first transfer: the client is
+    built and the bucket checked lazily. The MinIO client is synchronous, so
+    every call runs on a small thread pool instead of the event loop. Large
+    files go up as multipart uploads with parts sent in parallel, request
+    bodies can be streamed straight into the bucket, and downloads can be
+    handed to clients as presigned URLs.
+    """
+
+    def __init__(
+        self,
+        endpoint: Optional[str] = None,
+        access_key: Optional[str] = None,
+        secret_key: Optional[str] = None,
+        bucket_name: Optional[str] = None,
+        secure: Optional[bool] = None,
+        client=None
+    ):
+        self.endpoint = endpoint or settings.MINIO_ENDPOINT
+        self.access_key = access_key or settings.MINIO_ACCESS_KEY
+        self.secret_key = secret_key or settings.MINIO_SECRET_KEY
+        self.bucket_name = bucket_name or settings.MINIO_BUCKET
+        self.secure = settings.MINIO_SECURE if secure is None else secure
+        self._client = client
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._bucket_ready = False
+        self._bucket_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            if not MINIO_AVAILABLE:
+                raise RuntimeError("minio client not installed")
+            self._client = Minio(
+                self.endpoint,
+                access_key=self.access_key,
+                secret_key=self.secret_key,
+                secure=self.secure,
+                # A fixed region saves a bucket-location round trip before signing
+                region=settings.MINIO_REGION
+            )
+        return self._client
+
+    async def _run(self, fn, *args, **kwargs):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.MINIO_TRANSFER_WORKERS,
+                thread_name_prefix="minio"
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(*args, **kwargs))
+
+    async def ensure_bucket(self) -> None:
+        """Create the bucket if it doesn't exist (once per process)."""
+        if self._bucket_ready:
+            return
+        if self._bucket_lock is None:
+            self._bucket_lock = asyncio.Lock()
+        async with self._bucket_lock:
+            if not self._bucket_ready:
+                if not await self._run(self.client.bucket_exists, self.bucket_name):
+                    await self._run(self.client.make_bucket, self.bucket_name)
+                self._bucket_ready = True
+
+    def object_url(self, object_name: str) -> str:
+        scheme = "https" if self.secure else "http"
+        return f"{scheme}://{self.endpoint}/{self.bucket_name}/{object_name}"
+
+    async def upload_file(self, file_path: str, object_name: str, content_type: Optional[str] = None) -> str:
         """
         Upload a file to MinIO.
-        
+
+        Files larger than MINIO_PART_SIZE are sent as a multipart upload
+        with MINIO_PARALLEL_UPLOADS parts in flight.
+
         Args:
             file_path: Path to the local file
             object_name: Name of the object in MinIO
-            
+            content_type: MIME type; guessed from the file name by default
+
         Returns:
             URL to the uploaded object
         """
+        await self.ensure_bucket()
+        content_type = content_type or mimetypes.guess_type(file_path)[0] or "application/octet-stream"
         try:
-            # Upload the file
-            self.client.fput_object(
-                self.bucket_name, object_name, file_path
+            await self._run(
+                self.client.fput_object,
+                self.bucket_name,
+                object_name,
+                file_path,
+                content_type=content_type,
+                part_size=max(MIN_PART_SIZE, settings.MINIO_PART_SIZE),
+                num_parallel_uploads=settings.MINIO_PARALLEL_UPLOADS
             )
-            
-            # Return the URL
-            url = f"http://{settings.MINIO_ENDPOINT}/{self.bucket_name}/{object_name}"
-            return url
+            return self.object_url(object_name)
         except S3Error as e:
             print(f"Error uploading file: {e}")
             raise
-    
+
+    async def upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        object_name: str,
+        content_type: str = "application/octet-stream"
+    ) -> int:
+        """
+        Stream bytes of unknown length (e.g. `request.stream()`) into an object.
+
+        Data is sent as multipart parts of MINIO_PART_SIZE, so at most about
+        one part is buffered at a time.
+
+        Returns:
+            Number of bytes uploaded
+        """
+        await self.ensure_bucket()
+        reader = _AsyncStreamReader(chunks, asyncio.get_running_loop())
+        await self._run(
+            self.client.put_object,
+            self.bucket_name,
+            object_name,
+            reader,
+            length=-1,
+            content_type=content_type,
+            part_size=max(MIN_PART_SIZE, settings.MINIO_PART_SIZE)
+        )
+        return reader.bytes_read
+
     async def download_file(self, object_name: str, file_path: str) -> bool:
         """
         Download a file from MinIO.
-        
+
         Args:
             object_name: Name of the object in MinIO
             file_path: Path to save the downloaded file
-            
+
         Returns:
             True if successful, False otherwise
         """
         try:
-            # Download the file
-            self.client.fget_object(
-                self.bucket_name, object_name, file_path
-            )
+            await self._run(self.client.fget_object, self.bucket_name, object_name, file_path)
             return True
         except S3Error as e:
             print(f"Error downloading file: {e}")
             return False
 
-# Global instance
-minio_service = MinIOService()
\ No newline at end of file
+    async def iter_object(self, object_name: str, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+        """Stream an object's bytes, e.g. into a StreamingResponse."""
+        response = await self._run(self.client.get_object, self.bucket_name, object_name)
+        try:
+            while True:
+                chunk = await self._run(response.read, chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            response.close()
+            response.release_conn()
+
+    async def object_exists(self, object_name: str) -> bool:
+        try:
+            await self._run(self.client.stat_object, self.bucket_name, object_name)
+            return True
+        except S3Error as e:
+            if getattr(e, "code", None) in ("NoSuchKey", "NoSuchObject", "NoSuchBucket"):
+                return False
+            raise
+
+    async def presigned_url(self, object_name: str, expires_s: Optional[int] = None) -> str:
+        """Time-limited GET URL, so clients download straight from MinIO."""
+        expires = timedelta(seconds=expires_s or settings.MINIO_PRESIGN_EXPIRY_S)
+        return await self._run(self.client.presigned_get_object, self.bucket_name, object_name, expires=expires)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+# Global instance; cheap to create, nothing connects until first use
+minio_service = MinIOService()
+
+async def mirror_file(file_path: str, object_name: str) -> Optional[str]:
+    """
+    Upload a file to the bucket unless an object of that name is already
+    there (artifacts are content-addressed, so the name implies the bytes).
+
+    Returns:
+        The object name, or None if the upload failed
+    """
+    try:
+        if not await minio_service.object_exists(object_name):
+            await minio_service.upload_file(file_path, object_name)
+        return object_name
+    except Exception as e:
+        print(f"Error mirroring {os.path.basename(file_path)} to MinIO: {e}")
+        return None
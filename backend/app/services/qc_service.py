@@ -1,47 +1,249 @@
-from typing import Tuple, List
+import operator
+import numpy as np
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+from app.core.config import settings
+
+VERIFIABLE = "VERIFIABLE"
+NOT_VERIFIABLE = "NOT_VERIFIABLE"
+
+# Used when config.yml has no qc_rules section. A string value names a setting.
+DEFAULT_QC_RULES = [
+    {"name": "low_confidence", "column": "confidence", "op": "<",
+     "value": "confidence_threshold_verifiable", "note": "Low confidence score"},
+    {"name": "low_resolution", "column": "image_resolution", "op": "<",
+     "value": "image_min_resolution_px", "note": "Low image resolution"},
+    {"name": "coarse_gsd", "column": "effective_gsd_m", "op": ">",
+     "value": "qc_max_gsd_m", "note": "Low image resolution"},
+    {"name": "occlusion", "reason_codes": ["occluded_by_tree", "cloudy"],
+     "note": "Image occlusion or cloudiness detected"},
+    {"name": "unrealistic_capacity", "column": "capacity_kw_est", "op": ">",
+     "value": "qc_max_capacity_kw", "note": "Unrealistic capacity estimate"},
+    {"name": "blurred", "column": "sharpness", "op": "<",
+     "value": "qc_min_sharpness", "note": "Blurred image"},
+    {"name": "cloud_cover", "column": "cloud_fraction", "op": ">",
+     "value": "qc_max_cloud_fraction", "note": "Cloud or haze over the site"},
+    {"name": "poor_exposure", "column": "clipped_fraction", "op": ">",
+     "value": "qc_max_clipped_fraction", "note": "Under- or overexposed image"}
+]
+
+# Comparison operators work on scalars and NumPy columns alike
+OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq
+}
+
+def split_reason_codes(reason_codes: Union[str, Iterable[str], None]) -> List[str]:
+    """Reason codes as a list, from the comma-joined string models emit or a list."""
+    if not reason_codes:
+        return []
+    if isinstance(reason_codes, str):
+        reason_codes = reason_codes.split(",")
+    return [code.strip() for code in reason_codes if code and code.strip()]
+
+class QCRule:
+    """
+    One QC check: a threshold on a numeric column or a set of reason codes.
+    A site fails the rule when the comparison holds or it carries any of the
+    codes. Missing values (None/NaN) never fail a threshold.
+    """
+
+    def __init__(self, spec: Mapping[str, Any], code_bits: Dict[str, int]):
+        self.name: str = spec["name"]
+        self.note: str = spec.get("note", self.name)
+        self.column: Optional[str] = spec.get("column")
+        self.codes: List[str] = list(spec.get("reason_codes") or [])
+        if (self.column is None) == (not self.codes):
+            raise ValueError(f"QC rule {self.name!r} needs exactly one of 'column' or 'reason_codes'")
+        if self.column is not None:
+            if spec.get("op") not in OPERATORS:
+                raise ValueError(f"QC rule {self.name!r}: unknown op {spec.get('op')!r}")
+            self.op = OPERATORS[spec["op"]]
+            value = spec["value"]
+            # Thresholds may refer to a setting, so config.yml and env overrides apply
+            self.value = float(getattr(settings, value.upper()) if isinstance(value, str) else value)
+        else:
+            self.code_mask = 0
+            for code in self.codes:
+                if code not in code_bits and len(code_bits) == 64:
+                    raise ValueError("At most 64 distinct QC reason codes are supported")
+                self.code_mask |= code_bits.setdefault(code, 1 << len(code_bits))
+
+class QCBatchResult:
+    """
+    QC outcome of a batch: `failures` holds, per site, a bitmask of the rules
+    it failed (bit i = rule i). Notes are built once per distinct bitmask,
+    not per site.
+    """
+
+    def __init__(self, rules: Sequence[QCRule], failures: np.ndarray):
+        self.rules = rules
+        self.failures = failures
+
+    def __len__(self) -> int:
+        return len(self.failures)
+
+    @property
+    def verifiable(self) -> np.ndarray:
+        return self.failures == 0
+
+    @property
+    def statuses(self) -> np.ndarray:
+        return np.where(self.failures == 0, VERIFIABLE, NOT_VERIFIABLE)
+
+    def _notes_for_mask(self, mask: int) -> List[str]:
+        return [rule.note for i, rule in enumerate(self.rules) if mask >> i & 1]
+
+    def notes(self, index: int) -> List[str]:
+        return self._notes_for_mask(int(self.failures[index]))
+
+    def all_notes(self) -> List[Tuple[str, ...]]:
+        """Notes of every site; sites that failed the same rules share one tuple."""
+        masks, inverse = np.unique(self.failures, return_inverse=True)
+        per_mask = [tuple(self._notes_for_mask(int(mask))) for mask in masks]
+        return [per_mask[i] for i in inverse.tolist()]
+
+class QCRuleEngine:
+    """
+    Declarative QC rules (config.yml `qc_rules`), evaluated for one site or a
+    whole batch of sites at once.
+
+    For a batch every rule is one vectorised comparison over a NumPy column:
+    confidence, image_resolution or effective_gsd_m, capacity_kw_est, and reason codes turned
+    into per-site bitmasks. The result is a failure bitmask per site, so a
+    million sites are checked in a handful of array operations.
+    """
+
+    def __init__(self, rule_specs: Optional[Sequence[Mapping[str, Any]]] = None):
+        self.code_bits: Dict[str, int] = {}
+        self.rules = [QCRule(spec, self.code_bits) for spec in (rule_specs or DEFAULT_QC_RULES)]
+        if len(self.rules) > 63:
+            raise ValueError("At most 63 QC rules are supported")
+
+    def reason_code_mask(self, reason_codes: Union[str, Iterable[str], None]) -> int:
+        """Bitmask of the reason codes any rule looks at; other codes are ignored."""
+        mask = 0
+        for code in split_reason_codes(reason_codes):
+            mask |= self.code_bits.get(code, 0)
+        return mask
+
+    def reason_code_masks(self, reason_codes: Sequence[Any]) -> np.ndarray:
+        """Per-site bitmasks for a column of reason codes, parsing each distinct value once."""
+        lookup: Dict[Any, int] = {}
+
+        def mask(codes: Any) -> int:
+            key = codes if codes is None or isinstance(codes, str) else tuple(codes)
+            value = lookup.get(key)
+            if value is None:
+                value = lookup[key] = self.reason_code_mask(key)
+            return value
+
+        return np.fromiter((mask(codes) for codes in reason_codes), dtype=np.uint64, count=len(reason_codes))
+
+    def evaluate(self, **columns: Any) -> QCBatchResult:
+        """
+        Check a batch of sites.
+
+        Args:
+            columns: One array per rule column (e.g. confidence, image_resolution,
+                capacity_kw_est, image quality signals; None/NaN for unknown
+                values), plus either `reason_codes` (strings) or precomputed
+                `reason_code_masks`. Rules on a column that isn't given are
+                skipped, as for unknown values.
+
+        Returns:
+            QCBatchResult with a failure bitmask per site
+        """
+        if "reason_code_masks" in columns:
+            code_masks = np.asarray(columns["reason_code_masks"], dtype=np.uint64)
+        elif "reason_codes" in columns:
+            code_masks = self.reason_code_masks(columns["reason_codes"])
+        else:
+            code_masks = None
+
+        arrays: Dict[str, np.ndarray] = {}
+        failures = None
+        for i, rule in enumerate(self.rules):
+            if rule.column is not None:
+                if columns.get(rule.column) is None:
+                    continue
+                values = arrays.get(rule.column)
+                if values is None:
+                    values = arrays[rule.column] = np.asarray(columns[rule.column], dtype=np.float64)
+                # NaN compares false, so unknown values never fail a threshold
+                failed = rule.op(values, rule.value)
+            else:
+                if code_masks is None:
+                    continue
+                failed = (code_masks & np.uint64(rule.code_mask)) != 0
+            if failures is None:
+                failures = np.zeros(len(failed), dtype=np.uint64)
+            failures |= failed.astype(np.uint64) << np.uint64(i)
+        if failures is None:
+            size = len(code_masks) if code_masks is not None else len(next(iter(columns.values()), []))
+            failures = np.zeros(size, dtype=np.uint64)
+        return QCBatchResult(self.rules, failures)
+
+    def evaluate_one(self, reason_codes: Union[str, Iterable[str], None] = None, **values: Any) -> Tuple[str, List[str]]:
+        """
+        Check a single site with the same rules, without building arrays.
+
+        Returns:
+            Tuple of (qc_status, qc_notes)
+        """
+        code_mask = self.reason_code_mask(reason_codes)
+        notes = []
+        for rule in self.rules:
+            if rule.column is not None:
+                value = values.get(rule.column)
+                failed = value is not None and value == value and rule.op(value, rule.value)
+            else:
+                failed = bool(code_mask & rule.code_mask)
+            if failed:
+                notes.append(rule.note)
+        return (NOT_VERIFIABLE if notes else VERIFIABLE), notes
+
+_engine: Optional[QCRuleEngine] = None
+
+def get_qc_engine() -> QCRuleEngine:
+    """The process-wide QC rule engine, built from settings.QC_RULES."""
+    global _engine
+    if _engine is None:
+        _engine = QCRuleEngine(settings.QC_RULES)
+    return _engine
 
 async def apply_quality_control(
     confidence: float,
-    image_resolution: int,
+    image_resolution: Optional[int],
     reason_codes: str,
-    capacity_kw_est: float
+    capacity_kw_est: float,
+    image_quality: Optional[Dict[str, float]] = None,
+    effective_gsd_m: Optional[float] = None
 ) -> Tuple[str, List[str]]:
     """
     Apply quality control rules to determine if a verification is verifiable.
-    
+
     Args:
         confidence: Model confidence score
-        image_resolution: Image resolution in pixels
+        image_resolution: Image resolution in pixels; None when the GSD is
+            measured and effective_gsd_m is checked instead
         reason_codes: Reason codes from model inference
         capacity_kw_est: Estimated capacity in kW
-        
+        image_quality: Optional signals from image_quality_service
+            (sharpness, cloud_fraction, clipped_fraction, ...)
+        effective_gsd_m: Metres per pixel of real detail (see
+            image_quality_service.resolution_qc_columns)
+
     Returns:
         Tuple of (qc_status, qc_notes)
     """
-    qc_notes = []
-    
-    # Check confidence threshold
-    confidence_threshold = 0.7  # This would come from config in a real implementation
-    if confidence < confidence_threshold:
-        qc_notes.append("Low confidence score")
-    
-    # Check image resolution
-    min_resolution = 512  # This would come from config in a real implementation
-    if image_resolution < min_resolution:
-        qc_notes.append("Low image resolution")
-    
-    # Check for occlusion or cloudiness (mock detection)
-    if "occluded_by_tree" in reason_codes or "cloudy" in reason_codes:
-        qc_notes.append("Image occlusion or cloudiness detected")
-    
-    # Check for inconsistent capacity (mock detection)
-    if capacity_kw_est and capacity_kw_est > 100:  # Unrealistic capacity
-        qc_notes.append("Unrealistic capacity estimate")
-    
-    # Determine QC status
-    if len(qc_notes) == 0:
-        qc_status = "VERIFIABLE"
-    else:
-        qc_status = "NOT_VERIFIABLE"
-    
-    return qc_status, qc_notes
\ No newline at end of file
+    return get_qc_engine().evaluate_one(
+        reason_codes,
+        **(image_quality or {}),
+        confidence=confidence,
+        image_resolution=image_resolution,
+        effective_gsd_m=effective_gsd_m,
+        capacity_kw_est=capacity_kw_est
+    )
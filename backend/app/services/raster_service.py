@@ -0,0 +1,167 @@
+import math
+import asyncio
+from typing import Optional, Tuple
+import numpy as np
+import cv2
+from app.core.config import settings
+
+# Windowed GeoTIFF/COG reads need rasterio (GDAL); without it every upload,
+# GeoTIFFs included, is decoded in full with OpenCV
+try:
+    import rasterio
+    from rasterio.enums import Resampling
+    from rasterio.errors import RasterioError, WindowError
+    from rasterio.warp import transform as warp_transform
+    from rasterio.windows import Window
+    RASTERIO_AVAILABLE = True
+except ImportError:
+    RASTERIO_AVAILABLE = False
+    print("Warning: rasterio not available. GeoTIFFs will be decoded in full...")
+
+GEOTIFF_EXTENSIONS = (".tif", ".tiff")
+
+# Length of one degree of latitude (and of longitude at the equator)
+METRES_PER_DEGREE = 111320.0
+
+# Projections whose metres are only true at the equator
+WEB_MERCATOR_EPSG = (3857, 900913)
+
+def is_geotiff(path: str) -> bool:
+    """Whether `path` should go through the raster reader."""
+    return path.lower().endswith(GEOTIFF_EXTENSIONS)
+
+def _ground_resolution(dataset, lat: float) -> Tuple[float, float]:
+    """Metres on the ground per pixel (x, y) from the dataset's geotransform."""
+    res_x, res_y = dataset.res
+    crs = dataset.crs
+    if crs.is_geographic:
+        return res_x * METRES_PER_DEGREE * math.cos(math.radians(lat)), res_y * METRES_PER_DEGREE
+
+    try:
+        units_per_metre = crs.linear_units_factor[1]
+    except Exception:
+        units_per_metre = 1.0
+    res_x, res_y = res_x * units_per_metre, res_y * units_per_metre
+    if crs.to_epsg() in WEB_MERCATOR_EPSG:
+        scale = math.cos(math.radians(lat))
+        res_x, res_y = res_x * scale, res_y * scale
+    return res_x, res_y
+
+def _to_uint8(data: np.ndarray) -> np.ndarray:
+    """Stretch each band of a (bands, H, W) array to uint8 between its 2nd and 98th percentile."""
+    if data.dtype == np.uint8:
+        return data
+    data = data.astype(np.float32)
+    low, high = np.percentile(data.reshape(data.shape[0], -1), [2, 98], axis=1)
+    scale = np.maximum(high - low, 1e-6)
+    stretched = (data - low[:, None, None]) / scale[:, None, None]
+    return (np.clip(stretched, 0.0, 1.0) * 255).astype(np.uint8)
+
+def read_site_window(
+    path: str,
+    lat: float,
+    lon: float,
+    buffer_radius_m: float,
+    max_size: Optional[int] = None
+) -> Tuple[np.ndarray, Tuple[float, float]]:
+    """
+    Read only the pixels within `buffer_radius_m` of a site from a GeoTIFF/COG.
+
+    The window is located through the raster's CRS and geotransform. When
+    the window is larger than `max_size` pixels it is read decimated, which
+    lets GDAL serve it from the closest internal overview instead of the
+    full-resolution tiles.
+
+    Args:
+        path: GeoTIFF or Cloud-Optimized GeoTIFF
+        lat: Latitude of the site
+        lon: Longitude of the site
+        buffer_radius_m: Radius around the site to read
+        max_size: Longest side of the returned image in pixels
+
+    Returns:
+        Tuple of (RGB uint8 image (H, W, 3), ground sampling distance (x, y) in metres per pixel)
+
+    Raises:
+        ValueError: if the raster has no georeferencing or doesn't cover the site
+    """
+    with rasterio.open(path) as dataset:
+        if dataset.crs is None:
+            raise ValueError(f"{path} has no coordinate reference system")
+
+        xs, ys = warp_transform("EPSG:4326", dataset.crs, [lon], [lat])
+        row, col = dataset.index(xs[0], ys[0])
+        gsd_x, gsd_y = _ground_resolution(dataset, lat)
+
+        half_w = max(1, math.ceil(buffer_radius_m / gsd_x))
+        half_h = max(1, math.ceil(buffer_radius_m / gsd_y))
+        window = Window(col - half_w, row - half_h, 2 * half_w, 2 * half_h)
+        try:
+            window = window.intersection(Window(0, 0, dataset.width, dataset.height))
+        except WindowError:
+            raise ValueError(f"{path} does not cover the site at ({lat}, {lon})")
+        window = window.round_offsets().round_lengths()
+
+        factor = 1.0
+        if max_size:
+            factor = max(1.0, window.width / max_size, window.height / max_size)
+        out_h = max(1, int(round(window.height / factor)))
+        out_w = max(1, int(round(window.width / factor)))
+
+        bands = [1, 2, 3] if dataset.count >= 3 else [1]
+        data = dataset.read(
+            bands,
+            window=window,
+            out_shape=(len(bands), out_h, out_w),
+            resampling=Resampling.average
+        )
+
+    image = _to_uint8(data).transpose(1, 2, 0)
+    if image.shape[2] == 1:
+        image = np.repeat(image, 3, axis=2)
+    gsd = (gsd_x * window.width / out_w, gsd_y * window.height / out_h)
+    return np.ascontiguousarray(image), gsd
+
+def read_site_image(
+    path: str,
+    lat: float,
+    lon: float,
+    buffer_radius_m: Optional[float] = None,
+    max_size: Optional[int] = None
+) -> Tuple[np.ndarray, Optional[Tuple[float, float]]]:
+    """
+    Decode an uploaded image for analysis.
+
+    GeoTIFFs are read by window around the site when rasterio is available;
+    everything else (including TIFFs without georeferencing) is decoded with OpenCV.
+
+    Returns:
+        Tuple of (RGB uint8 image, ground sampling distance (x, y) from the
+        geotransform, or None when the image isn't georeferenced)
+    """
+    if buffer_radius_m is None:
+        buffer_radius_m = settings.BUFFER_RADIUS_M
+    if max_size is None:
+        max_size = settings.RASTER_MAX_WINDOW_PX
+
+    if RASTERIO_AVAILABLE and is_geotiff(path):
+        try:
+            return read_site_window(path, lat, lon, buffer_radius_m, max_size)
+        except (ValueError, RasterioError) as e:
+            print(f"Windowed raster read failed for {path}: {e}. Decoding the full image.")
+
+    image = cv2.imread(path, cv2.IMREAD_COLOR)
+    if image is None:
+        raise FileNotFoundError(f"Image not found at {path}")
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB), None
+
+async def load_site_image(
+    path: str,
+    lat: float,
+    lon: float,
+    buffer_radius_m: Optional[float] = None,
+    max_size: Optional[int] = None
+) -> Tuple[np.ndarray, Optional[Tuple[float, float]]]:
+    """read_site_image without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, read_site_image, path, lat, lon, buffer_radius_m, max_size)
@@ -2,12 +2,16 @@ import os
 import httpx
 from typing import Tuple, Optional, Dict, Any
 import base64
+import numpy as np
+from app.core.config import settings
+from app.services.geometry_service import ground_sampling_distance, boxes_to_geometry, PANEL_AREA_SQM, capacity_kw_from_area
 
 async def run_roboflow_inference(
     image_path: str,
     api_key: Optional[str] = None,
-    model_id: str = "solar-panel-detection"
-) -> Tuple[bool, float, Optional[int], Optional[float], Optional[float], str, str]:
+    model_id: str = "solar-panel-detection",
+    gsd_m: Optional[float] = None
+) -> Tuple[bool, float, Optional[int], Optional[float], Optional[float], Optional[Dict[str, Any]], str]:
     """
     Run inference using Roboflow API for solar panel detection.
     
@@ -15,6 +19,8 @@ async def run_roboflow_inference(
         image_path: Path to the image file
         api_key: Roboflow API key (can be None for demo)
         model_id: Model ID to use for inference
+        gsd_m: Ground sampling distance of the image in metres per pixel; derived
+            from BUFFER_RADIUS_M and the image width when omitted
         
     Returns:
         Tuple of (has_solar, confidence, panel_count_est, pv_area_sqm_est, capacity_kw_est, bbox_or_mask, reason_codes)
@@ -48,19 +54,24 @@ async def run_roboflow_inference(
             
             # Parse the response
             result = response.json()
-            return await _parse_roboflow_response(result)
+            return await _parse_roboflow_response(result, gsd_m)
             
     except Exception as e:
         # If API call fails, fall back to mock response
         print(f"Roboflow API error: {e}. Falling back to mock response.")
         return await _mock_roboflow_response(image_path)
 
-async def _parse_roboflow_response(result: Dict[Any, Any]) -> Tuple[bool, float, Optional[int], Optional[float], Optional[float], str, str]:
+async def _parse_roboflow_response(
+    result: Dict[Any, Any],
+    gsd_m: Optional[float] = None
+) -> Tuple[bool, float, Optional[int], Optional[float], Optional[float], Optional[Dict[str, Any]], str]:
     """
     Parse the Roboflow API response.
     
     Args:
         result: The JSON response from Roboflow API
+        gsd_m: Ground sampling distance in metres per pixel; derived from
+            BUFFER_RADIUS_M and the image width reported by Roboflow when omitted
         
     Returns:
         Tuple of (has_solar, confidence, panel_count_est, pv_area_sqm_est, capacity_kw_est, bbox_or_mask, reason_codes)
@@ -79,24 +90,36 @@ async def _parse_roboflow_response(result: Dict[Any, Any]) -> Tuple[bool, float,
         confidences = [pred.get("confidence", 0) for pred in solar_panels]
         confidence = sum(confidences) / len(confidences) if confidences else 0.0
         
-        # Estimate panel count
-        panel_count_est = len(solar_panels)
+        # Convert the boxes to ground area using the image's sampling distance
+        image_width = result.get("image", {}).get("width")
+        if gsd_m is None and image_width:
+            # The imagery covers BUFFER_RADIUS_M either side of the site, so latitude doesn't matter here
+            gsd_m = ground_sampling_distance(
+                0.0, buffer_radius_m=settings.BUFFER_RADIUS_M, image_width_px=image_width
+            )
+        boxes = np.array([
+            [pred.get("x", 0), pred.get("y", 0), pred.get("width", 0), pred.get("height", 0)]
+            for pred in solar_panels
+        ], dtype=np.float64)
         
-        # Estimate area (simplified calculation)
-        total_area = 0
-        for panel in solar_panels:
-            width = panel.get("width", 0)
-            height = panel.get("height", 0)
-            total_area += width * height
+        if gsd_m:
+            geometry = boxes_to_geometry(boxes, gsd_m)
+            panel_count_est = geometry["panel_count"]
+            pv_area_sqm_est = geometry["pv_area_sqm"]
+            capacity_kw_est = geometry["capacity_kw"]
+        else:
+            # Without an image size the boxes can't be scaled; count detections only
+            panel_count_est = len(solar_panels)
+            pv_area_sqm_est = None
+            capacity_kw_est = None
         
-        # Convert to square meters (assuming pixels to meters conversion)
-        pv_area_sqm_est = total_area * 0.0001  # Simplified conversion
-        
-        # Estimate capacity (assuming 170 Wp/m²)
-        capacity_kw_est = (pv_area_sqm_est * 170) / 1000 if pv_area_sqm_est else 0.0
-        
-        # Create bounding box data
-        bbox_or_mask = str(solar_panels)  # Simplified representation
+        # Boxes as centre-x, centre-y, width, height in image pixels
+        bbox_or_mask = {
+            "type": "bbox",
+            "format": "cxcywh",
+            "boxes": boxes.round(1).tolist(),
+            "confidences": [round(c, 4) for c in confidences]
+        }
         
         # Create reason codes
         reason_codes = "solar_panels_detected" if has_solar else "no_solar_panels_detected"
@@ -104,7 +127,7 @@ async def _parse_roboflow_response(result: Dict[Any, Any]) -> Tuple[bool, float,
         panel_count_est = None
         pv_area_sqm_est = None
         capacity_kw_est = None
-        bbox_or_mask = "[]"
+        bbox_or_mask = {"type": "bbox", "format": "cxcywh", "boxes": [], "confidences": []}
         reason_codes = "no_solar_panels_detected"
     
     return (
@@ -117,7 +140,7 @@ async def _parse_roboflow_response(result: Dict[Any, Any]) -> Tuple[bool, float,
         reason_codes
     )
 
-async def _mock_roboflow_response(image_path: str) -> Tuple[bool, float, Optional[int], Optional[float], Optional[float], str, str]:
+async def _mock_roboflow_response(image_path: str) -> Tuple[bool, float, Optional[int], Optional[float], Optional[float], Optional[Dict[str, Any]], str]:
     """
     Generate a mock response similar to what Roboflow would return.
     
@@ -139,17 +162,17 @@ async def _mock_roboflow_response(image_path: str) -> Tuple[bool, float, Optiona
     
     if has_solar:
         confidence = 0.92
-        panel_count_est = 12
         pv_area_sqm_est = 20.5
-        capacity_kw_est = 3.5
-        bbox_or_mask = "[mock_bbox_data]"
+        panel_count_est = round(pv_area_sqm_est / PANEL_AREA_SQM)
+        capacity_kw_est = round(capacity_kw_from_area(pv_area_sqm_est), 2)
+        bbox_or_mask = None
         reason_codes = "solar_panels_detected"
     else:
         confidence = 0.3
         panel_count_est = None
         pv_area_sqm_est = None
         capacity_kw_est = None
-        bbox_or_mask = "[]"
+        bbox_or_mask = {"type": "bbox", "format": "cxcywh", "boxes": [], "confidences": []}
         reason_codes = "no_solar_panels_detected"
     
     return (
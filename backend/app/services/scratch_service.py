@@ -0,0 +1,257 @@
+import os
+import time
+import uuid
+import asyncio
+import hashlib
+import threading
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+from fastapi import UploadFile
+from app.core.config import settings
+
+# Read size while streaming an upload to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Suffix of uploads still being written; the sweeper leaves young ones alone
+PARTIAL_SUFFIX = ".part"
+
+class ScratchSpace:
+    """
+    Managed scratch space for uploads (data/temp).
+
+    Files are leased by the request or job using them and deleted when the
+    last lease is released. A background sweeper removes anything left
+    behind (crashed requests, files from earlier runs) once it is older than
+    `max_age_s`, and evicts the oldest unleased files whenever the space
+    holds more than `max_bytes`. Small uploads can be placed on a tmpfs
+    (e.g. /dev/shm) so they never touch the disk.
+
+    The sweeper runs in an executor thread, so leases are taken, dropped and
+    checked before a removal under one lock.
+    """
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        max_age_s: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        tmpfs_root: Optional[str] = None,
+        tmpfs_max_file_bytes: Optional[int] = None
+    ):
+        self.root = root or settings.UPLOAD_DIR
+        self.max_age_s = max_age_s if max_age_s is not None else settings.SCRATCH_MAX_AGE_S
+        self.max_bytes = max_bytes if max_bytes is not None else settings.SCRATCH_MAX_BYTES
+        self.tmpfs_root = tmpfs_root if tmpfs_root is not None else settings.SCRATCH_TMPFS_DIR
+        self.tmpfs_max_file_bytes = (
+            tmpfs_max_file_bytes if tmpfs_max_file_bytes is not None else settings.SCRATCH_TMPFS_MAX_FILE_BYTES
+        )
+        self._leases: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.swept_files = 0
+        self.swept_bytes = 0
+        self.released_files = 0
+
+    @property
+    def roots(self) -> List[str]:
+        return [root for root in (self.root, self.tmpfs_root) if root]
+
+    def _root_for(self, size_hint: Optional[int]) -> str:
+        if self.tmpfs_root and size_hint is not None and size_hint <= self.tmpfs_max_file_bytes:
+            return self.tmpfs_root
+        return self.root
+
+    def acquire(self, path: str) -> str:
+        """Take a lease on `path`; the sweeper won't remove it until released."""
+        path = os.path.abspath(path)
+        with self._lock:
+            self._leases[path] = self._leases.get(path, 0) + 1
+        return path
+
+    def release(self, path: str) -> None:
+        """Drop a lease, deleting the file when nobody else holds one."""
+        path = os.path.abspath(path)
+        with self._lock:
+            count = self._leases.get(path, 0) - 1
+            if count > 0:
+                self._leases[path] = count
+                return
+            self._leases.pop(path, None)
+            try:
+                os.remove(path)
+                self.released_files += 1
+            except FileNotFoundError:
+                pass
+
+    async def save_upload(self, upload: UploadFile, extension: str) -> Tuple[str, str]:
+        """
+        Stream an upload into scratch space, hashing it on the way, and store it by content.
+
+        The file ends up at `<root>/<sha256>.<extension>`, already leased to
+        the caller; identical uploads in flight at the same time share it.
+
+        Returns:
+            Tuple of (SHA-256 hex digest, path of the stored file)
+        """
+        root = self._root_for(getattr(upload, "size", None))
+        os.makedirs(root, exist_ok=True)
+        digest = hashlib.sha256()
+        tmp_path = os.path.join(root, f".{uuid.uuid4().hex}{PARTIAL_SUFFIX}")
+        try:
+            with open(tmp_path, "wb") as buffer:
+                while True:
+                    chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    buffer.write(chunk)
+
+            content_hash = digest.hexdigest()
+            file_path = self.acquire(os.path.join(root, f"{content_hash}.{extension}"))
+            if os.path.exists(file_path):
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, file_path)
+            return content_hash, file_path
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @asynccontextmanager
+    async def upload(self, upload: UploadFile, extension: str):
+        """
+        Request-scoped upload:
+
+            async with scratch.upload(image, "png") as (content_hash, path):
+                ...
+        """
+        content_hash, path = await self.save_upload(upload, extension)
+        try:
+            yield content_hash, path
+        finally:
+            self.release(path)
+
+    async def save_bytes(self, content: bytes, filename: str) -> str:
+        """Write `content` to a new leased scratch file named after `filename`."""
+        root = self._root_for(len(content))
+        os.makedirs(root, exist_ok=True)
+        path = self.acquire(os.path.join(root, f"{uuid.uuid4()}_{os.path.basename(filename)}"))
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def _scan(self) -> List[Tuple[float, int, str]]:
+        files = []
+        for root in self.roots:
+            try:
+                entries = list(os.scandir(root))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        files.append((stat.st_mtime, stat.st_size, os.path.abspath(entry.path)))
+                except FileNotFoundError:
+                    continue
+        return files
+
+    def _remove(self, path: str, size: int) -> bool:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        self.swept_files += 1
+        self.swept_bytes += size
+        return True
+
+    def sweep(self, now: Optional[float] = None) -> Dict[str, int]:
+        """
+        Enforce the age and size quotas once.
+
+        Leased files are never removed; they count towards the size quota.
+        Leases are checked when a file is about to be removed, not when the
+        directory is scanned, so one taken mid-sweep (e.g. a duplicate upload
+        of an old file) still protects it.
+
+        Returns:
+            Files and bytes removed by this sweep
+        """
+        now = now if now is not None else time.time()
+        removed_files = removed_bytes = 0
+        kept = []
+        for mtime, size, path in self._scan():
+            with self._lock:
+                expired = path not in self._leases and now - mtime > self.max_age_s
+                removed = expired and self._remove(path, size)
+            if removed:
+                removed_files += 1
+                removed_bytes += size
+            elif not expired:
+                kept.append((mtime, size, path))
+
+        held = sum(size for _, size, _ in kept)
+        if held > self.max_bytes:
+            for mtime, size, path in sorted(kept):
+                if held <= self.max_bytes:
+                    break
+                # Uploads still being streamed have no lease yet
+                if path.endswith(PARTIAL_SUFFIX):
+                    continue
+                with self._lock:
+                    removed = path not in self._leases and self._remove(path, size)
+                if removed:
+                    removed_files += 1
+                    removed_bytes += size
+                    held -= size
+        return {"files": removed_files, "bytes": removed_bytes}
+
+    async def run_sweeper(self, interval_s: Optional[float] = None) -> None:
+        """Sweep every `interval_s` seconds until cancelled."""
+        interval_s = interval_s or settings.SCRATCH_SWEEP_INTERVAL_S
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, self.sweep)
+            except Exception as e:
+                print(f"Scratch sweep failed: {e}")
+            await asyncio.sleep(interval_s)
+
+    def stats(self) -> Dict[str, int]:
+        files = self._scan()
+        return {
+            "files": len(files),
+            "bytes_held": sum(size for _, size, _ in files),
+            "leased_files": len(self._leases),
+            "max_bytes": self.max_bytes,
+            "released_files": self.released_files,
+            "swept_files": self.swept_files,
+            "swept_bytes": self.swept_bytes
+        }
+
+_scratch: Optional[ScratchSpace] = None
+_sweeper: Optional[asyncio.Task] = None
+
+def get_scratch_space() -> ScratchSpace:
+    """The process-wide scratch space."""
+    global _scratch
+    if _scratch is None:
+        _scratch = ScratchSpace()
+    return _scratch
+
+def start_scratch_sweeper() -> None:
+    """Start the background sweeper (called on app startup)."""
+    global _sweeper
+    if _sweeper is None:
+        _sweeper = asyncio.get_running_loop().create_task(get_scratch_space().run_sweeper())
+
+async def stop_scratch_sweeper() -> None:
+    """Cancel the background sweeper (called on app shutdown)."""
+    global _sweeper
+    if _sweeper is not None:
+        _sweeper.cancel()
+        try:
+            await _sweeper
+        except asyncio.CancelledError:
+            pass
+        _sweeper = None
@@ -22,7 +22,7 @@ async def get_site_verification(sample_id: str) -> Optional[SiteVerificationResp
                 capacity_kw_est=verification.capacity_kw_est,
                 qc_status=verification.qc_status,
                 qc_notes=verification.qc_notes or [],
-                bbox_or_mask=verification.bbox_or_mask or {},
+                bbox_or_mask=verification.bbox_or_mask,
                 image_metadata=verification.image_metadata or {},
                 detection_evidence_hash=verification.detection_evidence_hash or "",
                 certificate_url=verification.certificate_url,
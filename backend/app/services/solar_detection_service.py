@@ -1,9 +1,23 @@
 import os
-import uuid
+import time
+import asyncio
 import numpy as np
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime
 from app.models.schemas import SiteVerificationResponse
+from app.core.config import settings
+from app.services.qc_service import apply_quality_control
+from app.services.image_quality_service import analyze_image_quality, resolution_qc_columns
+from app.services.geometry_service import (
+    Gsd, ground_sampling_distance, gsd_xy, scale_gsd, mask_to_geometry, capacity_kw_from_area, PANEL_AREA_SQM
+)
+from app.services.mask_service import encode_mask
+from app.services.evidence_service import EvidenceHasher
+from app.services.blockchain_service import store_evidence_on_blockchain
+from app.services.artifact_service import publish_site_artifacts
+from app.services.raster_service import load_site_image
+from app.services.unet_service import load_unet_model, run_unet_inference
+from app.services.cascade_service import get_cascade
 import base64
 import io
 
@@ -15,8 +29,8 @@ except ImportError:
     MISTRAL_AVAILABLE = False
     print("Warning: Mistral AI client not available. Using fallback detection...")
 
-# Mock model imports flag (since we're removing PyTorch dependencies)
-MODEL_IMPORTS_AVAILABLE = False
+# Mistral's vision model
+MISTRAL_VISION_MODEL = "pixtral-12b-2409"
 
 # Define model accuracy metrics
 MODEL_ACCURACY = {
@@ -48,7 +62,10 @@ async def detect_solar_panels(
     sample_id: str,
     lat: float,
     lon: float,
-    model_type: str = "mistral"
+    model_type: str = "mistral",
+    tta: Optional[str] = None,
+    zoom: Optional[float] = None,
+    image_sha256: Optional[str] = None
 ) -> SiteVerificationResponse:
     """
     Detect solar panels in an image using various methods including Mistral AI.
@@ -59,27 +76,104 @@ async def detect_solar_panels(
         lat: Latitude coordinate
         lon: Longitude coordinate
         model_type: Type of model to use ("mistral", "unet", or "yolov5")
+        tta: Optional test-time augmentation mode for the UNet ("flip" or "d4"),
+            e.g. for disputed sites that need a higher-confidence mask
+        zoom: Web Mercator zoom level of the image, if known; otherwise the
+            ground sampling distance is derived from BUFFER_RADIUS_M
+        image_sha256: SHA-256 of the image computed while it was uploaded; the
+            file is only hashed here if this is missing
         
     Returns:
-        SiteVerificationResponse with detection results
+        SiteVerificationResponse with detection results, its evidence hash
+        queued for the next anchored Merkle batch
+
+    With the cascade enabled (CASCADE_ENABLED) a cheap prefilter scores the
+    image first, and only sites above CASCADE_ESCALATE_ABOVE run the model.
     """
+    evidence = EvidenceHasher(image_sha256)
+    use_mistral = model_type == "mistral" and MISTRAL_AVAILABLE
+    use_unet = model_type == "unet" and await load_unet_model()
+    if not (use_mistral or use_unet):
+        # Fallback to mock implementation
+        return await _run_mock_detection(file_path, sample_id, lat, lon, model_type, evidence, tta)
     
-    # For Mistral AI detection
-    if model_type == "mistral" and MISTRAL_AVAILABLE:
-        return await _run_mistral_detection(file_path, sample_id, lat, lon)
+    cascade = get_cascade()
+    site_image = None
+    if cascade.applies(model_type):
+        # Decoded once: the UNet reuses the image if the site escalates
+        site_image = await load_site_image(file_path, lat, lon)
+        score = await cascade.score(site_image[0])
+        if not cascade.escalate(score):
+            return await _run_cascade_rejection(file_path, sample_id, lat, lon, score, site_image, evidence)
     
-    # Fallback to mock implementation
-    return await _run_mock_detection(file_path, sample_id, lat, lon, model_type)
+    start = time.perf_counter()
+    if use_mistral:
+        # For Mistral AI detection
+        response = await _run_mistral_detection(file_path, sample_id, lat, lon, evidence, tta)
+    else:
+        # For UNet segmentation when PyTorch and the weights are available
+        response = await _run_unet_detection(file_path, sample_id, lat, lon, tta, zoom, evidence, site_image)
+    if site_image is not None:
+        cascade.record_full_model(time.perf_counter() - start)
+    return response
+
+async def detection_model_version(model_type: str) -> str:
+    """
+    Identify the model detect_solar_panels would run for `model_type`.
+
+    Cached results are keyed on this, so replacing the UNet weights or
+    configuring the Mistral client invalidates them.
+    """
+    if model_type == "mistral" and MISTRAL_AVAILABLE:
+        version = MISTRAL_VISION_MODEL
+    elif model_type == "unet" and await load_unet_model():
+        stat = os.stat(settings.UNET_WEIGHTS_PATH)
+        version = f"{os.path.basename(settings.UNET_WEIGHTS_PATH)}:{stat.st_size}:{stat.st_mtime_ns}"
+    else:
+        return f"mock:{model_type}"
+    # Results screened by the cascade depend on its policy too
+    cascade = get_cascade()
+    if cascade.applies(model_type):
+        version = f"{version}+{cascade.policy.describe()}"
+    return version
+
+async def _publish_artifacts(
+    sample_id: str,
+    file_path: str,
+    mask: Optional[np.ndarray] = None,
+    image: Optional[np.ndarray] = None
+) -> None:
+    """
+    Render the site's artifacts once so GET /site/{sample_id}/artifact/{type}
+    only serves stored files. A failure here doesn't fail the detection.
+    """
+    try:
+        await publish_site_artifacts(sample_id, file_path, mask, image)
+    except Exception as e:
+        print(f"Error publishing artifacts for {sample_id}: {e}")
+
+def _tta_not_applied_notes(tta: Optional[str]) -> List[str]:
+    """Note for results of models that can't honour a requested TTA mode."""
+    return [f"Test-time augmentation ({tta}) not applied: only supported by the UNet"] if tta else []
+
+async def _seal_evidence(response: SiteVerificationResponse, evidence: EvidenceHasher) -> SiteVerificationResponse:
+    """Hash the result into the evidence and queue the hash for anchoring."""
+    response.detection_evidence_hash = evidence.finalize(response)
+    response.blockchain_tx = await store_evidence_on_blockchain(response.detection_evidence_hash, batched=True)
+    return response
 
 async def _run_mistral_detection(
     file_path: str,
     sample_id: str,
     lat: float,
-    lon: float
+    lon: float,
+    evidence: Optional[EvidenceHasher] = None,
+    tta: Optional[str] = None
 ) -> SiteVerificationResponse:
     """
     Run solar panel detection using Mistral AI Vision API.
     """
+    evidence = evidence or EvidenceHasher()
     try:
         # Get API key from environment
         api_key = os.getenv("MISTRAL_API_KEY")
@@ -91,7 +185,10 @@ async def _run_mistral_detection(
         
         # Read and encode the image
         with open(file_path, "rb") as image_file:
-            encoded_image = base64.b64encode(image_file.read()).decode("utf-8")
+            image_bytes = image_file.read()
+        if not evidence.has_image:
+            evidence.update_image(image_bytes)
+        encoded_image = base64.b64encode(image_bytes).decode("utf-8")
         
         # Prepare the prompt for solar panel detection
         prompt = """
@@ -127,7 +224,7 @@ async def _run_mistral_detection(
         
         # Call Mistral API with image
         chat_response = client.chat.complete(
-            model="pixtral-12b-2409",  # Mistral's vision model
+            model=MISTRAL_VISION_MODEL,
             messages=[
                 {
                     "role": "user",
@@ -170,11 +267,13 @@ async def _run_mistral_detection(
                 "timestamp": datetime.utcnow().isoformat() + "Z"
             }
         
+        await _publish_artifacts(sample_id, file_path)
+        
         # Get current timestamp
         current_time = datetime.utcnow().isoformat() + "Z"
         
         # Create response object with correct schema
-        return SiteVerificationResponse(
+        response = SiteVerificationResponse(
             sample_id=sample_id,
             lat=lat,
             lon=lon,
@@ -184,12 +283,12 @@ async def _run_mistral_detection(
             pv_area_sqm_est=result_data.get("total_area", 0.0),
             capacity_kw_est=result_data.get("estimated_capacity_kw", 0.0),
             qc_status="VERIFIABLE",
-            qc_notes=["Detected using Karnana Model (Mistral AI Vision)"],
-            bbox_or_mask={"type": "mask", "data": "mask_data_placeholder"},
+            qc_notes=["Detected using Karnana Model (Mistral AI Vision)"] + _tta_not_applied_notes(tta),
+            bbox_or_mask=None,
             image_metadata={"source": "uploaded", "capture_date": current_time.split("T")[0]},
-            detection_evidence_hash=str(uuid.uuid4()),
+            detection_evidence_hash="",
             certificate_url=None,
-            blockchain_tx={"network": "mock", "tx_hash": str(uuid.uuid4()), "block": None},
+            blockchain_tx={},
             created_at=current_time,
             updated_at=current_time
         )
@@ -197,36 +296,267 @@ async def _run_mistral_detection(
     except Exception as e:
         print(f"Error in Mistral detection: {e}")
         # Fallback to mock detection if Mistral fails
-        return await _run_mock_detection(file_path, sample_id, lat, lon, "mistral")
+        return await _run_mock_detection(file_path, sample_id, lat, lon, "mistral", evidence, tta)
+    
+    return await _seal_evidence(response, evidence)
+
+async def _run_unet_detection(
+    file_path: str,
+    sample_id: str,
+    lat: float,
+    lon: float,
+    tta: Optional[str] = None,
+    zoom: Optional[float] = None,
+    evidence: Optional[EvidenceHasher] = None,
+    site_image: Optional[Tuple[np.ndarray, Optional[float]]] = None
+) -> SiteVerificationResponse:
+    """
+    Run solar panel segmentation with the UNet model. `site_image` is the
+    (image, GSD) pair from load_site_image if it was already decoded.
+
+    Preprocessing stays in this process rather than the decode pool: the
+    decoded array is needed here anyway for image quality, the artifacts and
+    the cascade, and GeoTIFFs are windowed reads, so the pool would only
+    decode the upload a second time. Batch jobs go through the pool
+    (batch_detection_service).
+    """
+    evidence = evidence or EvidenceHasher()
+    await asyncio.to_thread(evidence.hash_image_file, file_path)
+    # GeoTIFFs are read only around the site and carry their own GSD
+    image, raster_gsd = site_image or await load_site_image(file_path, lat, lon)
+    height, width = image.shape[:2]
+    # Image quality is measured on the same decoded array, alongside inference
+    (mask, confidence, views), quality = await asyncio.gather(
+        run_unet_inference(image, tta),
+        asyncio.to_thread(analyze_image_quality, image)
+    )
+    
+    # The mask is at model resolution; the GSD is scaled to it
+    gsd_m = raster_gsd or ground_sampling_distance(
+        lat, zoom=zoom, buffer_radius_m=settings.BUFFER_RADIUS_M, image_width_px=width
+    )
+    notes = [f"Test-time augmentation: {tta} ({views} views, one batched pass)"] if tta else []
+    
+    await _publish_artifacts(sample_id, file_path, mask, image)
+    
+    return await build_unet_response(
+        sample_id, lat, lon, mask, confidence, quality, gsd_m, (height, width), evidence,
+        image_metadata={"source": "uploaded", "georeferenced": raster_gsd is not None},
+        notes=notes,
+        gsd_measured=raster_gsd is not None or zoom is not None
+    )
+
+def unet_geometry(mask: np.ndarray, gsd_m: Gsd, image_shape: Tuple[int, int]) -> Dict[str, Any]:
+    """Panel geometry of a model-resolution mask of an image of `image_shape` with GSD `gsd_m`."""
+    return mask_to_geometry(mask, scale_gsd(gsd_m, image_shape, mask.shape))
+
+def unet_qc_values(
+    mask: np.ndarray,
+    confidence: float,
+    quality: Dict[str, float],
+    geometry: Dict[str, Any],
+    gsd_m: Gsd,
+    image_shape: Tuple[int, int],
+    gsd_measured: bool = False
+) -> Dict[str, Any]:
+    """The QC inputs of a UNet detection, as apply_quality_control arguments."""
+    has_solar = bool(mask.any())
+    return {
+        "confidence": confidence,
+        "reason_codes": "solar_panels_detected" if has_solar else "no_solar_panels_detected",
+        "capacity_kw_est": geometry["capacity_kw"] if has_solar else None,
+        "image_quality": quality,
+        **resolution_qc_columns(quality, image_shape, gsd_m if gsd_measured else None)
+    }
+
+async def build_unet_response(
+    sample_id: str,
+    lat: float,
+    lon: float,
+    mask: np.ndarray,
+    confidence: float,
+    quality: Dict[str, float],
+    gsd_m: Gsd,
+    image_shape: Tuple[int, int],
+    evidence: EvidenceHasher,
+    image_metadata: Dict[str, Any],
+    notes: Optional[List[str]] = None,
+    gsd_measured: bool = False,
+    geometry: Optional[Dict[str, Any]] = None,
+    qc: Optional[Tuple[str, List[str]]] = None
+) -> SiteVerificationResponse:
+    """
+    Turn a UNet mask into a sealed SiteVerificationResponse: panel geometry,
+    QC and the evidence hash. Shared by single uploads and batch jobs.
+
+    Args:
+        mask: Binary mask at model resolution
+        quality: Signals from analyze_image_quality of the analysed image
+        gsd_m: GSD of the analysed image of `image_shape` (H, W)
+        evidence: Hasher that has already seen the image
+        image_metadata: Source details; capture date, GSD and quality are added
+        notes: qc_notes to list after the model name
+        gsd_measured: Whether gsd_m was measured (georeferenced raster, known
+            zoom) rather than assumed from BUFFER_RADIUS_M; QC then judges
+            resolution by ground detail instead of pixel count
+        geometry: mask_to_geometry of the mask, if already computed
+        qc: (qc_status, qc_issues) if QC already ran, e.g. for a whole batch
+            over the columns of unet_qc_values
+    """
+    model_info = MODEL_ACCURACY["unet"]
+    has_solar = bool(mask.any())
+    geometry = geometry or unet_geometry(mask, gsd_m, image_shape)
+    
+    qc_status, qc_issues = qc or await apply_quality_control(
+        **unet_qc_values(mask, confidence, quality, geometry, gsd_m, image_shape, gsd_measured)
+    )
+    qc_notes = [f"Detected using {model_info['name']}"]
+    qc_notes.extend(notes or [])
+    if geometry["irregular_arrays"]:
+        qc_notes.append(f"{geometry['irregular_arrays']} array(s) with irregular, non-rectangular shape")
+    qc_notes.extend(qc_issues)
+    
+    # Get current timestamp
+    current_time = datetime.utcnow().isoformat() + "Z"
+    
+    response = SiteVerificationResponse(
+        sample_id=sample_id,
+        lat=lat,
+        lon=lon,
+        has_solar=has_solar,
+        confidence=confidence,
+        panel_count_est=geometry["panel_count"] if has_solar else None,
+        pv_area_sqm_est=geometry["pv_area_sqm"] if has_solar else None,
+        capacity_kw_est=geometry["capacity_kw"] if has_solar else None,
+        qc_status=qc_status,
+        qc_notes=qc_notes,
+        bbox_or_mask={**encode_mask(mask, evidence=evidence), "polygons": geometry["polygons"], "holes": geometry["holes"]},
+        image_metadata={
+            **image_metadata,
+            "capture_date": current_time.split("T")[0],
+            "gsd_m": [round(v, 4) for v in gsd_xy(gsd_m)],
+            "quality": quality
+        },
+        detection_evidence_hash="",
+        certificate_url=None,
+        blockchain_tx={},
+        created_at=current_time,
+        updated_at=current_time
+    )
+    return await _seal_evidence(response, evidence)
+
+async def _run_cascade_rejection(
+    file_path: str,
+    sample_id: str,
+    lat: float,
+    lon: float,
+    score: float,
+    site_image: Tuple[np.ndarray, Optional[float]],
+    evidence: EvidenceHasher
+) -> SiteVerificationResponse:
+    """
+    Report a site the cascade prefilter screened out as having no solar,
+    without running the full model.
+    """
+    await asyncio.to_thread(evidence.hash_image_file, file_path)
+    image, raster_gsd = site_image
+    quality = await asyncio.to_thread(analyze_image_quality, image)
+    confidence = round(1.0 - score, 4)
+    
+    qc_status, qc_issues = await apply_quality_control(
+        confidence=confidence,
+        reason_codes="cascade_prefilter_negative",
+        capacity_kw_est=None,
+        image_quality=quality,
+        **resolution_qc_columns(quality, image.shape, raster_gsd)
+    )
+    threshold = get_cascade().policy.escalate_above
+    qc_notes = [f"Screened out by the cascade prefilter (score {score:.3f} <= {threshold:g})"]
+    qc_notes.extend(qc_issues)
+    
+    await _publish_artifacts(sample_id, file_path, None, image)
+    
+    # Get current timestamp
+    current_time = datetime.utcnow().isoformat() + "Z"
+    
+    response = SiteVerificationResponse(
+        sample_id=sample_id,
+        lat=lat,
+        lon=lon,
+        has_solar=False,
+        confidence=confidence,
+        panel_count_est=None,
+        pv_area_sqm_est=None,
+        capacity_kw_est=None,
+        qc_status=qc_status,
+        qc_notes=qc_notes,
+        bbox_or_mask=None,
+        image_metadata={
+            "source": "uploaded",
+            "capture_date": current_time.split("T")[0],
+            "georeferenced": raster_gsd is not None,
+            "quality": quality,
+            "cascade": {"prefilter_score": round(score, 4), "escalated": False}
+        },
+        detection_evidence_hash="",
+        certificate_url=None,
+        blockchain_tx={},
+        created_at=current_time,
+        updated_at=current_time
+    )
+    return await _seal_evidence(response, evidence)
 
 async def _run_mock_detection(
     file_path: str,
     sample_id: str,
     lat: float,
     lon: float,
-    model_type: str
+    model_type: str,
+    evidence: Optional[EvidenceHasher] = None,
+    tta: Optional[str] = None
 ) -> SiteVerificationResponse:
     """
     Mock implementation for solar panel detection.
     """
     # Simulate some processing time
-    import asyncio
     await asyncio.sleep(1)
     
+    evidence = evidence or EvidenceHasher()
+    await asyncio.to_thread(evidence.hash_image_file, file_path)
+    
+    await _publish_artifacts(sample_id, file_path)
+    
+    return await build_mock_response(
+        sample_id, lat, lon, model_type, evidence, {"source": "uploaded"}, _tta_not_applied_notes(tta)
+    )
+
+async def build_mock_response(
+    sample_id: str,
+    lat: float,
+    lon: float,
+    model_type: str,
+    evidence: EvidenceHasher,
+    image_metadata: Dict[str, Any],
+    notes: Optional[List[str]] = None
+) -> SiteVerificationResponse:
+    """
+    Build and seal a mock detection result for when no model is available.
+    `evidence` must already cover the image.
+    """
     # Get model info
     model_info = MODEL_ACCURACY.get(model_type, MODEL_ACCURACY["mistral"])
     
     # Generate mock results
     has_solar = True
     confidence = model_info["accuracy"] / 100.0
-    panel_count = 8
     total_area = 32.5
-    estimated_capacity_kw = 10.8
+    panel_count = round(total_area / PANEL_AREA_SQM)
+    estimated_capacity_kw = round(capacity_kw_from_area(total_area), 2)
     
     # Get current timestamp
     current_time = datetime.utcnow().isoformat() + "Z"
     
-    return SiteVerificationResponse(
+    response = SiteVerificationResponse(
         sample_id=sample_id,
         lat=lat,
         lon=lon,
@@ -236,12 +566,13 @@ async def _run_mock_detection(
         pv_area_sqm_est=total_area,
         capacity_kw_est=estimated_capacity_kw,
         qc_status="VERIFIABLE",
-        qc_notes=[f"Detected using {model_info['name']}"],
-        bbox_or_mask={"type": "mask", "data": "mask_data_placeholder"},
-        image_metadata={"source": "uploaded", "capture_date": current_time.split("T")[0]},
-        detection_evidence_hash=str(uuid.uuid4()),
+        qc_notes=[f"Detected using {model_info['name']}"] + (notes or []),
+        bbox_or_mask=None,
+        image_metadata={**image_metadata, "capture_date": current_time.split("T")[0]},
+        detection_evidence_hash="",
         certificate_url=None,
-        blockchain_tx={"network": "mock", "tx_hash": str(uuid.uuid4()), "block": None},
+        blockchain_tx={},
         created_at=current_time,
         updated_at=current_time
-    )
\ No newline at end of file
+    )
+    return await _seal_evidence(response, evidence)
@@ -0,0 +1,187 @@
+import os
+import math
+import asyncio
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import cv2
+import httpx
+from app.core.config import settings
+from app.services.geometry_service import TILE_SIZE_PX, ground_sampling_distance
+
+# Web Mercator is undefined beyond these latitudes
+MAX_LATITUDE = 85.05112878
+
+# URL templates for the XYZ imagery providers SATELLITE_PROVIDER can name;
+# `xyz` uses TILE_URL_TEMPLATE
+TILE_URL_TEMPLATES = {
+    "esri": "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}",
+    "mapbox": "https://api.mapbox.com/v4/mapbox.satellite/{z}/{x}/{y}.jpg90?access_token={token}",
+}
+
+TileKey = Tuple[int, int, int]
+
+def latlon_to_pixel(lat: float, lon: float, zoom: int) -> Tuple[float, float]:
+    """Global Web Mercator pixel coordinates (x, y) of a point at `zoom`."""
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    world = TILE_SIZE_PX * 2 ** zoom
+    x = (lon + 180.0) / 360.0 * world
+    sin_lat = math.sin(math.radians(lat))
+    y = (0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * world
+    return x, y
+
+def site_pixel_window(lat: float, lon: float, buffer_radius_m: float, zoom: int) -> Tuple[int, int, int, int]:
+    """Global pixel window (left, top, right, bottom) covering the site ± buffer_radius_m."""
+    x, y = latlon_to_pixel(lat, lon, zoom)
+    half = max(1, int(math.ceil(buffer_radius_m / ground_sampling_distance(lat, zoom=zoom))))
+    left, top = int(math.floor(x)) - half, int(math.floor(y)) - half
+    return left, top, left + 2 * half, top + 2 * half
+
+def covering_tiles(window: Tuple[int, int, int, int], zoom: int) -> List[TileKey]:
+    """Every (z, x, y) tile overlapping a global pixel window, row by row."""
+    left, top, right, bottom = window
+    last = 2 ** zoom - 1
+    xs = range(left // TILE_SIZE_PX, (right - 1) // TILE_SIZE_PX + 1)
+    ys = range(max(0, top // TILE_SIZE_PX), min(last, (bottom - 1) // TILE_SIZE_PX) + 1)
+    # Columns wrap around the antimeridian
+    return [(zoom, x % (last + 1), y) for y in ys for x in xs]
+
+class XYZTileProvider:
+    """
+    Fetch imagery for a site from an XYZ/WMTS tile server.
+
+    Tiles are kept in an on-disk z/x/y cache shared by every site, so
+    neighbouring sites reuse each other's downloads; concurrent requests for
+    the same tile share one download.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        url_template: str,
+        zoom: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        client: Optional[httpx.AsyncClient] = None,
+        concurrency: Optional[int] = None
+    ):
+        self.name = name
+        self.url_template = url_template
+        self.zoom = settings.TILE_ZOOM if zoom is None else zoom
+        self.cache_dir = os.path.join(cache_dir or settings.TILE_CACHE_DIR, name)
+        self._client = client
+        self._semaphore = asyncio.Semaphore(concurrency or settings.TILE_FETCH_CONCURRENCY)
+        self._inflight: Dict[TileKey, asyncio.Task] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = get_tile_client()
+        return self._client
+
+    def tile_url(self, z: int, x: int, y: int) -> str:
+        return self.url_template.format(z=z, x=x, y=y, token=settings.MAPBOX_TOKEN)
+
+    def _cache_path(self, z: int, x: int, y: int) -> str:
+        return os.path.join(self.cache_dir, str(z), str(x), f"{y}.tile")
+
+    async def _download(self, key: TileKey) -> bytes:
+        path = self._cache_path(*key)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return f.read()
+
+        async with self._semaphore:
+            response = await self.client.get(self.tile_url(*key))
+            response.raise_for_status()
+        data = response.content
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return data
+
+    async def get_tile_bytes(self, z: int, x: int, y: int) -> bytes:
+        """Encoded tile from the cache, downloading it on a miss."""
+        key = (z, x, y)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._download(key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await task
+
+    async def fetch_site_image(self, lat: float, lon: float, buffer_radius_m: float) -> Tuple[np.ndarray, float, int]:
+        """
+        Mosaic the tiles around a site and crop to lat/lon ± buffer_radius_m.
+
+        Returns:
+            Tuple of (RGB uint8 image, ground sampling distance in metres per pixel, number of tiles)
+        """
+        window = site_pixel_window(lat, lon, buffer_radius_m, self.zoom)
+        tiles = covering_tiles(window, self.zoom)
+        encoded = await asyncio.gather(*(self.get_tile_bytes(*tile) for tile in tiles))
+
+        loop = asyncio.get_running_loop()
+        image = await loop.run_in_executor(None, self._mosaic, window, tiles, encoded)
+        return image, ground_sampling_distance(lat, zoom=self.zoom), len(tiles)
+
+    def _mosaic(self, window: Tuple[int, int, int, int], tiles: List[TileKey], encoded: List[bytes]) -> np.ndarray:
+        left, top, right, bottom = window
+        tile_left = (left // TILE_SIZE_PX) * TILE_SIZE_PX
+        tile_top = max(0, top // TILE_SIZE_PX) * TILE_SIZE_PX
+        columns = (right - 1) // TILE_SIZE_PX - left // TILE_SIZE_PX + 1
+        rows = len(tiles) // columns
+
+        # Tiles decode straight into their place in the mosaic
+        mosaic = np.zeros((rows * TILE_SIZE_PX, columns * TILE_SIZE_PX, 3), dtype=np.uint8)
+        for i, data in enumerate(encoded):
+            tile = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if tile is None:
+                raise ValueError(f"Could not decode tile {tiles[i]} from {self.name}")
+            if tile.shape[:2] != (TILE_SIZE_PX, TILE_SIZE_PX):
+                # High-DPI (512 px) tiles
+                tile = cv2.resize(tile, (TILE_SIZE_PX, TILE_SIZE_PX), interpolation=cv2.INTER_AREA)
+            row, column = divmod(i, columns)
+            cv2.cvtColor(
+                tile,
+                cv2.COLOR_BGR2RGB,
+                dst=mosaic[row * TILE_SIZE_PX:(row + 1) * TILE_SIZE_PX, column * TILE_SIZE_PX:(column + 1) * TILE_SIZE_PX]
+            )
+
+        crop = mosaic[max(0, top - tile_top):bottom - tile_top, left - tile_left:right - tile_left]
+        return np.ascontiguousarray(crop)
+
+_client: Optional[httpx.AsyncClient] = None
+_providers: Dict[str, XYZTileProvider] = {}
+
+def get_tile_client() -> httpx.AsyncClient:
+    """Process-wide pooled HTTP client for tile downloads."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=settings.TILE_FETCH_TIMEOUT_S,
+            limits=httpx.Limits(max_connections=settings.TILE_FETCH_CONCURRENCY),
+            headers={"User-Agent": "Karnan-Solar-Verification-App/1.0"}
+        )
+    return _client
+
+def get_tile_provider(name: str) -> Optional[XYZTileProvider]:
+    """The provider behind a SATELLITE_PROVIDER name, or None if it isn't an XYZ provider."""
+    if name not in _providers:
+        if name == "xyz" and settings.TILE_URL_TEMPLATE:
+            template = settings.TILE_URL_TEMPLATE
+        elif name in TILE_URL_TEMPLATES:
+            template = TILE_URL_TEMPLATES[name]
+        else:
+            return None
+        _providers[name] = XYZTileProvider(name, template)
+    return _providers[name]
+
+async def close_tile_client() -> None:
+    """Close the pooled client (called on app shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    _providers.clear()
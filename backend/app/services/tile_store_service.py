@@ -0,0 +1,168 @@
+import os
+import json
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+import cv2
+from app.core.config import settings
+
+INDEX_FILENAME = "index.json"
+CHUNK_DIRNAME = "chunks"
+
+class TileStore:
+    """
+    Fixed-size site crops in memory-mapped uint8 chunk files.
+
+    The store is a directory: `chunks/NNNNNN.u8` files each holding
+    `chunk_size` tiles of `tile_shape` (H, W, C) back to back, plus an
+    `index.json` listing the sample_id in every slot. Reads return NumPy
+    views straight into the page cache, so batch inference never decodes
+    an image, and new chunks are appended without rewriting old ones.
+    """
+
+    def __init__(self, root: str, tile_shape: Sequence[int], chunk_size: int, sample_ids: List[str], mode: str):
+        self.root = root
+        self.tile_shape = tuple(int(v) for v in tile_shape)
+        self.chunk_size = int(chunk_size)
+        self.mode = mode
+        self._ids = list(sample_ids)
+        self._slots: Dict[str, int] = {sample_id: slot for slot, sample_id in enumerate(self._ids)}
+        self._chunks: Dict[int, np.memmap] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(
+        cls,
+        root: str,
+        tile_shape: Optional[Sequence[int]] = None,
+        chunk_size: Optional[int] = None
+    ) -> "TileStore":
+        """
+        Create an empty store at `root`.
+
+        Args:
+            root: Store directory
+            tile_shape: (H, W, C) of every tile; defaults to TILE_SIZE_PX square RGB
+            chunk_size: Tiles per chunk file; defaults to TILE_CHUNK_SIZE
+        """
+        tile_shape = tile_shape or (settings.TILE_SIZE_PX, settings.TILE_SIZE_PX, 3)
+        chunk_size = chunk_size or settings.TILE_CHUNK_SIZE
+        os.makedirs(os.path.join(root, CHUNK_DIRNAME), exist_ok=True)
+        store = cls(root, tile_shape, chunk_size, [], mode="r+")
+        store.flush()
+        return store
+
+    @classmethod
+    def open(cls, root: str, mode: str = "r") -> "TileStore":
+        """Open an existing store read-only ("r") or for appending ("r+")."""
+        with open(os.path.join(root, INDEX_FILENAME)) as f:
+            index = json.load(f)
+        return cls(root, index["tile_shape"], index["chunk_size"], index["sample_ids"], mode)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, sample_id: str) -> bool:
+        return sample_id in self._slots
+
+    @property
+    def sample_ids(self) -> List[str]:
+        return list(self._ids)
+
+    def _chunk_path(self, chunk: int) -> str:
+        return os.path.join(self.root, CHUNK_DIRNAME, f"{chunk:06d}.u8")
+
+    def _chunk(self, chunk: int) -> np.memmap:
+        memmap = self._chunks.get(chunk)
+        if memmap is None:
+            shape = (self.chunk_size,) + self.tile_shape
+            path = self._chunk_path(chunk)
+            if self.mode == "r":
+                memmap = np.memmap(path, dtype=np.uint8, mode="r", shape=shape)
+            else:
+                # w+ allocates a sparse file; untouched tiles cost no disk
+                memmap = np.memmap(path, dtype=np.uint8, mode="r+" if os.path.exists(path) else "w+", shape=shape)
+            self._chunks[chunk] = memmap
+        return memmap
+
+    def put(self, sample_id: str, image: np.ndarray) -> int:
+        """
+        Store a crop, replacing any previous crop of the same sample.
+
+        Images of a different size are resized to the tile shape.
+
+        Returns:
+            The slot the tile was written to
+        """
+        if self.mode == "r":
+            raise ValueError("TileStore opened read-only")
+        height, width, channels = self.tile_shape
+        image = np.asarray(image, dtype=np.uint8)
+        if image.ndim == 2:
+            image = image[:, :, np.newaxis]
+        if image.shape[:2] != (height, width):
+            image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA).reshape(height, width, -1)
+        if image.shape[2] != channels:
+            raise ValueError(f"Expected {channels} channels, got {image.shape[2]}")
+
+        with self._lock:
+            slot = self._slots.get(sample_id)
+            if slot is None:
+                slot = len(self._ids)
+                self._ids.append(sample_id)
+                self._slots[sample_id] = slot
+        self._chunk(slot // self.chunk_size)[slot % self.chunk_size] = image
+        return slot
+
+    def get(self, sample_id: str) -> np.ndarray:
+        """Zero-copy (H, W, C) view of a sample's tile."""
+        slot = self._slots.get(sample_id)
+        if slot is None:
+            raise KeyError(sample_id)
+        return self._chunk(slot // self.chunk_size)[slot % self.chunk_size]
+
+    def batch_ranges(self, batch_size: int) -> Iterator[Tuple[int, int]]:
+        """
+        (start, stop) slot ranges of at most `batch_size` tiles, in slot order.
+
+        Ranges never straddle a chunk; the last range of a chunk may be short.
+        """
+        for start in range(0, len(self._ids), self.chunk_size):
+            stop = min(start + self.chunk_size, len(self._ids))
+            for offset in range(start, stop, batch_size):
+                yield offset, min(offset + batch_size, stop)
+
+    def tiles(self, start: int, stop: int) -> np.ndarray:
+        """Zero-copy (N, H, W, C) view of slots start..stop, which must lie in one chunk."""
+        chunk, offset = divmod(start, self.chunk_size)
+        if stop <= start or offset + stop - start > self.chunk_size:
+            raise ValueError(f"Slots {start}..{stop} are not within one chunk")
+        return self._chunk(chunk)[offset:offset + stop - start]
+
+    def iter_batches(self, batch_size: int) -> Iterator[Tuple[List[str], np.ndarray]]:
+        """
+        Yield (sample_ids, tiles) in slot order.
+
+        Batches never straddle a chunk, so every `tiles` array (N, H, W, C) is
+        a view of a single memmap; the last batch of a chunk may be short.
+        """
+        for start, stop in self.batch_ranges(batch_size):
+            yield self._ids[start:stop], self.tiles(start, stop)
+
+    def flush(self) -> None:
+        """Write dirty pages and the index; readers opening the store afterwards see every tile."""
+        for memmap in self._chunks.values():
+            if memmap.mode != "r":
+                memmap.flush()
+        index = {"tile_shape": list(self.tile_shape), "chunk_size": self.chunk_size, "sample_ids": self._ids}
+        tmp_path = os.path.join(self.root, f"{INDEX_FILENAME}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, os.path.join(self.root, INDEX_FILENAME))
+
+def open_tile_store(root: Optional[str] = None, tile_shape: Optional[Sequence[int]] = None) -> TileStore:
+    """Open the store at `root` (default TILE_STORE_DIR) for appending, creating it if needed."""
+    root = root or settings.TILE_STORE_DIR
+    if os.path.exists(os.path.join(root, INDEX_FILENAME)):
+        return TileStore.open(root, mode="r+")
+    return TileStore.create(root, tile_shape)
@@ -0,0 +1,185 @@
+import os
+import asyncio
+import threading
+from typing import Optional, Tuple
+import numpy as np
+import cv2
+from app.core.config import settings
+
+# The UNet architecture and checkpoint loaders live in the repository-level
+# `models` package; without PyTorch the detection service falls back to mock
+try:
+    import torch
+    from models.checkpoint import load_checkpoint, load_legacy_checkpoint
+    from models.tta import tta_predict
+    MODEL_IMPORTS_AVAILABLE = True
+except ImportError:
+    MODEL_IMPORTS_AVAILABLE = False
+    print("Warning: PyTorch or the models package not available. UNet detection disabled...")
+
+IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+# Components smaller than this fraction of the image are treated as noise
+MIN_COMPONENT_FRACTION = 0.01
+
+_model = None
+_device = None
+_model_lock = threading.Lock()
+
+def get_unet_model():
+    """
+    Load the UNet once per process.
+
+    Returns:
+        The model in eval mode, or None if PyTorch or the weights are unavailable
+    """
+    global _model, _device
+    if _model is not None or not MODEL_IMPORTS_AVAILABLE:
+        return _model
+
+    weights_path = settings.UNET_WEIGHTS_PATH
+    if not os.path.exists(weights_path):
+        return None
+
+    # Inference runs in executor threads; make sure only one of them loads
+    with _model_lock:
+        if _model is None:
+            _device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+            if weights_path.endswith('.safetensors'):
+                _model = load_checkpoint(weights_path, _device, arch='unet')
+            else:
+                _model = load_legacy_checkpoint(weights_path, _device, arch='unet')
+    return _model
+
+def unet_available() -> bool:
+    """
+    Whether UNet detection can run in this process. Never loads the model
+    itself, so it is safe on the event loop; see load_unet_model.
+    """
+    return _model is not None
+
+async def load_unet_model() -> bool:
+    """
+    Load the UNet in a worker thread, so the event loop never blocks on the
+    checkpoint (called at startup and before UNet detection).
+
+    Returns:
+        Whether UNet detection can run
+    """
+    if _model is None and MODEL_IMPORTS_AVAILABLE:
+        await asyncio.to_thread(get_unet_model)
+    return _model is not None
+
+def preprocess_image_into(image: np.ndarray, out: np.ndarray) -> np.ndarray:
+    """
+    Resize and normalize an RGB uint8 image into `out`, a preallocated
+    (3, size, size) float32 array (e.g. a shared-memory buffer).
+    """
+    size = out.shape[-1]
+    resized = cv2.resize(image, (size, size), interpolation=cv2.INTER_AREA)
+    scale = 1.0 / (255.0 * IMAGENET_STD)
+    np.multiply(resized.transpose(2, 0, 1), scale[:, None, None], out=out, casting='unsafe')
+    out -= (IMAGENET_MEAN / IMAGENET_STD)[:, None, None]
+    return out
+
+def preprocess_image(image: np.ndarray, size: int) -> np.ndarray:
+    """
+    Resize and normalize an RGB uint8 image into a (1, 3, size, size) float32 batch.
+    """
+    batch = np.empty((1, 3, size, size), dtype=np.float32)
+    preprocess_image_into(image, batch[0])
+    return batch
+
+def postprocess_mask(probabilities: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    Threshold probabilities and clean up the binary mask.
+
+    Removes speckle with a morphological opening, fills small holes with a
+    closing and drops connected components below MIN_COMPONENT_FRACTION of the image.
+    """
+    mask = (probabilities > threshold).astype(np.uint8)
+    kernel = np.ones((3, 3), np.uint8)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=2)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=2)
+
+    num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    if num_labels > 2:
+        keep = stats[:, cv2.CC_STAT_AREA] >= mask.size * MIN_COMPONENT_FRACTION
+        keep[0] = False  # background
+        mask = keep[labels].astype(np.uint8)
+    return mask.astype(bool)
+
+def predict_probabilities(image: np.ndarray, tta: Optional[str] = None) -> Tuple[np.ndarray, int]:
+    """
+    Run the UNet on a decoded RGB image.
+
+    Args:
+        image: RGB uint8 array (H, W, 3)
+        tta: Optional test-time augmentation mode ("flip" or "d4"); all views
+            run as a single batched forward pass
+
+    Returns:
+        Tuple of (probabilities at model resolution (S, S), number of views evaluated)
+    """
+    probabilities, views = predict_batch_probabilities(preprocess_image(image, settings.UNET_IMAGE_SIZE), tta)
+    return probabilities[0], views
+
+def predict_batch_probabilities(batch: np.ndarray, tta: Optional[str] = None) -> Tuple[np.ndarray, int]:
+    """
+    Run the UNet on already preprocessed images.
+
+    Args:
+        batch: float32 array (N, 3, S, S) from preprocess_image / the decode pool
+        tta: Optional test-time augmentation mode ("flip" or "d4")
+
+    Returns:
+        Tuple of (probabilities (N, S, S), number of views evaluated)
+    """
+    model = get_unet_model()
+    batch = torch.from_numpy(batch).to(_device)
+
+    if tta:
+        probabilities, views = tta_predict(model, batch, tta)
+    else:
+        with torch.no_grad():
+            probabilities = torch.sigmoid(model(batch))
+        views = 1
+
+    return probabilities[:, 0].cpu().numpy(), views
+
+def mask_and_confidence(probabilities: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Binary mask and detection confidence from one image's probabilities (S, S).
+    """
+    mask = postprocess_mask(probabilities, settings.UNET_THRESHOLD)
+
+    # Confidence in the has_solar decision, not in an individual pixel
+    if mask.any():
+        confidence = float(probabilities[mask].mean())
+    else:
+        confidence = float(1.0 - probabilities.max())
+
+    return mask, confidence
+
+def _run_unet_sync(image: np.ndarray, tta: Optional[str]) -> Tuple[np.ndarray, float, int]:
+    probabilities, views = predict_probabilities(image, tta)
+    mask, confidence = mask_and_confidence(probabilities)
+    return mask, confidence, views
+
+async def run_unet_inference(
+    image: np.ndarray,
+    tta: Optional[str] = None
+) -> Tuple[np.ndarray, float, int]:
+    """
+    Run UNet segmentation on a decoded image without blocking the event loop.
+
+    Args:
+        image: RGB uint8 array (H, W, 3), e.g. from raster_service.load_site_image
+        tta: Optional test-time augmentation mode ("flip" or "d4")
+
+    Returns:
+        Tuple of (binary mask at model resolution, confidence, number of TTA views)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _run_unet_sync, image, tta)
@@ -0,0 +1,97 @@
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from app.core.config import settings
+from app.models.schemas import SiteVerificationResponse
+
+class ResultCache:
+    """
+    LRU cache of verification results keyed by (image hash, model type,
+    model version, ...).
+
+    Concurrent requests for a key that is still being computed wait on the
+    same computation instead of starting their own.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or settings.RESULT_CACHE_SIZE
+        self._entries: "OrderedDict[Hashable, SiteVerificationResponse]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[SiteVerificationResponse]:
+        result = self._entries.get(key)
+        if result is not None:
+            self._entries.move_to_end(key)
+        return result
+
+    def put(self, key: Hashable, result: SiteVerificationResponse) -> None:
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_compute(
+        self,
+        key: Hashable,
+        compute: Callable[[], Awaitable[SiteVerificationResponse]]
+    ) -> Tuple[SiteVerificationResponse, bool]:
+        """
+        Cached result for `key`, computing and storing it on a miss.
+
+        Failures are not cached.
+
+        Returns:
+            Tuple of (result, whether it came from the cache)
+        """
+        result = self.get(key)
+        if result is not None:
+            self.hits += 1
+            return result, True
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.hits += 1
+            return await asyncio.shield(future), True
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; don't warn about an unretrieved exception
+            future.exception()
+            raise
+        else:
+            self.put(key, result)
+            future.set_result(result)
+            return result, False
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+_result_cache: Optional[ResultCache] = None
+
+def get_result_cache() -> ResultCache:
+    """The process-wide detection result cache."""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache()
+    return _result_cache
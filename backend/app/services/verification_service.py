@@ -1,9 +1,10 @@
 import os
-import uuid
-from typing import Dict, Any
+from typing import Dict, Any, List
 from app.models.schemas import SingleVerificationRequest, SiteVerificationResponse
 from app.core.database import get_db
 from app.models.models import SiteVerification
+from app.services.evidence_service import EvidenceHasher
+from app.services.blockchain_service import store_evidence_on_blockchain
 from datetime import datetime
 
 async def verify_single_site(request: SingleVerificationRequest) -> SiteVerificationResponse:
@@ -22,11 +23,8 @@ async def verify_single_site(request: SingleVerificationRequest) -> SiteVerifica
     qc_status = "VERIFIABLE" if confidence > 0.7 else "NOT_VERIFIABLE"
     qc_notes = [] if qc_status == "VERIFIABLE" else ["Low confidence score"]
     
-    # Mock bbox/mask
-    bbox_or_mask = {
-        "type": "bbox",
-        "data": "mock_bbox_data"
-    }
+    # Mock results have no geometry
+    bbox_or_mask = None
     
     # Mock image metadata
     image_metadata = {
@@ -34,19 +32,9 @@ async def verify_single_site(request: SingleVerificationRequest) -> SiteVerifica
         "capture_date": "2023-01-15"
     }
     
-    # Mock evidence hash
-    detection_evidence_hash = str(uuid.uuid4())
-    
     # Mock certificate URL
     certificate_url = f"/data/outputs/{request.sample_id}/certificate.pdf" if has_solar and qc_status == "VERIFIABLE" else None
     
-    # Mock blockchain transaction
-    blockchain_tx = {
-        "network": "mock",
-        "tx_hash": str(uuid.uuid4()) if has_solar and qc_status == "VERIFIABLE" else None,
-        "block": None
-    }
-    
     # Create the response
     response = SiteVerificationResponse(
         sample_id=request.sample_id,
@@ -61,13 +49,19 @@ async def verify_single_site(request: SingleVerificationRequest) -> SiteVerifica
         qc_notes=qc_notes,
         bbox_or_mask=bbox_or_mask,
         image_metadata=image_metadata,
-        detection_evidence_hash=detection_evidence_hash,
+        detection_evidence_hash="",
         certificate_url=certificate_url,
-        blockchain_tx=blockchain_tx,
+        blockchain_tx={"network": "mock", "tx_hash": None, "block": None},
         created_at=datetime.now(),
         updated_at=datetime.now()
     )
     
+    # Evidence hash over the result (no image or mask in this mock); only
+    # verifiable installations are anchored
+    response.detection_evidence_hash = EvidenceHasher().finalize(response)
+    if has_solar and qc_status == "VERIFIABLE":
+        response.blockchain_tx = await store_evidence_on_blockchain(response.detection_evidence_hash, batched=True)
+    
     # Save to database
     await save_verification_result(response)
     
@@ -77,23 +71,31 @@ async def save_verification_result(result: SiteVerificationResponse):
     """
     Save verification result to database.
     """
+    await save_verification_results([result])
+
+async def save_verification_results(results: List[SiteVerificationResponse]):
+    """
+    Save a batch of verification results in one transaction.
+    """
     async with get_db() as db:
-        verification = SiteVerification(
-            sample_id=result.sample_id,
-            lat=result.lat,
-            lon=result.lon,
-            has_solar=result.has_solar,
-            confidence=result.confidence,
-            panel_count_est=result.panel_count_est,
-            pv_area_sqm_est=result.pv_area_sqm_est,
-            capacity_kw_est=result.capacity_kw_est,
-            qc_status=result.qc_status,
-            qc_notes=result.qc_notes,
-            bbox_or_mask=result.bbox_or_mask,
-            image_metadata=result.image_metadata,
-            detection_evidence_hash=result.detection_evidence_hash,
-            certificate_url=result.certificate_url,
-            blockchain_tx=result.blockchain_tx
-        )
-        db.add(verification)
-        await db.commit()
\ No newline at end of file
+        db.add_all([_verification_row(result) for result in results])
+        await db.commit()
+
+def _verification_row(result: SiteVerificationResponse) -> SiteVerification:
+    return SiteVerification(
+        sample_id=result.sample_id,
+        lat=result.lat,
+        lon=result.lon,
+        has_solar=result.has_solar,
+        confidence=result.confidence,
+        panel_count_est=result.panel_count_est,
+        pv_area_sqm_est=result.pv_area_sqm_est,
+        capacity_kw_est=result.capacity_kw_est,
+        qc_status=result.qc_status,
+        qc_notes=result.qc_notes,
+        bbox_or_mask=result.bbox_or_mask,
+        image_metadata=result.image_metadata,
+        detection_evidence_hash=result.detection_evidence_hash,
+        certificate_url=result.certificate_url,
+        blockchain_tx=result.blockchain_tx
+    )
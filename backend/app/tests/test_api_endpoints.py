@@ -41,4 +41,78 @@ def test_api_endpoints():
     
     # Test report endpoint
     response = client.post("/api/v1/report", data={"sample_id": "test", "reason": "test"})
-    assert response.status_code in [200, 422, 500]  # Endpoint exists
\ No newline at end of file
+    assert response.status_code in [200, 422, 500]  # Endpoint exists
+
+def test_site_artifact_caching(tmp_path, monkeypatch):
+    """Artifacts are served with a content-hash ETag, 304 revalidation and byte ranges."""
+    import asyncio
+    import io
+    import numpy as np
+    from PIL import Image
+    from app.core.config import settings
+    from app.services import artifact_service
+
+    monkeypatch.setattr(settings, "ARTIFACT_DIR", str(tmp_path / "artifacts"))
+    monkeypatch.setattr(artifact_service, "_index", {})
+
+    image_path = str(tmp_path / "roof.png")
+    Image.new("RGB", (64, 48), color="gray").save(image_path)
+    mask = np.zeros((32, 32), dtype=bool)
+    mask[8:24, 8:24] = True
+    asyncio.run(artifact_service.publish_site_artifacts("site_7", image_path, mask))
+
+    response = client.get("/api/v1/site/site_7/artifact/overlay")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert "max-age" in response.headers["cache-control"]
+    etag = response.headers["etag"]
+
+    overlay = np.array(Image.open(io.BytesIO(response.content)))
+    assert overlay.shape == (48, 64, 3)
+    assert tuple(overlay[24, 32]) != tuple(overlay[0, 0])  # panels tinted, background untouched
+
+    assert client.get("/api/v1/site/site_7/artifact/overlay", headers={"If-None-Match": etag}).status_code == 304
+
+    partial = client.get("/api/v1/site/site_7/artifact/overlay", headers={"Range": "bytes=0-7"})
+    assert partial.status_code == 206
+    assert partial.content == response.content[:8]
+    assert partial.headers["content-range"] == f"bytes 0-7/{len(response.content)}"
+
+    assert client.get("/api/v1/site/site_7/artifact/certificate").status_code == 404
+    assert client.get("/api/v1/site/site_7/artifact/thumbnail").status_code == 400
+
+
+def test_detect_deduplicates_uploads(tmp_path, monkeypatch):
+    """Re-uploading the same image for the same site is served from the result cache."""
+    import os
+    from app.core.config import settings
+    from app.api.v1.endpoints import solar_detection
+    from app.services import scratch_service, upload_dedup_service
+
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    monkeypatch.setattr(settings, "ARTIFACT_DIR", str(tmp_path / "artifacts"))
+    monkeypatch.setattr(upload_dedup_service, "_result_cache", upload_dedup_service.ResultCache(8))
+    monkeypatch.setattr(scratch_service, "_scratch", scratch_service.ScratchSpace(str(tmp_path / "uploads")))
+    original = solar_detection.detect_solar_panels
+    calls = []
+
+    async def counting_detect(**kwargs):
+        calls.append(kwargs["file_path"])
+        return await original(**kwargs)
+
+    monkeypatch.setattr(solar_detection, "detect_solar_panels", counting_detect)
+
+    form = {"sample_id": "site_dup", "lat": "12.97", "lon": "77.59", "model_type": "yolov5"}
+    first = client.post("/api/v1/solar/detect", data=form, files={"image": ("a.png", b"same-bytes", "image/png")})
+    second = client.post("/api/v1/solar/detect", data=form, files={"image": ("b.png", b"same-bytes", "image/png")})
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    assert len(calls) == 1
+    assert os.path.basename(calls[0]).endswith(".png")
+    # Uploads are request-scoped: nothing is left in scratch space afterwards
+    assert os.listdir(settings.UPLOAD_DIR) == []
+
+    other = client.post("/api/v1/solar/detect", data=form, files={"image": ("c.png", b"other-bytes", "image/png")})
+    assert other.status_code == 200
+    assert len(calls) == 2
+    assert upload_dedup_service.get_result_cache().stats()["hits"] == 1
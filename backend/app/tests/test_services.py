@@ -62,4 +62,1100 @@ def test_blockchain_service():
     assert "tx_hash" in result
     assert result["network"] == "mock"
     assert isinstance(result["tx_hash"], str)
-    assert len(result["tx_hash"]) == 64  # SHA256 hash length
\ No newline at end of file
+    assert len(result["tx_hash"]) == 64  # SHA256 hash length
+
+def test_tta_single_batched_pass():
+    """TTA de-augments every view and runs the model once."""
+    torch = pytest.importorskip("torch")
+    from models.tta import tta_predict
+
+    calls = []
+
+    def per_pixel_model(x):
+        calls.append(x.shape[0])
+        return x[:, :1]
+
+    images = torch.randn(2, 3, 16, 16)
+    probabilities, views = tta_predict(per_pixel_model, images, "d4")
+
+    assert views == 8
+    assert calls == [16]
+    assert torch.allclose(probabilities, torch.sigmoid(images[:, :1]), atol=1e-6)
+
+
+def test_unet_checkpoint_layouts(tmp_path):
+    """Both shipped layouts round-trip; the unrunnable bilinear=False training layout is named in the error."""
+    torch = pytest.importorskip("torch")
+    from models.unet_model import UNet, infer_unet_config
+    from models.checkpoint import load_checkpoint, save_checkpoint
+
+    for layout in ("standard", "legacy"):
+        path = str(tmp_path / f"{layout}.pt")
+        save_checkpoint(UNet.from_layout(layout), path)
+        model = load_checkpoint(path)
+        assert (model.bilinear, model.conv_bias) == (UNet.from_layout(layout).bilinear, UNet.from_layout(layout).conv_bias)
+
+    # The training script's bilinear=False decoder: ConvTranspose2d(in // 2, in // 2)
+    state_dict = UNet(3, 1, bilinear=False, conv_bias=True).state_dict()
+    for name, channels in (("up1", 1024), ("up2", 512), ("up3", 256), ("up4", 128)):
+        state_dict[f"{name}.up.weight"] = torch.zeros(channels // 2, channels // 2, 2, 2)
+    with pytest.raises(ValueError, match="bilinear=False"):
+        infer_unet_config(state_dict)
+    path = str(tmp_path / "transposed.pt")
+    save_checkpoint(state_dict, path, arch="unet")
+    with pytest.raises(ValueError, match="legacy training-script UNet layout"):
+        load_checkpoint(path)
+
+
+def test_unet_detection_records_tta(tmp_path, monkeypatch):
+    """UNet detection with TTA records the mode in qc_notes."""
+    import asyncio
+    pytest.importorskip("torch")
+    from PIL import Image
+    from models.unet_model import UNet
+    from models.checkpoint import save_checkpoint
+    from app.core.config import settings
+    from app.services import unet_service
+    from app.services.solar_detection_service import detect_solar_panels
+
+    weights_path = str(tmp_path / "unet.safetensors")
+    save_checkpoint(UNet.from_layout("legacy"), weights_path)
+    image_path = str(tmp_path / "roof.png")
+    Image.new("RGB", (64, 64), color="gray").save(image_path)
+
+    monkeypatch.setattr(settings, "UNET_WEIGHTS_PATH", weights_path)
+    monkeypatch.setattr(settings, "UNET_IMAGE_SIZE", 64)
+    monkeypatch.setattr(unet_service, "_model", None)
+    monkeypatch.setattr(settings, "ARTIFACT_DIR", str(tmp_path / "artifacts"))
+
+    result = asyncio.run(detect_solar_panels(image_path, "site_1", 28.6, 77.2, model_type="unet", tta="flip"))
+
+    assert any("Test-time augmentation: flip (4 views" in note for note in result.qc_notes)
+    assert 0.0 <= result.confidence <= 1.0
+
+
+def test_tta_without_unet_is_noted(tmp_path, monkeypatch):
+    """A TTA request the fallback model can't honour says so in qc_notes."""
+    import asyncio
+    from PIL import Image
+    from app.core.config import settings
+    from app.services import unet_service
+    from app.services.solar_detection_service import detect_solar_panels
+
+    image_path = str(tmp_path / "roof.png")
+    Image.new("RGB", (64, 64), color="gray").save(image_path)
+    monkeypatch.setattr(settings, "UNET_WEIGHTS_PATH", str(tmp_path / "missing.safetensors"))
+    monkeypatch.setattr(unet_service, "_model", None)
+    monkeypatch.setattr(settings, "ARTIFACT_DIR", str(tmp_path / "artifacts"))
+
+    assert not unet_service.unet_available()
+    result = asyncio.run(detect_solar_panels(image_path, "site_1", 28.6, 77.2, model_type="unet", tta="d4"))
+    assert "Test-time augmentation (d4) not applied: only supported by the UNet" in result.qc_notes
+    # The fallback produces no geometry, and says so with None rather than a placeholder
+    assert result.bbox_or_mask is None
+
+
+def test_mask_to_geometry_area_and_capacity():
+    """Geometry converts mask pixels to ground area and capacity via the GSD."""
+    import numpy as np
+    from app.core.config import settings
+    from app.services.geometry_service import mask_to_geometry, ground_sampling_distance
+
+    mask = np.zeros((1024, 1024), np.uint8)
+    mask[100:200, 100:300] = 1  # one 100 x 200 px array
+    mask[600:650, 600:650] = 1  # a second 50 x 50 px array
+
+    gsd_m = ground_sampling_distance(28.6, buffer_radius_m=20, image_width_px=1024)
+    geometry = mask_to_geometry(mask, gsd_m)
+
+    expected_area = (100 * 200 + 50 * 50) * gsd_m ** 2
+    assert len(geometry["polygons"]) == 2
+    assert geometry["irregular_arrays"] == 0
+    assert geometry["pv_area_sqm"] == pytest.approx(expected_area, abs=0.01)
+    assert geometry["capacity_kw"] == pytest.approx(expected_area * settings.AREA_WP_PER_M2 / 1000, abs=0.01)
+    assert geometry["panel_count"] == round(100 * 200 * gsd_m ** 2 / 1.65) + round(50 * 50 * gsd_m ** 2 / 1.65)
+
+
+def test_mask_to_geometry_keeps_nested_arrays_and_holes():
+    """A ring of panels around a courtyard keeps its hole, and panels inside the courtyard get a polygon."""
+    import numpy as np
+    from app.services.geometry_service import mask_to_geometry
+
+    mask = np.zeros((400, 400), np.uint8)
+    mask[50:350, 50:350] = 1
+    mask[100:300, 100:300] = 0  # courtyard
+    mask[180:220, 170:230] = 1  # array inside the courtyard
+
+    geometry = mask_to_geometry(mask, 0.1)
+    assert len(geometry["polygons"]) == 2
+    assert geometry["pv_area_sqm"] == pytest.approx((300 * 300 - 200 * 200 + 40 * 60) * 0.01, abs=0.01)
+    assert len(geometry["holes"]) == 1
+    ring = geometry["polygons"][geometry["holes"][0]["array"]]
+    assert np.ptp(np.array(ring)[:, 0]) > 250
+    hole = np.array(geometry["holes"][0]["polygon"])
+    assert 190 <= np.ptp(hole[:, 0]) <= 210
+    inner = [p for i, p in enumerate(geometry["polygons"]) if i != geometry["holes"][0]["array"]][0]
+    assert np.ptp(np.array(inner)[:, 0]) < 70
+
+
+def test_mask_codec_round_trip():
+    """Masks survive every compression, including the bitmap fallback."""
+    import json
+    import numpy as np
+    from app.services.mask_service import encode_mask, decode_mask, encode_rle
+
+    mask = np.zeros((64, 48), dtype=bool)
+    mask[0, 0] = True  # foreground first pixel: COCO counts start with a zero run
+    mask[10:30, 5:40] = True
+    noise = np.random.default_rng(0).random((64, 48)) > 0.5
+
+    assert encode_rle(mask)[0] == 0
+    for compression in ["zstd", "zlib", "none"]:
+        for m in (mask, noise):
+            payload = json.loads(json.dumps(encode_mask(m, compression)))
+            assert np.array_equal(decode_mask(payload), m)
+    assert encode_mask(noise, "zlib")["encoding"] == "bitmap"
+
+
+def test_geotiff_window_read(tmp_path):
+    """Only the window around the site is read, with the GSD from the geotransform."""
+    rasterio = pytest.importorskip("rasterio")
+    import numpy as np
+    from rasterio.transform import from_origin
+    from app.services.raster_service import read_site_window
+
+    lat, lon = 28.6139, 77.2090
+    res_deg = 1e-6  # about 0.11 m north-south
+    path = str(tmp_path / "ortho.tif")
+    data = np.zeros((3, 2000, 2000), dtype=np.uint8)
+    data[:, 1000, 1000] = 255  # the site's pixel
+    transform = from_origin(lon - 1000 * res_deg, lat + 1000 * res_deg, res_deg, res_deg)
+    with rasterio.open(path, "w", driver="GTiff", width=2000, height=2000, count=3, dtype="uint8",
+                       crs="EPSG:4326", transform=transform) as dataset:
+        dataset.write(data)
+
+    image, (gsd_x, gsd_y) = read_site_window(path, lat, lon, buffer_radius_m=20)
+
+    assert gsd_y == pytest.approx(0.11132, rel=1e-3)
+    assert gsd_x == pytest.approx(0.11132 * np.cos(np.radians(lat)), rel=1e-3)
+    assert image.shape == (2 * int(np.ceil(20 / gsd_y)), 2 * int(np.ceil(20 / gsd_x)), 3)
+    assert image.max() == 255  # the window is centred on the site
+
+    small, (small_gsd_x, _) = read_site_window(path, lat, lon, buffer_radius_m=20, max_size=64)
+    assert max(small.shape[:2]) == 64
+    assert small_gsd_x == pytest.approx(gsd_x * image.shape[1] / 64, rel=1e-2)
+
+
+def test_georeferenced_upload_resolution_is_judged_by_gsd(tmp_path, monkeypatch):
+    """A GeoTIFF window is small in pixels but fine on the ground; QC judges it by effective GSD."""
+    rasterio = pytest.importorskip("rasterio")
+    import asyncio
+    import cv2
+    import numpy as np
+    from rasterio.transform import from_origin
+    from app.core.config import settings
+    from app.services import solar_detection_service
+
+    async def no_panels(image, tta):
+        return np.zeros((64, 64), np.uint8), 0.9, 1
+
+    monkeypatch.setattr(solar_detection_service, "run_unet_inference", no_panels)
+    monkeypatch.setattr(settings, "ARTIFACT_DIR", str(tmp_path / "artifacts"))
+
+    lat, lon = 28.6139, 77.2090
+    rng = np.random.default_rng(0)
+
+    def detect(name, res_deg, size):
+        path = str(tmp_path / f"{name}.tif")
+        data = cv2.GaussianBlur(rng.integers(0, 256, (size, size, 3), dtype=np.uint8), (0, 0), 1.0)
+        transform = from_origin(lon - size / 2 * res_deg, lat + size / 2 * res_deg, res_deg, res_deg)
+        with rasterio.open(path, "w", driver="GTiff", width=size, height=size, count=3, dtype="uint8",
+                           crs="EPSG:4326", transform=transform) as dataset:
+            dataset.write(data.transpose(2, 0, 1))
+        return asyncio.run(solar_detection_service._run_unet_detection(path, "site_1", lat, lon))
+
+    # About 0.11 m/px: the 40 m window is ~400 px, under IMAGE_MIN_RESOLUTION_PX
+    fine = detect("fine", 1e-6, 1000)
+    assert fine.image_metadata["georeferenced"]
+    assert fine.image_metadata["quality"]["effective_resolution_px"] < settings.IMAGE_MIN_RESOLUTION_PX
+    assert fine.qc_status == "VERIFIABLE", fine.qc_notes
+    # About 1.1 m/px is too coarse to resolve modules
+    coarse = detect("coarse", 1e-5, 200)
+    assert "Low image resolution" in coarse.qc_notes
+
+
+def test_tile_store_zero_copy_batches(tmp_path):
+    """Tiles written to the store come back as memmap views, batched per chunk."""
+    import numpy as np
+    from app.services.tile_store_service import TileStore
+
+    store = TileStore.create(str(tmp_path / "tiles"), (8, 8, 3), chunk_size=4)
+    for i in range(6):
+        store.put(f"site_{i}", np.full((8, 8, 3), i, dtype=np.uint8))
+    store.put("site_9", np.full((16, 16, 3), 9, dtype=np.uint8))  # resized to the tile shape
+    store.flush()
+
+    reader = TileStore.open(store.root)
+    assert len(reader) == 7
+    assert reader.get("site_3").max() == 3
+    assert reader.get("site_9").shape == (8, 8, 3)
+
+    batches = list(reader.iter_batches(3))
+    assert [ids for ids, _ in batches] == [["site_0", "site_1", "site_2"], ["site_3"], ["site_4", "site_5", "site_9"]]
+    assert all(np.shares_memory(tiles, reader._chunk(0)) for _, tiles in batches[:2])
+
+
+def test_batch_detection_reads_tile_store_batches(tmp_path, monkeypatch):
+    """Batch detection runs one forward pass per store batch, preprocessed in the decode pool, in store order."""
+    import asyncio
+    import numpy as np
+    from app.core.config import settings
+    from app.services import batch_detection_service
+    from app.services.batch_detection_service import detect_tile_store
+    from app.services.decode_pool_service import DecodePool
+    from app.services.qc_service import QCRuleEngine
+    from app.services.tile_store_service import TileStore
+    from app.services.unet_service import preprocess_image
+
+    monkeypatch.setattr(settings, "UNET_IMAGE_SIZE", 16)
+    store = TileStore.create(str(tmp_path / "tiles"), (32, 32, 3), chunk_size=4)
+    levels = [20, 220, 30, 240, 50]
+    for i, level in enumerate(levels):
+        store.put(f"site_{i}", np.full((32, 32, 3), level, dtype=np.uint8))
+    store.flush()
+    sites = {f"site_{i}": (12.97, 77.59 + i * 1e-4) for i in range(len(levels))}
+
+    batches = []
+
+    def bright_is_solar(batch):
+        # Stand-in for the UNet: preprocessed brightness above zero is a panel
+        batches.append(batch.copy())
+        return (batch.mean(axis=1) > 0).astype(np.float32), 1
+
+    async def run(pool):
+        return [results async for results in detect_tile_store(store, sites, predict=bright_is_solar, pool=pool)]
+
+    # QC runs once per batch, vectorised
+    engine = QCRuleEngine()
+    evaluated = []
+
+    def evaluate(**columns):
+        evaluated.append(len(columns["confidence"]))
+        return QCRuleEngine.evaluate(engine, **columns)
+
+    monkeypatch.setattr(engine, "evaluate", evaluate)
+    monkeypatch.setattr(batch_detection_service, "get_qc_engine", lambda: engine)
+
+    pool = DecodePool(workers=1, image_size=16, slots=2, batch_size=3)
+    try:
+        results = asyncio.run(run(pool))
+    finally:
+        pool.close()
+    assert [len(batch) for batch in batches] == [3, 1, 1]
+    assert np.allclose(batches[0][1], preprocess_image(store.get("site_1"), 16)[0], atol=1e-5)
+    flat = [result for batch in results for result in batch]
+    assert [result.sample_id for result in flat] == store.sample_ids
+    assert [result.has_solar for result in flat] == [level > 128 for level in levels]
+    assert all(result.detection_evidence_hash for result in flat)
+    assert evaluated == [3, 1, 1]
+    # Flat tiles have no detail, so every site fails the blur check, as it would on its own
+    assert all(result.qc_status == "NOT_VERIFIABLE" and "Blurred image" in result.qc_notes for result in flat)
+
+
+def test_decode_pool_shared_memory(tmp_path):
+    """Pool workers preprocess into shared memory exactly like the inline path."""
+    import asyncio
+    import cv2
+    import numpy as np
+    from app.services.decode_pool_service import DecodePool
+    from app.services.unet_service import preprocess_image
+
+    rng = np.random.default_rng(0)
+    paths, images = [], []
+    for i in range(5):
+        image = rng.integers(0, 255, (40 + i, 60, 3), dtype=np.uint8)
+        path = str(tmp_path / f"site_{i}.png")
+        cv2.imwrite(path, cv2.cvtColor(image, cv2.COLOR_RGB2BGR))
+        paths.append(path)
+        images.append(image)
+
+    pool = DecodePool(workers=1, image_size=32, slots=2)
+    try:
+        decoded = list((d.path, d.tensor.copy(), d.shape) for d in pool.imap(paths))
+        assert [path for path, _, _ in decoded] == paths
+        for (_, tensor, shape), image in zip(decoded, images):
+            assert shape == image.shape[:2]
+            assert np.allclose(tensor, preprocess_image(image, 32), atol=1e-5)
+
+        async def decode_one():
+            async with pool.decode(paths[0]) as d:
+                return d.tensor.copy()
+        assert np.allclose(asyncio.run(decode_one()), decoded[0][1])
+    finally:
+        pool.close()
+
+
+def test_decode_pool_concurrent_tile_consumers(tmp_path):
+    """Two batch jobs sharing a pool smaller than their read-ahead both finish."""
+    import asyncio
+    import numpy as np
+    from app.services.decode_pool_service import DecodePool
+    from app.services.tile_store_service import TileStore
+    from app.services.unet_service import preprocess_image
+
+    stores = []
+    for s in range(2):
+        store = TileStore.create(str(tmp_path / f"tiles_{s}"), (8, 8, 3), chunk_size=4)
+        for i in range(6):
+            store.put(f"site_{i}", np.full((8, 8, 3), 40 * s + 5 * i, dtype=np.uint8))
+        store.flush()
+        stores.append(TileStore.open(store.root))
+
+    pool = DecodePool(workers=1, image_size=16, slots=2, batch_size=1)
+
+    async def consume(store):
+        seen = []
+        async for batch in pool.tile_batches(store):
+            assert np.allclose(batch.tensor, preprocess_image(batch.tiles[0], 16), atol=1e-5)
+            seen.extend(batch.sample_ids)
+            await asyncio.sleep(0.01)
+        return seen
+
+    async def both():
+        return await asyncio.wait_for(asyncio.gather(*(consume(store) for store in stores)), 30)
+
+    try:
+        assert asyncio.run(both()) == [[f"site_{i}" for i in range(6)]] * 2
+        # Every slot is back in the ring
+        assert pool._free.qsize() == pool.slots
+    finally:
+        pool.close()
+
+
+def test_tile_provider_cache_and_mosaic(tmp_path):
+    """Sites are mosaicked from XYZ tiles; shared and repeated tiles are downloaded once."""
+    import asyncio
+    import cv2
+    import httpx
+    import numpy as np
+    from app.services.tile_provider_service import XYZTileProvider
+
+    requests = []
+
+    def handler(request):
+        requests.append(request.url.path)
+        tile = np.full((256, 256, 3), len(requests) % 255, dtype=np.uint8)
+        return httpx.Response(200, content=cv2.imencode(".png", tile)[1].tobytes())
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            provider = XYZTileProvider(
+                "test", "https://tiles.test/{z}/{x}/{y}.png", zoom=19, cache_dir=str(tmp_path), client=client
+            )
+            first, second = await asyncio.gather(
+                provider.fetch_site_image(12.9716, 77.5946, 20),
+                provider.fetch_site_image(12.9716, 77.5946, 20)
+            )
+            downloads = len(requests)
+            # A neighbour a few metres away is served from the disk cache
+            neighbour = await provider.fetch_site_image(12.97161, 77.59461, 20)
+            return first, second, neighbour, downloads
+
+    (image, gsd, tiles), second, neighbour, downloads = asyncio.run(run())
+    assert downloads == tiles == len(set(requests))
+    assert len(requests) == downloads
+    assert image.dtype == np.uint8 and image.shape[2] == 3
+    assert abs(image.shape[0] * gsd - 40) < 2 * gsd
+    assert np.array_equal(image, second[0])
+    assert neighbour[0].shape == image.shape
+
+
+def test_batch_plan_fetches_each_tile_once(tmp_path, monkeypatch):
+    """Neighbouring sites are grouped and scheduled together; shared tiles are downloaded once."""
+    import asyncio
+    import cv2
+    import httpx
+    import numpy as np
+    from app.services import tile_provider_service
+    from app.services.batch_planner_service import plan_batch, run_batch_imagery
+    from app.services.tile_provider_service import XYZTileProvider
+    from app.services.tile_store_service import TileStore
+
+    # Two streets far apart, listed interleaved as in a district CSV
+    sites = []
+    for i in range(6):
+        sites.append((f"a{i}", 12.9716 + i * 0.00005, 77.5946))
+        sites.append((f"b{i}", 28.6139, 77.2090 + i * 0.00005))
+    plan = plan_batch(sites, zoom=19, buffer_radius_m=20)
+    ordered = [site.sample_id[0] for site in plan.sites]
+    assert ordered in (list("aaaaaabbbbbb"), list("bbbbbbaaaaaa"))
+    summary = plan.summary()
+    assert summary["sites"] == 12 and summary["unique_tiles"] < summary["tile_requests"]
+    # Zoom 0 is a real zoom level, not "use the default"
+    assert plan_batch(sites[:2], zoom=0).zoom == 0
+
+    requests = []
+
+    def handler(request):
+        requests.append(request.url.path)
+        tile = np.full((256, 256, 3), 128, dtype=np.uint8)
+        return httpx.Response(200, content=cv2.imencode(".png", tile)[1].tobytes())
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            provider = XYZTileProvider("test", "https://tiles.test/{z}/{x}/{y}.png", zoom=19,
+                                       cache_dir=str(tmp_path / "cache"), client=client)
+            monkeypatch.setitem(tile_provider_service._providers, "test", provider)
+            store = TileStore.create(str(tmp_path / "store"), (32, 32, 3))
+            return store, await run_batch_imagery(plan, store, provider="test", buffer_radius_m=20)
+
+    store, result = asyncio.run(run())
+    assert result["tiles_fetched"] == len(requests) == summary["unique_tiles"]
+    assert store.sample_ids == [site.sample_id for site in plan.sites]
+
+
+def test_csv_job_detects_in_plan_order_and_removes_store(tmp_path, monkeypatch):
+    """A CSV job runs detection over its planned tile store and deletes the store afterwards."""
+    import asyncio
+    import os
+    from contextlib import asynccontextmanager
+    import numpy as np
+    from app.core.config import settings
+    from app.services import job_service
+    from app.services.batch_detection_service import detect_tile_store
+    from app.services.decode_pool_service import DecodePool
+
+    @asynccontextmanager
+    async def no_db():
+        class Session:
+            async def get(self, model, key):
+                return None
+        yield Session()
+
+    async def unet_loaded():
+        return True
+
+    saved = []
+
+    async def save(results):
+        saved.extend(results)
+
+    pool = DecodePool(workers=1, image_size=16, slots=2, batch_size=2)
+    monkeypatch.setattr(job_service, "get_db", no_db)
+    monkeypatch.setattr(job_service, "load_unet_model", unet_loaded)
+    monkeypatch.setattr(job_service, "save_verification_results", save)
+    monkeypatch.setattr(job_service, "detect_tile_store", lambda store, sites: detect_tile_store(
+        store, sites, predict=lambda batch: (np.zeros(batch.shape[:1] + batch.shape[2:], np.float32), 1), pool=pool
+    ))
+    monkeypatch.setattr(settings, "TILE_STORE_DIR", str(tmp_path / "tiles"))
+    monkeypatch.setattr(settings, "TILE_SIZE_PX", 32)
+    monkeypatch.setattr(settings, "SATELLITE_PROVIDER", "mock")
+
+    csv_path = tmp_path / "sites.csv"
+    # site_0 and site_2 are neighbours, site_1 is in another city
+    csv_path.write_text("sample_id,lat,lon\nsite_0,12.9716,77.5946\nsite_1,28.6139,77.2090\nsite_2,12.97165,77.5946\n")
+    try:
+        asyncio.run(job_service.process_csv_job("job-1", str(csv_path)))
+    finally:
+        pool.close()
+
+    order = [result.sample_id for result in saved]
+    assert sorted(order) == ["site_0", "site_1", "site_2"]
+    assert abs(order.index("site_0") - order.index("site_2")) == 1
+    assert not os.path.exists(tmp_path / "tiles" / "job-1")
+
+
+def test_csv_job_without_unet_falls_back_to_mock(tmp_path, monkeypatch):
+    """Without the UNet weights a CSV job still finishes, with mock results for every site."""
+    import asyncio
+    import os
+    from contextlib import asynccontextmanager
+    from app.core.config import settings
+    from app.services import job_service
+
+    @asynccontextmanager
+    async def no_db():
+        class Session:
+            async def get(self, model, key):
+                return None
+        yield Session()
+
+    async def unet_missing():
+        return False
+
+    saved = []
+
+    async def save(results):
+        saved.extend(results)
+
+    monkeypatch.setattr(job_service, "get_db", no_db)
+    monkeypatch.setattr(job_service, "load_unet_model", unet_missing)
+    monkeypatch.setattr(job_service, "save_verification_results", save)
+    monkeypatch.setattr(settings, "TILE_STORE_DIR", str(tmp_path / "tiles"))
+    monkeypatch.setattr(settings, "TILE_SIZE_PX", 32)
+    monkeypatch.setattr(settings, "SATELLITE_PROVIDER", "mock")
+
+    csv_path = tmp_path / "sites.csv"
+    csv_path.write_text("sample_id,lat,lon\nsite_0,12.9716,77.5946\nsite_1,28.6139,77.2090\n")
+    asyncio.run(job_service.process_csv_job("job-2", str(csv_path)))
+
+    assert sorted(result.sample_id for result in saved) == ["site_0", "site_1"]
+    assert all("mock result" in result.qc_notes[-1] and result.detection_evidence_hash for result in saved)
+    # Different tiles, different evidence
+    assert saved[0].detection_evidence_hash != saved[1].detection_evidence_hash
+    assert not os.path.exists(tmp_path / "tiles" / "job-2")
+
+
+def test_scratch_space_leases_and_sweeping(tmp_path):
+    """Leased files survive sweeps; others go by age, then oldest-first over the size quota."""
+    import asyncio
+    import os
+    import time
+    from app.services.scratch_service import ScratchSpace
+
+    scratch = ScratchSpace(str(tmp_path / "disk"), max_age_s=60, max_bytes=250,
+                           tmpfs_root=str(tmp_path / "shm"), tmpfs_max_file_bytes=50)
+    small = asyncio.run(scratch.save_bytes(b"x" * 10, "small.csv"))
+    large = asyncio.run(scratch.save_bytes(b"x" * 100, "large.csv"))
+    assert os.path.dirname(small) == str(tmp_path / "shm")
+    assert os.path.dirname(large) == str(tmp_path / "disk")
+
+    now = time.time()
+    paths = []
+    for i, age in enumerate([600, 50, 40, 30]):
+        path = str(tmp_path / "disk" / f"left_{i}.png")
+        with open(path, "wb") as f:
+            f.write(b"y" * 100)
+        os.utime(path, (now - age, now - age))
+        paths.append(path)
+    os.utime(large, (now - 600, now - 600))
+
+    removed = scratch.sweep(now)
+    # left_0 is too old; then 410 bytes held > 250, so left_1 and left_2 are evicted
+    assert removed == {"files": 3, "bytes": 300}
+    assert [os.path.exists(p) for p in paths] == [False, False, False, True]
+    assert os.path.exists(large) and os.path.exists(small)
+
+    scratch.release(large)
+    scratch.release(small)
+    assert not os.path.exists(large) and not os.path.exists(small)
+    stats = scratch.stats()
+    assert stats["files"] == 1 and stats["bytes_held"] == 100 and stats["leased_files"] == 0
+
+    # A lease taken after the sweeper listed the directory still protects the file
+    old = str(tmp_path / "disk" / "duplicate.png")
+    with open(old, "wb") as f:
+        f.write(b"z" * 10)
+    os.utime(old, (now - 600, now - 600))
+    scan = scratch._scan
+
+    def scan_then_lease():
+        files = scan()
+        scratch.acquire(old)
+        return files
+
+    scratch._scan = scan_then_lease
+    scratch.sweep(now)
+    assert os.path.exists(old)
+
+
+def test_minio_service_async_transfers(tmp_path):
+    """Transfers run off the event loop against an in-memory S3 stand-in; streams go up part by part."""
+    import asyncio
+    import io
+    import threading
+    import time
+    from app.services.minio_service import MinIOService
+
+    class FakeObject(io.BytesIO):
+        def release_conn(self):
+            pass
+
+    class FakeS3:
+        def __init__(self):
+            self.buckets, self.objects, self.calls, self.threads = set(), {}, [], set()
+
+        def _call(self, name, **kwargs):
+            self.calls.append((name, kwargs))
+            self.threads.add(threading.get_ident())
+
+        def bucket_exists(self, bucket):
+            self._call("bucket_exists")
+            return bucket in self.buckets
+
+        def make_bucket(self, bucket):
+            self._call("make_bucket")
+            self.buckets.add(bucket)
+
+        def fput_object(self, bucket, name, path, **kwargs):
+            self._call("fput_object", **kwargs)
+            time.sleep(0.2)
+            with open(path, "rb") as f:
+                self.objects[name] = f.read()
+
+        def put_object(self, bucket, name, data, length, part_size, **kwargs):
+            self._call("put_object", length=length, part_size=part_size)
+            parts = []
+            while True:
+                part = data.read(part_size)
+                if not part:
+                    break
+                parts.append(part)
+            self.objects[name] = b"".join(parts)
+
+        def get_object(self, bucket, name):
+            return FakeObject(self.objects[name])
+
+        def fget_object(self, bucket, name, path):
+            with open(path, "wb") as f:
+                f.write(self.objects[name])
+
+        def presigned_get_object(self, bucket, name, expires):
+            return f"http://minio.test/{bucket}/{name}?X-Amz-Expires={int(expires.total_seconds())}"
+
+    fake = FakeS3()
+    service = MinIOService(bucket_name="test-bucket", client=fake)
+    assert fake.calls == []  # nothing happens until the first transfer
+
+    source = tmp_path / "roof.png"
+    source.write_bytes(b"p" * 1000)
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        url = await service.upload_file(str(source), "artifacts/roof.png")
+        task.cancel()
+
+        async def body():
+            for _ in range(4):
+                yield b"s" * (3 * 1024 * 1024)
+
+        size = await service.upload_stream(body(), "uploads/site_1/raw")
+        streamed = b"".join([chunk async for chunk in service.iter_object("artifacts/roof.png", 256)])
+        downloaded = await service.download_file("artifacts/roof.png", str(tmp_path / "copy.png"))
+        presigned = await service.presigned_url("artifacts/roof.png", 60)
+        return ticks, url, size, streamed, downloaded, presigned
+
+    ticks, url, size, streamed, downloaded, presigned = asyncio.run(run())
+    service.close()
+
+    assert ticks >= 5  # the loop kept running during the 0.2 s upload
+    assert threading.get_ident() not in fake.threads
+    assert url.endswith("/test-bucket/artifacts/roof.png")
+    assert [name for name, _ in fake.calls].count("make_bucket") == 1
+    fput = dict(fake.calls)["fput_object"]
+    assert fput["content_type"] == "image/png" and fput["num_parallel_uploads"] >= 1
+    assert dict(fake.calls)["put_object"]["length"] == -1
+    assert size == 12 * 1024 * 1024 and fake.objects["uploads/site_1/raw"] == b"s" * size
+    assert streamed == b"p" * 1000 and downloaded
+    assert (tmp_path / "copy.png").read_bytes() == b"p" * 1000
+    assert presigned.endswith("X-Amz-Expires=60")
+
+
+def test_certificate_engine_bulk_and_district_zips(tmp_path):
+    """The pool renders per-site PDFs, a multi-page bulk PDF and one zip per district."""
+    import asyncio
+    import zipfile
+    import cv2
+    import numpy as np
+    from app.services.certificate_service import CertificateEngine, _QRCode, certificate_record
+
+    records = [
+        certificate_record(f"site_{i}", 12.97, 77.59, 3.5, 0.9, "VERIFIABLE", district=["North", "South"][i % 2])
+        for i in range(5)
+    ]
+
+    async def run():
+        engine = CertificateEngine(workers=1, chunk_size=2)
+        try:
+            pdfs = await engine.render_many(records)
+            bulk = await engine.render_bulk(records)
+            zips = await engine.write_district_zips(records, str(tmp_path))
+            return pdfs, bulk, zips
+        finally:
+            engine.close()
+
+    pdfs, bulk, zips = asyncio.run(run())
+    assert len(pdfs) == 5 and all(pdf.startswith(b"%PDF") for pdf in pdfs)
+    assert b"/Count 5" in bulk
+    assert set(zips) == {"North", "South"}
+    with zipfile.ZipFile(zips["North"]) as archive:
+        assert sorted(archive.namelist()) == ["site_0_certificate.pdf", "site_2_certificate.pdf", "site_4_certificate.pdf"]
+
+    # The embedded QR code decodes to the site's verification URL
+    qr = _QRCode("http://localhost:8000/api/v1/site/site_3", 100)
+    modules = np.where(np.array(qr.matrix), 0, 255).astype(np.uint8)
+    image = cv2.copyMakeBorder(cv2.resize(modules, None, fx=8, fy=8, interpolation=cv2.INTER_NEAREST),
+                               16, 16, 16, 16, cv2.BORDER_CONSTANT, value=255)
+    assert cv2.QRCodeDetector().detectAndDecode(image)[0].endswith("/site/site_3")
+
+
+def test_certificate_reissue_is_cached(tmp_path, monkeypatch):
+    """Unchanged verifications get the same certificate ID and bytes; changed ones re-render."""
+    import asyncio
+    from app.core.config import settings
+    from app.services import artifact_service, certificate_service
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "ARTIFACT_DIR", str(tmp_path / "artifacts"))
+    monkeypatch.setattr(artifact_service, "_index", {})
+    monkeypatch.setattr(certificate_service, "_certificate_cache", certificate_service.CertificateCache())
+
+    first = certificate_service.certificate_record("site_1", 12.97, 77.59, 3.5, 0.9, "VERIFIABLE", "ab" * 32)
+    again = certificate_service.certificate_record("site_1", 12.97, 77.59, 3.5, 0.9, "VERIFIABLE", "ab" * 32)
+    assert first["certificate_id"] == again["certificate_id"]
+    assert first["fingerprint"] == again["fingerprint"]
+
+    async def issue(capacity):
+        path = await certificate_service.generate_certificate(
+            "site_1", 12.97, 77.59, capacity, 0.9, "VERIFIABLE", evidence_hash="ab" * 32
+        )
+        with open(path, "rb") as f:
+            return f.read()
+
+    try:
+        pdf = asyncio.run(issue(3.5))
+        assert asyncio.run(issue(3.5)) == pdf
+        assert asyncio.run(issue(4.0)) != pdf
+    finally:
+        certificate_service.shutdown_certificate_engine()
+
+    stats = certificate_service.get_certificate_cache().stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2 and stats["hit_rate"] == 0.3333
+    assert artifact_service.get_artifact("site_1", "certificate")["size"] > 0
+
+
+def test_evidence_anchor_merkle_batches(tmp_path):
+    """A window of hashes is anchored as one root; every proof verifies and tampering fails."""
+    import asyncio
+    import hashlib
+    from app.services.blockchain_service import EvidenceAnchor, verify_merkle_proof
+
+    hashes = [hashlib.sha256(f"site_{i}".encode()).hexdigest() for i in range(7)]
+    anchor = EvidenceAnchor(window_s=0.05, max_batch=100, directory=str(tmp_path))
+
+    async def run():
+        receipts = await asyncio.gather(*(anchor.submit(h) for h in hashes))
+        extra = anchor.enqueue(hashes[0][::-1])  # next window, next batch
+        await anchor.flush()
+        return receipts, extra.result()
+
+    receipts, extra = asyncio.run(run())
+    roots = {receipt["merkle_root"] for receipt in receipts}
+    assert len(roots) == 1 and len({receipt["tx_hash"] for receipt in receipts}) == 1
+    assert extra["merkle_root"] not in roots
+
+    root = roots.pop()
+    assert anchor.get_batch(root)["leaf_count"] == 7
+    for h, receipt in zip(hashes, receipts):
+        assert len(receipt["proof"]) <= 3  # ceil(log2(7))
+        assert anchor.verify(h, receipt["proof"], root)[0]
+        assert anchor.get_receipt(h) == receipt
+
+    assert not verify_merkle_proof(hashes[1], receipts[0]["proof"], root)
+    forged = [dict(step) for step in receipts[0]["proof"]]
+    forged[0]["side"] = "left" if forged[0]["side"] == "right" else "right"
+    assert not verify_merkle_proof(hashes[0], forged, root)
+    # A correct proof against a root that was never anchored is rejected
+    assert not anchor.verify(hashes[0], receipts[0]["proof"], "0" * 64)[0]
+
+
+def test_batched_anchor_record_is_backfilled(tmp_path, monkeypatch):
+    """A result's pending blockchain_tx (and the cached copy of it) fills in once its batch is anchored."""
+    import asyncio
+    from datetime import datetime
+    from app.models.schemas import SiteVerificationResponse
+    from app.services import blockchain_service
+    from app.services.blockchain_service import EvidenceAnchor
+    from app.services.upload_dedup_service import ResultCache
+
+    anchor = EvidenceAnchor(window_s=60, max_batch=100, directory=str(tmp_path))
+    monkeypatch.setattr(blockchain_service, "_anchor", anchor)
+    evidence_hash = "ab" * 32
+
+    async def run():
+        async def compute():
+            response = SiteVerificationResponse(
+                sample_id="site_1", lat=0.0, lon=0.0, has_solar=False, confidence=0.5,
+                panel_count_est=None, pv_area_sqm_est=None, capacity_kw_est=None,
+                qc_status="VERIFIABLE", qc_notes=[], bbox_or_mask=None, image_metadata={},
+                detection_evidence_hash=evidence_hash, certificate_url=None, blockchain_tx={},
+                created_at=datetime.now(), updated_at=datetime.now()
+            )
+            response.blockchain_tx = await store_evidence_on_blockchain(evidence_hash, batched=True)
+            return response
+
+        cache = ResultCache(max_entries=4)
+        result, _ = await cache.get_or_compute("key", compute)
+        assert result.blockchain_tx["status"] == "pending"
+        assert result.blockchain_tx["proof_url"] == f"/api/v1/verify/evidence/{evidence_hash}"
+        await anchor.flush()
+        await asyncio.sleep(0)
+        return (await cache.get_or_compute("key", compute))[0]
+
+    cached = asyncio.run(run())
+    assert cached.blockchain_tx["status"] == "anchored"
+    assert cached.blockchain_tx["tx_hash"] == anchor.get_receipt(evidence_hash)["tx_hash"]
+
+def test_evidence_hash_covers_image_mask_and_result(tmp_path):
+    """The evidence hash is deterministic and changes with the image, the mask or the result."""
+    import hashlib
+    import numpy as np
+    from app.services.evidence_service import EvidenceHasher
+    from app.services.mask_service import encode_mask
+
+    image = b"\x89PNG" + bytes(range(256)) * 64
+    image_path = tmp_path / "site.png"
+    image_path.write_bytes(image)
+    mask = np.zeros((32, 32), dtype=bool)
+    mask[4:12, 8:20] = True
+    result = {"sample_id": "S1", "has_solar": True, "confidence": 0.91, "created_at": "2024-01-01T00:00:00Z"}
+
+    def evidence_hash(image_sha256=None, mask=mask, result=result, compression="zlib"):
+        hasher = EvidenceHasher(image_sha256)
+        hasher.hash_image_file(str(image_path))
+        encode_mask(mask, compression=compression, evidence=hasher)
+        return hasher.finalize(result)
+
+    baseline = evidence_hash()
+    # The digest computed while uploading stands in for reading the file again
+    assert evidence_hash(hashlib.sha256(image).hexdigest()) == baseline
+    # Canonical: independent of mask compression, key order and timestamps
+    assert evidence_hash(compression="none") == baseline
+    assert evidence_hash(result={**dict(reversed(list(result.items()))), "created_at": "2025-06-30T12:00:00Z"}) == baseline
+
+    assert evidence_hash(hashlib.sha256(image + b"\0").hexdigest()) != baseline
+    moved = np.roll(mask, 1, axis=1)
+    assert evidence_hash(mask=moved) != baseline
+    assert evidence_hash(result={**result, "confidence": 0.92}) != baseline
+
+def test_chat_engine_multilingual_intents_and_hot_reload(tmp_path):
+    """Keywords in every language classify in one pass, and catalog edits apply without a restart."""
+    import json
+    import shutil
+    from app.services.chat_service import ChatEngine
+
+    catalog_path = tmp_path / "chat_catalog.json"
+    shutil.copy("data/chat_catalog.json", catalog_path)
+    engine = ChatEngine(str(catalog_path), reload_interval_s=0)
+
+    assert engine.respond("Am I ELIGIBLE?", "en")[0] == "eligibility_check"
+    assert engine.respond("कौन से दस्तावेज़ चाहिए", "hi")[0] == "required_documents"
+    assert engine.respond("അപേക്ഷിക്കാനുള്ള ഘട്ടങ്ങൾ", "ml")[0] == "application_steps"
+    assert engine.respond("எனக்கு ஒரு புகார் உள்ளது", "ta")[0] == "grievance_procedure"
+    # Earlier catalog entries take precedence, as before
+    assert engine.respond("documents for my application", "en")[0] == "application_steps"
+    intent, text = engine.respond("hello", "fr")
+    assert intent == "general" and text.startswith("I'm here to help")
+
+    data = json.loads(catalog_path.read_text(encoding="utf-8"))
+    data["intents"][0]["keywords"]["en"].append("qualify")
+    data["intents"][0]["responses"]["en"] = "Updated eligibility answer."
+    catalog_path.write_text(json.dumps(data), encoding="utf-8")
+    assert engine.respond("Do I qualify?", "en") == ("eligibility_check", "Updated eligibility answer.")
+
+    # A broken edit keeps the last good catalog
+    version = engine.catalog.version
+    catalog_path.write_text("{not json", encoding="utf-8")
+    assert engine.respond("Do I qualify?", "en")[0] == "eligibility_check"
+    assert engine.catalog.version == version
+
+def test_chat_log_writer_batches_and_bounds(monkeypatch):
+    """Chat logs are queued without touching the database and inserted in bounded batches."""
+    import asyncio
+    from app.services import chat_log_service
+    from app.services.chat_log_service import ChatLogWriter
+
+    commits = []
+
+    class FakeSession:
+        def __init__(self):
+            self.rows = []
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        def add_all(self, rows):
+            self.rows.extend(rows)
+
+        async def commit(self):
+            if any(row.message == "boom" for row in self.rows):
+                raise RuntimeError("database unavailable")
+            commits.append([row.message for row in self.rows])
+
+    writer = ChatLogWriter(max_pending=5, batch_size=2, flush_interval_s=60, session_factory=FakeSession)
+    monkeypatch.setattr(chat_log_service, "_writer", writer)
+
+    async def run():
+        chat_log_service.start_chat_log_writer()
+        await asyncio.sleep(0)
+        for i in range(6):
+            writer.submit("en", f"m{i}", "reply")
+        # A full batch is written right away, not after the 60 s interval
+        await asyncio.sleep(0.05)
+        written_early = writer.written
+        writer.submit("hi", "boom", "reply")
+        await chat_log_service.stop_chat_log_writer()
+        return written_early
+
+    written_early = asyncio.run(run())
+    assert written_early >= 2
+    assert [m for batch in commits for m in batch] == ["m0", "m1", "m2", "m3", "m4"]
+    assert all(len(batch) <= 2 for batch in commits)
+    stats = writer.stats()
+    assert stats["dropped"] == 1 and stats["failed"] == 1 and stats["pending"] == 0
+    assert stats["written"] == 5 and stats["enqueued"] == 6
+
+def test_chat_response_cache_normalizes_and_invalidates(tmp_path, monkeypatch):
+    """Repeated questions skip classification; editing the catalog empties the cache."""
+    import json
+    import shutil
+    from app.services.chat_service import ChatCatalog, ChatEngine
+
+    catalog_path = tmp_path / "chat_catalog.json"
+    shutil.copy("data/chat_catalog.json", catalog_path)
+    engine = ChatEngine(str(catalog_path), reload_interval_s=0, cache_size=4)
+
+    classified = []
+    classify = ChatCatalog.classify
+    monkeypatch.setattr(ChatCatalog, "classify", lambda self, message: classified.append(message) or classify(self, message))
+
+    first = engine.respond("Am I eligible?", "en")
+    assert engine.respond("  am i   ELIGIBLE? ", "en") == first
+    assert engine.respond("Am I eligible?", "en") == first
+    assert classified == ["am i eligible?"]
+    # The language is part of the key
+    assert engine.respond("Am I eligible?", "hi") != first
+    assert engine.cache.stats()["hits"] == 2 and len(engine.cache) <= 4
+
+    data = json.loads(catalog_path.read_text(encoding="utf-8"))
+    data["intents"][0]["responses"]["en"] = "Updated eligibility answer."
+    catalog_path.write_text(json.dumps(data), encoding="utf-8")
+    assert engine.respond("Am I eligible?", "en") == ("eligibility_check", "Updated eligibility answer.")
+    assert engine.cache.stats()["invalidations"] == 1
+
+def test_qc_rule_engine_batch_matches_single_site(monkeypatch):
+    """Batch evaluation agrees with per-site checks, and thresholds come from settings."""
+    import numpy as np
+    from app.core.config import settings
+    from app.services.qc_service import QCRuleEngine
+
+    monkeypatch.setattr(settings, "CONFIDENCE_THRESHOLD_VERIFIABLE", 0.8)
+    engine = QCRuleEngine()
+
+    confidence = [0.9, 0.75, 0.95, 0.99, None]
+    image_resolution = [1024, 1024, 256, 1024, 1024]
+    capacity_kw_est = [5.0, 5.0, None, 150.0, 3.0]
+    reason_codes = ["module_grid", "", "cloudy,module_grid", None, "occluded_by_tree"]
+
+    result = engine.evaluate(
+        confidence=confidence,
+        image_resolution=image_resolution,
+        capacity_kw_est=capacity_kw_est,
+        reason_codes=reason_codes
+    )
+    assert result.statuses.tolist() == ["VERIFIABLE"] + ["NOT_VERIFIABLE"] * 4
+    for i in range(len(confidence)):
+        status, notes = engine.evaluate_one(
+            reason_codes[i],
+            confidence=confidence[i],
+            image_resolution=image_resolution[i],
+            capacity_kw_est=capacity_kw_est[i]
+        )
+        assert status == result.statuses[i] and notes == result.notes(i) == list(result.all_notes()[i])
+    # 0.75 passes the old hardcoded 0.7 but not the configured threshold
+    assert result.notes(1) == ["Low confidence score"]
+
+    custom = QCRuleEngine([{"name": "small", "column": "capacity_kw_est", "op": "<", "value": 1, "note": "Tiny"}])
+    assert custom.evaluate(capacity_kw_est=np.array([0.5, 2.0])).verifiable.tolist() == [False, True]
+
+def test_image_quality_signals_feed_qc():
+    """Blur, cloud, exposure and upsampling are measured and turned into QC notes."""
+    import asyncio
+    import cv2
+    import numpy as np
+    from app.services.image_quality_service import analyze_image_quality
+    from app.services.qc_service import apply_quality_control
+
+    rng = np.random.default_rng(0)
+    sharp = cv2.GaussianBlur(rng.integers(0, 256, (512, 512, 3), dtype=np.uint8), (0, 0), 1.0)
+    clouded = sharp.copy()
+    clouded[:, :320] = 235
+    signals = {
+        "sharp": analyze_image_quality(sharp),
+        "blurred": analyze_image_quality(cv2.GaussianBlur(sharp, (0, 0), 4)),
+        "clouded": analyze_image_quality(clouded),
+        "dark": analyze_image_quality(np.zeros((512, 512, 3), dtype=np.uint8)),
+        "upsampled": analyze_image_quality(cv2.resize(sharp[:128, :128], (512, 512), interpolation=cv2.INTER_CUBIC))
+    }
+    assert signals["sharp"]["effective_resolution_px"] == 512
+    assert signals["upsampled"]["effective_resolution_px"] == 128
+    assert signals["clouded"]["cloud_fraction"] > 0.5 > signals["sharp"]["cloud_fraction"]
+    assert signals["dark"]["clipped_fraction"] == 1.0
+
+    def notes(name):
+        quality = signals[name]
+        return asyncio.run(apply_quality_control(
+            confidence=0.9,
+            image_resolution=quality["effective_resolution_px"],
+            reason_codes="solar_panels_detected",
+            capacity_kw_est=5.0,
+            image_quality=quality
+        ))[1]
+
+    assert notes("sharp") == []
+    assert "Blurred image" in notes("blurred")
+    assert "Cloud or haze over the site" in notes("clouded")
+    assert "Under- or overexposed image" in notes("dark")
+    assert "Low image resolution" in notes("upsampled")
+
+def test_cascade_screens_out_unlikely_sites(tmp_path, monkeypatch):
+    """Only sites the prefilter scores above the threshold run the full model."""
+    import asyncio
+    import cv2
+    import numpy as np
+    from app.services import cascade_service
+    from app.services.cascade_service import Cascade, CascadePolicy
+    from app.services.inference_service import run_model_inference
+
+    monkeypatch.delenv("ROBOFLOW_API_KEY", raising=False)
+    sizes = []
+
+    def bright_panels(image, size):
+        # Stand-in for the low-resolution UNet: the brighter, the likelier
+        sizes.append(min(image.shape[:2]))
+        return float(image.mean()) / 255.0
+
+    cascade = Cascade(CascadePolicy(enabled=True, models=["roboflow"], prefilter_size=256, escalate_above=0.2), bright_panels)
+    monkeypatch.setattr(cascade_service, "_cascade", cascade)
+
+    paths = []
+    for i, level in enumerate([10, 20, 200]):
+        path = tmp_path / f"site_{i}.png"
+        cv2.imwrite(str(path), np.full((1024, 1024, 3), level, dtype=np.uint8))
+        paths.append(str(path))
+
+    results = [asyncio.run(run_model_inference(f"site_{i}", path, "roboflow")) for i, path in enumerate(paths)]
+    assert [r[6] for r in results[:2]] == ["cascade_prefilter_negative"] * 2
+    assert not results[0][0] and results[0][1] > 0.9
+    assert results[0][5] is None
+    assert results[2][6] != "cascade_prefilter_negative"
+    # The prefilter decodes at a reduced size that still covers 256 px
+    assert sizes == [256] * 3
+    # Models outside the policy are not prefiltered
+    asyncio.run(run_model_inference("site_1", paths[0], "mock"))
+
+    stats = cascade.stats()
+    assert (stats["scored"], stats["escalated"], stats["screened_out"]) == (3, 1, 2)
+    assert stats["escalation_rate"] == round(1 / 3, 4)
+    assert stats["mean_full_model_ms"] > 0
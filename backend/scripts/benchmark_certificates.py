@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark certificate rendering: the per-call approach (fresh stylesheet,
+PNG QR code) vs the shared template, inline and in the process pool, plus
+a bulk multi-page PDF
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from io import BytesIO
+
+# Add the app directory to the path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import qrcode
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+from app.services.certificate_service import (
+    CertificateEngine, certificate_record, render_bulk_pdf, render_certificate_pdf
+)
+
+def render_per_call(record) -> bytes:
+    """What generate_certificate used to do for every site."""
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    styles = getSampleStyleSheet()
+    story = [Paragraph("Solar Installation Verification Certificate", styles['Title']), Spacer(1, 0.2 * inch)]
+    story.append(Paragraph(f"Certificate ID: {record['certificate_id']}", styles['Normal']))
+    for key in ("sample_id", "lat", "lon", "capacity_kw_est", "confidence", "qc_status", "issue_date"):
+        story.append(Paragraph(f"{key}: {record[key]}", styles['Normal']))
+        story.append(Spacer(1, 0.1 * inch))
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(f"http://localhost:8000/api/v1/site/{record['sample_id']}")
+    qr.make(fit=True)
+    qr.make_image(fill_color="black", back_color="white").save(BytesIO(), format='PNG')
+    doc.build(story)
+    return buffer.getvalue()
+
+def rate(count: int, seconds: float) -> str:
+    return f"{count / seconds:8.1f} certificates/s"
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark certificate rendering')
+    parser.add_argument('--certificates', type=int, default=500, help='Number of certificates')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Process pool size')
+    args = parser.parse_args()
+
+    records = [
+        certificate_record(f'site_{i:05d}', 12.97 + i * 1e-4, 77.59, 3.5, 0.91, 'VERIFIABLE', district=f'D{i % 4}')
+        for i in range(args.certificates)
+    ]
+
+    start = time.perf_counter()
+    for record in records:
+        render_per_call(record)
+    per_call = time.perf_counter() - start
+
+    render_certificate_pdf(records[0])  # build the template once
+    start = time.perf_counter()
+    for record in records:
+        render_certificate_pdf(record)
+    shared = time.perf_counter() - start
+
+    async def pooled():
+        engine = CertificateEngine(workers=args.workers)
+        try:
+            await engine.render(records[0])  # start the workers
+            start = time.perf_counter()
+            pdfs = await engine.render_many(records)
+            return time.perf_counter() - start, pdfs
+        finally:
+            engine.close()
+    pool_seconds, pdfs = asyncio.run(pooled())
+    assert len(pdfs) == len(records)
+
+    start = time.perf_counter()
+    bulk = render_bulk_pdf(records)
+    bulk_seconds = time.perf_counter() - start
+
+    print(f"{args.certificates} certificates, {args.workers} worker(s), {os.cpu_count()} CPU(s)")
+    print(f"Per-call setup:        {rate(args.certificates, per_call)}")
+    print(f"Shared template:       {rate(args.certificates, shared)} ({per_call / shared:.1f}x)")
+    print(f"Process pool:          {rate(args.certificates, pool_seconds)} ({per_call / pool_seconds:.1f}x)")
+    print(f"Bulk multi-page PDF:   {rate(args.certificates, bulk_seconds)} ({per_call / bulk_seconds:.1f}x), "
+          f"{len(bulk) / 1e6:.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark chat intent classification: the compiled multilingual keyword
+matcher, with and without the response cache, vs the old per-call response
+table and chained English substring checks
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+# Add the app directory to the path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.chat_service import ChatEngine
+
+MESSAGES = [
+    ("en", "Am I eligible for the rooftop solar subsidy?"),
+    ("en", "What are the steps to apply for PM Surya Ghar?"),
+    ("en", "Which documents do I need to submit with my application form?"),
+    ("en", "I have a problem with my installation, the vendor has not responded"),
+    ("en", "hello, what is this scheme about"),
+    ("hi", "क्या मैं पीएम सूर्य घर योजना के लिए पात्र हूं?"),
+    ("hi", "आवेदन कैसे करें"),
+    ("hi", "कौन से दस्तावेज़ चाहिए"),
+    ("hi", "मेरी शिकायत दर्ज करें"),
+    ("ml", "എനിക്ക് യോഗ്യത ഉണ്ടോ?"),
+    ("ml", "അപേക്ഷിക്കാനുള്ള ഘട്ടങ്ങൾ എന്തൊക്കെയാണ്"),
+    ("ml", "ഏതെല്ലാം രേഖകൾ വേണം"),
+    ("ta", "எனக்கு தகுதி உள்ளதா?"),
+    ("ta", "எப்படி விண்ணப்பிப்பது"),
+    ("ta", "என்ன ஆவணங்கள் தேவை"),
+    ("ta", "எனக்கு ஒரு புகார் உள்ளது"),
+]
+
+def legacy_respond(catalog_data: dict, message: str, lang: str):
+    """The previous implementation: rebuild the response table, then chained English checks."""
+    intent_responses = {entry["intent"]: dict(entry["responses"]) for entry in catalog_data["intents"]}
+    message_lower = message.lower()
+    intent = "general"
+    if "eligibility" in message_lower or "eligible" in message_lower:
+        intent = "eligibility_check"
+    elif "apply" in message_lower or "application" in message_lower or "step" in message_lower:
+        intent = "application_steps"
+    elif "document" in message_lower or "paper" in message_lower:
+        intent = "required_documents"
+    elif "complaint" in message_lower or "issue" in message_lower or "problem" in message_lower:
+        intent = "grievance_procedure"
+    response = intent_responses.get(intent, {}).get(lang, catalog_data["unsupported_language_response"])
+    if intent == "general":
+        response = catalog_data["general"].get(lang, catalog_data["general"]["en"])
+    return intent, response
+
+def throughput(fn, messages) -> float:
+    start = time.perf_counter()
+    for lang, message in messages:
+        fn(message, lang)
+    return len(messages) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark chat intent classification')
+    parser.add_argument('--messages', type=int, default=200000, help='Number of messages')
+    parser.add_argument('--catalog', default=None, help='Response catalog (defaults to CHAT_CATALOG_PATH)')
+    args = parser.parse_args()
+
+    engine = ChatEngine(args.catalog)
+    catalog = engine.catalog
+    with open(engine.path, encoding="utf-8") as f:
+        catalog_data = json.load(f)
+
+    rng = random.Random(0)
+    messages = [rng.choice(MESSAGES) for _ in range(args.messages)]
+
+    legacy_rate = throughput(lambda m, l: legacy_respond(catalog_data, m, l), messages)
+    engine_rate = throughput(lambda m, l: catalog.response(catalog.classify(m), l), messages)
+    cached_rate = throughput(engine.respond, messages)
+
+    non_english = [(lang, message) for lang, message in MESSAGES if lang != "en"]
+    legacy_hits = sum(legacy_respond(catalog_data, m, l)[0] != "general" for l, m in non_english)
+    engine_hits = sum(engine.respond(m, l)[0] != "general" for l, m in non_english)
+
+    print(f"{args.messages} messages, {len(catalog.intents)} intents, "
+          f"{len(catalog.matcher)} keyword forms")
+    print(f"Legacy:  {legacy_rate:12,.0f} messages/s, {legacy_hits}/{len(non_english)} non-English messages classified")
+    print(f"Engine:  {engine_rate:12,.0f} messages/s, {engine_hits}/{len(non_english)} non-English messages classified "
+          f"({engine_rate / legacy_rate:.1f}x)")
+    print(f"Cached:  {cached_rate:12,.0f} messages/s, hit rate {engine.cache.stats()['hit_rate']:.1%} "
+          f"({cached_rate / legacy_rate:.1f}x)")
+
+if __name__ == "__main__":
+    main()
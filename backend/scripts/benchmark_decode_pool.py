@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark end-to-end UNet throughput with and without the shared-memory decode pool
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+# Add the app and repository directories to the path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+import torch
+from models.unet_model import UNet
+from app.services.decode_pool_service import DecodePool
+from app.services.unet_service import preprocess_image
+from benchmark_tile_store import make_tile
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the decode pool')
+    parser.add_argument('--images', type=int, default=64, help='Number of images')
+    parser.add_argument('--source-size', type=int, default=2048, help='Size of the PNGs on disk')
+    parser.add_argument('--model-size', type=int, default=256, help='UNet input size')
+    parser.add_argument('--workers', type=int, default=2, help='Decode worker processes')
+    args = parser.parse_args()
+
+    torch.set_grad_enabled(False)
+    model = UNet(n_channels=3, n_classes=1).eval()
+    rng = np.random.default_rng(0)
+    workdir = tempfile.mkdtemp(prefix='karnan_decode_')
+    try:
+        paths = []
+        for i in range(args.images):
+            path = os.path.join(workdir, f'site_{i}.png')
+            cv2.imwrite(path, make_tile(rng, args.source_size))
+            paths.append(path)
+
+        model(torch.from_numpy(preprocess_image(make_tile(rng, 64), args.model_size)))  # warm up
+
+        start = time.perf_counter()
+        for path in paths:
+            image = cv2.cvtColor(cv2.imread(path), cv2.COLOR_BGR2RGB)
+            model(torch.from_numpy(preprocess_image(image, args.model_size)))
+        inline = args.images / (time.perf_counter() - start)
+
+        pool = DecodePool(workers=args.workers, image_size=args.model_size, batch_size=1)
+        try:
+            start = time.perf_counter()
+            for decoded in pool.imap(paths):
+                model(torch.from_numpy(decoded.tensor))
+            pooled = args.images / (time.perf_counter() - start)
+        finally:
+            pool.close()
+
+        print(f"{args.images} images {args.source_size}x{args.source_size} PNG -> UNet {args.model_size}x{args.model_size}, "
+              f"{os.cpu_count()} CPUs, {torch.get_num_threads()} torch threads")
+        print(f"Decode inline:           {inline:6.2f} images/s")
+        print(f"Decode pool ({args.workers} workers): {pooled:6.2f} images/s ({pooled / inline:.2f}x)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Benchmark the mask-to-geometry stage on a 1024x1024 UNet-style mask
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# Add the app directory to the path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.geometry_service import mask_to_geometry
+
+def make_rooftop_mask(size: int, arrays: int, seed: int = 0) -> np.ndarray:
+    """Binary mask with `arrays` rotated rectangular panel arrays."""
+    rng = np.random.default_rng(seed)
+    mask = np.zeros((size, size), np.uint8)
+    for _ in range(arrays):
+        center = tuple(rng.uniform(0.1, 0.9, 2) * size)
+        dims = tuple(rng.uniform(0.03, 0.15, 2) * size)
+        box = cv2.boxPoints((center, dims, float(rng.uniform(0, 90))))
+        cv2.fillPoly(mask, [box.astype(np.int32)], 1)
+    return mask
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark mask_to_geometry')
+    parser.add_argument('--size', type=int, default=1024, help='Mask size in pixels')
+    parser.add_argument('--arrays', type=int, default=12, help='Number of panel arrays in the mask')
+    parser.add_argument('--runs', type=int, default=50, help='Timed runs')
+    args = parser.parse_args()
+
+    mask = make_rooftop_mask(args.size, args.arrays)
+    gsd_m = 40.0 / args.size  # 20 m buffer radius either side of the site
+
+    mask_to_geometry(mask, gsd_m)  # warm up
+    timings = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        geometry = mask_to_geometry(mask, gsd_m)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings = np.array(timings)
+    print(f"Mask {args.size}x{args.size}, {args.arrays} arrays -> {geometry['panel_count']} panels, "
+          f"{geometry['pv_area_sqm']} m2, {geometry['capacity_kw']} kW")
+    print(f"mask_to_geometry: median {np.median(timings):.2f} ms, p95 {np.percentile(timings, 95):.2f} ms")
+
+if __name__ == "__main__":
+    main()
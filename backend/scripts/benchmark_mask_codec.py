@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark the mask codec: bytes per mask and encode/decode time at 1024x1024
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add the app directory to the path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.mask_service import encode_mask, decode_mask, COMPRESSIONS, ZSTD_AVAILABLE
+from benchmark_geometry import make_rooftop_mask
+
+def time_us(fn, runs: int) -> float:
+    """Median wall time of fn() in microseconds."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1e6)
+    return float(np.median(timings))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark mask encode/decode')
+    parser.add_argument('--size', type=int, default=1024, help='Mask size in pixels')
+    parser.add_argument('--arrays', type=int, default=12, help='Number of panel arrays in the mask')
+    parser.add_argument('--runs', type=int, default=50, help='Timed runs')
+    args = parser.parse_args()
+
+    masks = {
+        "rooftop": make_rooftop_mask(args.size, args.arrays).astype(bool),
+        "noise": np.random.default_rng(0).random((args.size, args.size)) > 0.7,
+    }
+    compressions = [c for c in COMPRESSIONS if c != "zstd" or ZSTD_AVAILABLE]
+
+    print(f"{'mask':<8} {'compression':<12} {'encoding':<8} {'bytes':>9} {'encode us':>10} {'decode us':>10}")
+    for name, mask in masks.items():
+        for compression in compressions:
+            payload = encode_mask(mask, compression)
+            assert np.array_equal(decode_mask(payload), mask)
+            size = len(json.dumps(payload))
+            encode_us = time_us(lambda: encode_mask(mask, compression), args.runs)
+            decode_us = time_us(lambda: decode_mask(payload), args.runs)
+            print(f"{name:<8} {compression:<12} {payload['encoding']:<8} {size:>9} {encode_us:>10.0f} {decode_us:>10.0f}")
+
+    # What storing the mask as a base64 PNG would cost instead
+    try:
+        import cv2
+        import base64
+        ok, png = cv2.imencode(".png", masks["rooftop"].astype(np.uint8) * 255)
+        print(f"base64 PNG of the rooftop mask: {len(base64.b64encode(png.tobytes()))} bytes")
+    except ImportError:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark batch tile reads: one PNG per site vs the memory-mapped tile store
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+# Add the app directory to the path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.tile_store_service import TileStore
+
+def make_tile(rng: np.random.Generator, size: int) -> np.ndarray:
+    """Rooftop-like RGB tile: flat roof, a panel grid and sensor noise."""
+    tile = np.full((size, size, 3), (173, 216, 230), np.uint8)
+    cv2.rectangle(tile, (size // 5, size // 3), (size * 4 // 5, size * 4 // 5), (42, 42, 165), -1)
+    for i in range(3):
+        for j in range(4):
+            x, y = size * 3 // 10 + i * 30, size // 2 + j * 20
+            cv2.rectangle(tile, (x, y), (x + 25, y + 15), (0, 0, 0), -1)
+    noise = rng.integers(0, 12, tile.shape, dtype=np.uint8)
+    return cv2.add(tile, noise)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark PNG files vs the tile store')
+    parser.add_argument('--tiles', type=int, default=1000, help='Number of sites')
+    parser.add_argument('--size', type=int, default=512, help='Tile size in pixels')
+    parser.add_argument('--batch', type=int, default=32, help='Inference batch size')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    workdir = tempfile.mkdtemp(prefix='karnan_tiles_')
+    try:
+        png_dir = os.path.join(workdir, 'images')
+        os.makedirs(png_dir)
+        store = TileStore.create(os.path.join(workdir, 'store'), (args.size, args.size, 3))
+        for i in range(args.tiles):
+            tile = make_tile(rng, args.size)
+            cv2.imwrite(os.path.join(png_dir, f'site_{i}_imagery.png'), tile)
+            store.put(f'site_{i}', tile)
+        store.flush()
+
+        png_bytes = sum(os.path.getsize(os.path.join(png_dir, f)) for f in os.listdir(png_dir))
+        store_bytes = args.tiles * args.size * args.size * 3
+
+        # Both paths build the same float32 batches an inference worker would
+        start = time.perf_counter()
+        checksum_png = 0.0
+        for offset in range(0, args.tiles, args.batch):
+            batch = np.stack([
+                cv2.imread(os.path.join(png_dir, f'site_{i}_imagery.png'))
+                for i in range(offset, min(offset + args.batch, args.tiles))
+            ])
+            checksum_png += float(batch.astype(np.float32).mean())
+        png_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        checksum_store = 0.0
+        reader = TileStore.open(store.root)
+        for _, batch in reader.iter_batches(args.batch):
+            checksum_store += float(batch.astype(np.float32).mean())
+        store_seconds = time.perf_counter() - start
+
+        print(f"{args.tiles} tiles of {args.size}x{args.size}, batch {args.batch}")
+        print(f"PNG files:  {png_bytes / 1e6:8.1f} MB on disk, {args.tiles / png_seconds:8.0f} tiles/s")
+        print(f"Tile store: {store_bytes / 1e6:8.1f} MB on disk, {args.tiles / store_seconds:8.0f} tiles/s "
+              f"({png_seconds / store_seconds:.1f}x)")
+        assert abs(checksum_png - checksum_store) < 1e-3 * max(1.0, checksum_png)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
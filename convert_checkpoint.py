@@ -0,0 +1,32 @@
+"""
+Convert solar panel detection checkpoints to the weights-only format
+"""
+
+import argparse
+import os
+import time
+from models.checkpoint import convert_checkpoint, load_checkpoint
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert model checkpoints to weights-only safetensors/state-dict files')
+    parser.add_argument('--weights', type=str, required=True, help='Path to the legacy checkpoint (full model or state dict)')
+    parser.add_argument('--output', type=str, help='Output path (.safetensors or .pt); defaults to the input path with a .safetensors extension')
+    parser.add_argument('--model', type=str, choices=['unet', 'yolov5'], help='Model type (if not specified, inferred from the checkpoint or filename)')
+
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.weights)[0] + '.safetensors'
+
+    print(f"Converting {args.weights} -> {output}...")
+    convert_checkpoint(args.weights, output, arch=args.model)
+
+    # Round-trip through the fast loader so a broken file is caught at conversion time
+    start = time.perf_counter()
+    model = load_checkpoint(output)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    params = sum(p.numel() for p in model.parameters())
+    print(f"Wrote {output} ({os.path.getsize(output) / (1024 * 1024):.1f} MB, {params:,} parameters)")
+    print(f"Loaded back as {type(model).__name__} in {elapsed_ms:.1f} ms")
+
+if __name__ == '__main__':
+    main()
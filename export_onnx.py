@@ -4,96 +4,209 @@ Export PyTorch models to ONNX format for solar panel detection
 
 import torch
 import argparse
+import inspect
 import os
+import pickle
+import numpy as np
 from models.unet_model import UNet
 from models.yolov5_model import YOLOv5
+from models.checkpoint import load_checkpoint, load_legacy_checkpoint
 
-def export_unet_to_onnx(weights_path, img_size, batch_size, device):
-    """Export U-Net model to ONNX format"""
-    print(f"Exporting U-Net model to ONNX...")
-    
-    # Initialize model
-    model = UNet(n_channels=3, n_classes=1)
-    
-    # Load weights
-    if os.path.exists(weights_path):
-        model.load_state_dict(torch.load(weights_path, map_location=device))
-        print(f"Loaded weights from {weights_path}")
-    else:
-        print(f"Warning: Weights file {weights_path} not found. Exporting untrained model.")
-    
-    model.eval()
-    
-    # Create dummy input
+# Opset 17 is the newest opset every supported torch release exports natively
+DEFAULT_OPSET = 17
+
+# Spatial dims must stay divisible by the network stride (UNet: 16, YOLOv5: 32)
+PARITY_STRIDE = 32
+
+def _export_kwargs():
+    """Extra torch.onnx.export arguments for the installed torch version"""
+    kwargs = {}
+    if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+        # Newer torch defaults to the torch.export based exporter, which ignores
+        # opsets below 18; keep the TorchScript exporter for consistent graphs
+        kwargs['dynamo'] = False
+    return kwargs
+
+def _export_to_onnx(model, onnx_path, img_size, batch_size, opset, output_axes):
+    """Trace `model` and write it to `onnx_path` with dynamic batch/height/width"""
     dummy_input = torch.randn(batch_size, 3, img_size[0], img_size[1])
-    
-    # Export to ONNX
-    onnx_path = weights_path.replace('.pth', '.onnx')
     torch.onnx.export(
         model,
         dummy_input,
         onnx_path,
         export_params=True,
-        opset_version=11,
+        opset_version=opset,
         do_constant_folding=True,
         input_names=['input'],
         output_names=['output'],
         dynamic_axes={
-            'input': {0: 'batch_size'},
-            'output': {0: 'batch_size'}
-        }
+            'input': {0: 'batch_size', 2: 'height', 3: 'width'},
+            'output': output_axes
+        },
+        **_export_kwargs()
     )
-    
+
+def simplify_onnx(onnx_path):
+    """
+    Clean up an exported graph in place.
+
+    Uses onnx-simplifier when installed, otherwise falls back to the
+    hardware-independent ONNX Runtime graph optimizations (constant folding,
+    redundant node elimination). Returns the name of the backend used, or
+    None if the graph was left as exported.
+    """
+    try:
+        import onnx
+        import onnxsim
+    except ImportError:
+        onnxsim = None
+
+    if onnxsim is not None:
+        model_simp, ok = onnxsim.simplify(onnx.load(onnx_path))
+        if not ok:
+            print("Warning: onnx-simplifier could not validate the simplified graph, keeping original")
+            return None
+        onnx.save(model_simp, onnx_path)
+        return 'onnxsim'
+
+    try:
+        import onnxruntime as ort
+    except ImportError:
+        print("Skipping graph simplification: neither onnxsim nor onnxruntime is installed "
+              "(pip install -r requirements-export.txt)")
+        return None
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_BASIC
+    optimized_path = onnx_path + '.opt'
+    options.optimized_model_filepath = optimized_path
+    ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+    os.replace(optimized_path, onnx_path)
+    return 'onnxruntime'
+
+def _parity_shapes(img_size, batch_size):
+    """Input shapes used by the parity check: the export shape plus a different batch and tile size"""
+    h, w = img_size
+    other_h = max(PARITY_STRIDE, (h // 2) // PARITY_STRIDE * PARITY_STRIDE)
+    other_w = max(PARITY_STRIDE, (w * 3 // 4) // PARITY_STRIDE * PARITY_STRIDE)
+    return [(batch_size, 3, h, w), (batch_size + 1, 3, other_h, other_w)]
+
+def check_onnx_parity(model, onnx_path, img_size, batch_size, rtol=1e-3, atol=1e-4, seed=0):
+    """
+    Compare PyTorch and ONNX Runtime outputs on random inputs.
+
+    Runs the export shape and a second shape with a different batch size and
+    spatial size so a graph that silently baked in a fixed shape is caught.
+
+    Returns:
+        True if every output matches within tolerance, None if onnxruntime is
+        not installed and the check was skipped
+    """
+    try:
+        import onnxruntime as ort
+    except ImportError:
+        print("Skipping the parity check: onnxruntime is not installed (pip install -r requirements-export.txt)")
+        return None
+
+    session = ort.InferenceSession(onnx_path, providers=['CPUExecutionProvider'])
+    input_name = session.get_inputs()[0].name
+    generator = torch.Generator().manual_seed(seed)
+    passed = True
+
+    for shape in _parity_shapes(img_size, batch_size):
+        x = torch.randn(*shape, generator=generator)
+        with torch.no_grad():
+            torch_outputs = model(x)
+        if isinstance(torch_outputs, torch.Tensor):
+            torch_outputs = [torch_outputs]
+        else:
+            torch_outputs = [torch_outputs[0]]
+        onnx_outputs = session.run(None, {input_name: x.numpy()})
+
+        for expected, actual in zip(torch_outputs, onnx_outputs):
+            expected = expected.numpy()
+            if expected.shape != actual.shape:
+                print(f"  Parity FAILED for input {shape}: shape {actual.shape} != {expected.shape}")
+                passed = False
+                continue
+            max_diff = float(np.max(np.abs(expected - actual))) if expected.size else 0.0
+            ok = np.allclose(expected, actual, rtol=rtol, atol=atol)
+            print(f"  Parity {'OK' if ok else 'FAILED'} for input {shape}: max abs diff {max_diff:.2e}")
+            passed = passed and ok
+
+    return passed
+
+def _load_model(arch, weights_path, device, untrained):
+    """Load `weights_path`, building whichever layout the checkpoint was trained with"""
+    if not os.path.exists(weights_path):
+        print(f"Warning: Weights file {weights_path} not found. Exporting untrained model.")
+        return untrained()
+    try:
+        # Weights-only .safetensors/.pt checkpoints and plain state dicts
+        model = load_checkpoint(weights_path, device, arch=arch)
+    except (pickle.UnpicklingError, RuntimeError):
+        # Full pickled model objects from the training notebook
+        model = load_legacy_checkpoint(weights_path, device, arch=arch)
+    print(f"Loaded weights from {weights_path}")
+    return model
+
+def _finalize(model, onnx_path, img_size, batch_size, simplify, check):
+    if simplify:
+        backend = simplify_onnx(onnx_path)
+        if backend:
+            print(f"Simplified graph with {backend}")
+    if check:
+        print("Checking PyTorch vs ONNX Runtime parity...")
+        if check_onnx_parity(model, onnx_path, img_size, batch_size) is False:
+            raise RuntimeError(f"ONNX parity check failed for {onnx_path}")
+    return onnx_path
+
+def export_unet_to_onnx(weights_path, img_size, batch_size, device,
+                        opset=DEFAULT_OPSET, simplify=True, check=True):
+    """Export U-Net model to ONNX format"""
+    print(f"Exporting U-Net model to ONNX (opset {opset})...")
+
+    # Initialize model with the layout stored in the checkpoint
+    model = _load_model('unet', weights_path, device, lambda: UNet(n_channels=3, n_classes=1))
+    model.eval()
+
+    # Export to ONNX; the UNet is fully convolutional so the output follows the input size
+    onnx_path = os.path.splitext(weights_path)[0] + '.onnx'
+    _export_to_onnx(model, onnx_path, img_size, batch_size, opset,
+                    output_axes={0: 'batch_size', 2: 'height', 3: 'width'})
+
     print(f"U-Net model exported to {onnx_path}")
+    return _finalize(model, onnx_path, img_size, batch_size, simplify, check)
 
-def export_yolov5_to_onnx(weights_path, img_size, batch_size, device):
+def export_yolov5_to_onnx(weights_path, img_size, batch_size, device,
+                          opset=DEFAULT_OPSET, simplify=True, check=True):
     """Export YOLOv5 model to ONNX format"""
-    print(f"Exporting YOLOv5 model to ONNX...")
-    
+    print(f"Exporting YOLOv5 model to ONNX (opset {opset})...")
+
     # Initialize model
-    model = YOLOv5(nc=1)  # 1 class for solar panels
-    
-    # Load weights
-    if os.path.exists(weights_path):
-        model.load_state_dict(torch.load(weights_path, map_location=device))
-        print(f"Loaded weights from {weights_path}")
-    else:
-        print(f"Warning: Weights file {weights_path} not found. Exporting untrained model.")
-    
+    model = _load_model('yolov5', weights_path, device, lambda: YOLOv5(nc=1))  # 1 class for solar panels
     model.eval()
-    
-    # Create dummy input
-    dummy_input = torch.randn(batch_size, 3, img_size[0], img_size[1])
-    
-    # Export to ONNX
-    onnx_path = weights_path.replace('.pth', '.onnx')
-    torch.onnx.export(
-        model,
-        dummy_input,
-        onnx_path,
-        export_params=True,
-        opset_version=11,
-        do_constant_folding=True,
-        input_names=['input'],
-        output_names=['output'],
-        dynamic_axes={
-            'input': {0: 'batch_size'},
-            'output': {0: 'batch_size'}
-        }
-    )
-    
+
+    # Export to ONNX; the number of predictions scales with the input area
+    onnx_path = os.path.splitext(weights_path)[0] + '.onnx'
+    _export_to_onnx(model, onnx_path, img_size, batch_size, opset,
+                    output_axes={0: 'batch_size', 1: 'num_predictions'})
+
     print(f"YOLOv5 model exported to {onnx_path}")
+    return _finalize(model, onnx_path, img_size, batch_size, simplify, check)
 
 def main():
     parser = argparse.ArgumentParser(description='Export solar panel detection models to ONNX')
-    parser.add_argument('--weights', type=str, required=True, help='Path to the model weights (.pth file)')
-    parser.add_argument('--img', nargs=2, type=int, default=[512, 512], help='Image size (height width)')
-    parser.add_argument('--batch', type=int, default=1, help='Batch size')
+    parser.add_argument('--weights', type=str, required=True, help='Path to the model weights (.pth, .pt or .safetensors file)')
+    parser.add_argument('--img', nargs=2, type=int, default=[512, 512], help='Trace image size (height width); the exported graph accepts any size')
+    parser.add_argument('--batch', type=int, default=1, help='Trace batch size; the exported graph accepts any batch size')
     parser.add_argument('--device', type=str, default='cpu', help='Device to use (cpu or cuda)')
     parser.add_argument('--model', type=str, choices=['unet', 'yolov5'], help='Model type (if not specified, inferred from filename)')
-    
+    parser.add_argument('--opset', type=int, default=DEFAULT_OPSET, help='ONNX opset version')
+    parser.add_argument('--no-simplify', action='store_true', help='Skip graph simplification')
+    parser.add_argument('--no-check', action='store_true', help='Skip the PyTorch vs ONNX Runtime parity check')
+
     args = parser.parse_args()
-    
+
     # Determine model type
     if args.model:
         model_type = args.model
@@ -105,12 +218,14 @@ def main():
             model_type = 'yolov5'
         else:
             raise ValueError("Could not infer model type from filename. Please specify --model")
-    
+
+    options = dict(opset=args.opset, simplify=not args.no_simplify, check=not args.no_check)
+
     # Export model
     if model_type == 'unet':
-        export_unet_to_onnx(args.weights, args.img, args.batch, args.device)
+        export_unet_to_onnx(args.weights, args.img, args.batch, args.device, **options)
     elif model_type == 'yolov5':
-        export_yolov5_to_onnx(args.weights, args.img, args.batch, args.device)
+        export_yolov5_to_onnx(args.weights, args.img, args.batch, args.device, **options)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
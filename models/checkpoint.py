@@ -0,0 +1,271 @@
+"""
+Weights-only checkpoints for the solar panel detection models
+
+Checkpoints store only tensors plus a small architecture description, so
+loading never unpickles arbitrary objects. Two layouts are supported:
+
+- ``.safetensors``: read through a private (copy-on-write) mmap, so every
+  worker process on a host shares the same page-cache pages for the weights
+- ``.pt`` / ``.pth``: a ``{"arch", "config", "state_dict"}`` dict that
+  ``torch.load(..., weights_only=True, mmap=True)`` can open
+
+Legacy checkpoints that pickle the whole model object (``torch.save(model)``
+from a training notebook) can be converted once with ``convert_checkpoint``.
+Both UNet layouts (this repo's and the one trained in ``Model training files/``)
+load into the single parametrized ``models.unet_model.UNet``.
+"""
+
+import json
+import mmap
+import os
+import pickle
+import struct
+
+import torch
+
+from models import unet_model, yolov5_model
+from models.unet_model import UNet, infer_unet_config, remap_unet_state_dict
+from models.yolov5_model import YOLOv5
+
+ARCHITECTURES = {
+    'unet': UNet,
+    'yolov5': YOLOv5,
+}
+
+_SAFETENSORS_DTYPES = {
+    'F64': torch.float64,
+    'F32': torch.float32,
+    'F16': torch.float16,
+    'BF16': torch.bfloat16,
+    'I64': torch.int64,
+    'I32': torch.int32,
+    'I16': torch.int16,
+    'I8': torch.int8,
+    'U8': torch.uint8,
+    'BOOL': torch.bool,
+}
+
+
+def model_config(model):
+    """Return (arch, config) describing how to rebuild `model`"""
+    if isinstance(model, UNet):
+        # Shapes rather than attributes: models unpickled from the legacy
+        # training script predate the conv_bias/halve_mid_channels options
+        return 'unet', infer_unet_config(model.state_dict())
+    if isinstance(model, YOLOv5):
+        return 'yolov5', {'nc': model.nc, 'anchors': model.anchors}
+    raise ValueError(f"Unsupported model type: {type(model).__name__}")
+
+
+def build_model(arch, config=None):
+    """Instantiate an untrained model from an architecture name and config"""
+    if arch not in ARCHITECTURES:
+        raise ValueError(f"Unknown architecture '{arch}'. Expected one of: {', '.join(ARCHITECTURES)}")
+    config = dict(config or {})
+    if arch == 'unet':
+        config.setdefault('n_channels', 3)
+        config.setdefault('n_classes', 1)
+    return ARCHITECTURES[arch](**config)
+
+
+def save_checkpoint(model, path, arch=None, config=None):
+    """
+    Save model weights in a weights-only format chosen by file extension.
+
+    Args:
+        model: Model (or state dict) to save
+        path: Destination ``.safetensors`` or ``.pt``/``.pth`` file
+        arch: Architecture name; inferred from `model` when omitted
+        config: Constructor kwargs; inferred from `model` when omitted
+
+    Returns:
+        The destination path
+    """
+    if isinstance(model, torch.nn.Module):
+        if arch is None or config is None:
+            inferred_arch, inferred_config = model_config(model)
+            arch = arch or inferred_arch
+            config = inferred_config if config is None else config
+        state_dict = model.state_dict()
+    else:
+        state_dict = model
+    if arch is None:
+        raise ValueError("arch is required when saving a bare state dict")
+
+    state_dict = {name: tensor.detach().cpu().contiguous() for name, tensor in state_dict.items()}
+    config = config or {}
+
+    if path.endswith('.safetensors'):
+        try:
+            from safetensors.torch import save_file
+        except ImportError as e:
+            raise ImportError("Writing .safetensors checkpoints requires the 'safetensors' package") from e
+        # safetensors refuses tensors that share storage, e.g. tied buffers
+        state_dict = {name: tensor.clone() for name, tensor in state_dict.items()}
+        save_file(state_dict, path, metadata={'arch': arch, 'config': json.dumps(config)})
+    else:
+        torch.save({'arch': arch, 'config': config, 'state_dict': state_dict}, path)
+    return path
+
+
+def _read_safetensors(path):
+    """Map a .safetensors file and return (tensors, metadata) without copying"""
+    with open(path, 'rb') as f:
+        # ACCESS_COPY is a private mapping: pages stay shared with the page
+        # cache (and every other process) until something writes to them
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    header_len = struct.unpack('<Q', buffer[:8])[0]
+    header = json.loads(buffer[8:8 + header_len])
+    metadata = header.pop('__metadata__', None) or {}
+    data_start = 8 + header_len
+
+    tensors = {}
+    for name, info in header.items():
+        dtype = _SAFETENSORS_DTYPES[info['dtype']]
+        start, end = info['data_offsets']
+        count = (end - start) // dtype.itemsize
+        if count == 0:
+            tensor = torch.empty(0, dtype=dtype)
+        else:
+            tensor = torch.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + start)
+        tensors[name] = tensor.view(info['shape'])
+    return tensors, metadata
+
+
+def load_state_dict(path, map_location='cpu'):
+    """
+    Load a weights-only checkpoint.
+
+    Returns:
+        Tuple of (state_dict, arch, config); arch is None for plain state dicts
+    """
+    if path.endswith('.safetensors'):
+        state_dict, metadata = _read_safetensors(path)
+        arch = metadata.get('arch')
+        config = json.loads(metadata.get('config', '{}'))
+        if str(map_location) != 'cpu':
+            state_dict = {name: tensor.to(map_location) for name, tensor in state_dict.items()}
+        return state_dict, arch, config
+
+    checkpoint = torch.load(path, map_location=map_location, weights_only=True, mmap=True)
+    if isinstance(checkpoint, dict) and 'state_dict' in checkpoint and 'arch' in checkpoint:
+        return checkpoint['state_dict'], checkpoint['arch'], checkpoint.get('config', {})
+    return checkpoint, None, {}
+
+
+def _resolve_layout(state_dict, arch, config):
+    """
+    Normalise checkpoint keys and work out which architecture/config they fit.
+
+    UNet configs are always derived from the tensor shapes, so either UNet
+    checkpoint layout loads into the single parametrized `UNet`.
+    """
+    if arch in (None, 'unet'):
+        state_dict = remap_unet_state_dict(state_dict)
+    if arch is None:
+        if 'inc.double_conv.0.weight' in state_dict:
+            arch = 'unet'
+        elif 'detect.anchors' in state_dict:
+            arch = 'yolov5'
+        else:
+            raise ValueError("Could not infer the architecture from the checkpoint keys; pass arch explicitly")
+    if arch == 'unet' and config is None:
+        config = infer_unet_config(state_dict)
+    return state_dict, arch, config or {}
+
+
+def _build_loaded_model(state_dict, arch, config, device):
+    # Build on the meta device: skips random initialisation of every weight,
+    # which otherwise costs more than mapping the checkpoint itself
+    with torch.device('meta'):
+        model = build_model(arch, config)
+    model.load_state_dict(state_dict, assign=True)
+    model.to(device)
+    model.eval()
+    return model
+
+
+def load_checkpoint(path, device='cpu', arch=None, config=None):
+    """
+    Build a model from a weights-only checkpoint, ready for inference.
+
+    Tensors are assigned into the model rather than copied, so on CPU the
+    parameters stay backed by the mmap of the checkpoint file.
+    """
+    state_dict, saved_arch, saved_config = load_state_dict(path, map_location=device)
+    arch = arch or saved_arch
+    if config is None and arch != 'unet' and saved_arch is not None:
+        config = saved_config
+    state_dict, arch, config = _resolve_layout(state_dict, arch, config)
+    return _build_loaded_model(state_dict, arch, config, device)
+
+
+class _LegacyUnpickler(pickle.Unpickler):
+    """Resolve classes pickled from a training script to the definitions in `models`"""
+
+    _classes = {
+        name: getattr(module, name)
+        for module in (unet_model, yolov5_model)
+        for name in dir(module)
+        if isinstance(getattr(module, name), type)
+    }
+
+    def find_class(self, module, name):
+        if module in ('__main__', 'inference_script') and name in self._classes:
+            return self._classes[name]
+        return super().find_class(module, name)
+
+
+class _legacy_pickle:
+    """Minimal pickle-module shim accepted by torch.load(pickle_module=...)"""
+    Unpickler = _LegacyUnpickler
+    load = staticmethod(lambda f, **kwargs: _LegacyUnpickler(f, **kwargs).load())
+    __name__ = 'pickle'
+
+
+def _read_legacy_checkpoint(src, arch=None, config=None):
+    """Unpickle a legacy checkpoint and return (state_dict, arch, config)"""
+    checkpoint = torch.load(src, map_location='cpu', weights_only=False, pickle_module=_legacy_pickle)
+
+    if isinstance(checkpoint, torch.nn.Module):
+        if arch is None or config is None:
+            inferred_arch, inferred_config = model_config(checkpoint)
+            arch = arch or inferred_arch
+            config = inferred_config if config is None else config
+        state_dict = checkpoint.state_dict()
+    elif isinstance(checkpoint, dict) and 'state_dict' in checkpoint:
+        state_dict = checkpoint['state_dict']
+    else:
+        state_dict = checkpoint
+
+    if arch is None:
+        name = os.path.basename(src).lower()
+        arch = 'unet' if 'unet' in name else 'yolov5' if 'yolo' in name else None
+    return _resolve_layout(state_dict, arch, config)
+
+
+def load_legacy_checkpoint(src, device='cpu', arch=None, config=None):
+    """
+    Load a legacy checkpoint (pickled full model or plain state dict) into the
+    architectures from `models`.
+
+    Only use with checkpoints from a trusted source: this executes pickle.
+    Prefer converting once with `convert_checkpoint` and using `load_checkpoint`.
+    """
+    state_dict, arch, config = _read_legacy_checkpoint(src, arch, config)
+    return _build_loaded_model(state_dict, arch, config, device)
+
+
+def convert_checkpoint(src, dst, arch=None, config=None):
+    """
+    Convert a legacy checkpoint to a weights-only checkpoint.
+
+    `src` may be a pickled full model object or a plain state dict. The full
+    model is only unpickled here, once, instead of in every serving process.
+
+    Only convert checkpoints from a trusted source: reading the legacy format
+    executes pickle.
+    """
+    state_dict, arch, config = _read_legacy_checkpoint(src, arch, config)
+    return save_checkpoint(state_dict, dst, arch=arch, config=config)
@@ -0,0 +1,64 @@
+"""
+Test-time augmentation for the segmentation models
+
+All augmented views of a batch are stacked into one tensor so the model runs a
+single batched forward pass; the outputs are mapped back to the original
+orientation and the probabilities averaged.
+"""
+
+import torch
+
+# (quarter turns, horizontal flip) for each view
+TTA_MODES = {
+    # identity, horizontal flip, vertical flip (= rot180 + hflip), rot180
+    'flip': [(0, False), (0, True), (2, True), (2, False)],
+    # the full dihedral group: 4 rotations, each with and without a flip
+    'd4': [(k, flip) for k in range(4) for flip in (False, True)],
+}
+
+
+def _views_for(mode, height, width):
+    if mode not in TTA_MODES:
+        raise ValueError(f"Unknown TTA mode '{mode}'. Expected one of: {', '.join(TTA_MODES)}")
+    views = TTA_MODES[mode]
+    if height != width:
+        # Quarter turns swap H and W, so they can't share a batch with the other views
+        views = [(k, flip) for k, flip in views if k % 2 == 0]
+    return views
+
+
+def _augment(x, k, flip):
+    if flip:
+        x = torch.flip(x, dims=(-1,))
+    return torch.rot90(x, k, dims=(-2, -1)) if k else x
+
+
+def _deaugment(y, k, flip):
+    if k:
+        y = torch.rot90(y, -k, dims=(-2, -1))
+    return torch.flip(y, dims=(-1,)) if flip else y
+
+
+def tta_predict(model, images, mode='d4'):
+    """
+    Run `model` on every augmented view of `images` in one forward pass.
+
+    Args:
+        model: Segmentation model returning logits shaped like the input
+        images: Input batch (N, C, H, W)
+        mode: Key of TTA_MODES
+
+    Returns:
+        Tuple of (probabilities averaged over views (N, classes, H, W), number of views)
+    """
+    n = images.shape[0]
+    views = _views_for(mode, images.shape[-2], images.shape[-1])
+    batch = torch.cat([_augment(images, k, flip) for k, flip in views], dim=0)
+
+    with torch.no_grad():
+        probabilities = torch.sigmoid(model(batch))
+
+    merged = torch.zeros_like(probabilities[:n])
+    for i, (k, flip) in enumerate(views):
+        merged += _deaugment(probabilities[i * n:(i + 1) * n], k, flip)
+    return merged / len(views), len(views)
@@ -10,15 +10,15 @@ import torch.nn.functional as F
 class DoubleConv(nn.Module):
     """(convolution => [BN] => ReLU) * 2"""
 
-    def __init__(self, in_channels, out_channels, mid_channels=None):
+    def __init__(self, in_channels, out_channels, mid_channels=None, bias=False):
         super().__init__()
         if not mid_channels:
             mid_channels = out_channels
         self.double_conv = nn.Sequential(
-            nn.Conv2d(in_channels, mid_channels, kernel_size=3, padding=1, bias=False),
+            nn.Conv2d(in_channels, mid_channels, kernel_size=3, padding=1, bias=bias),
             nn.BatchNorm2d(mid_channels),
             nn.ReLU(inplace=True),
-            nn.Conv2d(mid_channels, out_channels, kernel_size=3, padding=1, bias=False),
+            nn.Conv2d(mid_channels, out_channels, kernel_size=3, padding=1, bias=bias),
             nn.BatchNorm2d(out_channels),
             nn.ReLU(inplace=True)
         )
@@ -30,11 +30,11 @@ class DoubleConv(nn.Module):
 class Down(nn.Module):
     """Downscaling with maxpool then double conv"""
 
-    def __init__(self, in_channels, out_channels):
+    def __init__(self, in_channels, out_channels, bias=False):
         super().__init__()
         self.maxpool_conv = nn.Sequential(
             nn.MaxPool2d(2),
-            DoubleConv(in_channels, out_channels)
+            DoubleConv(in_channels, out_channels, bias=bias)
         )
 
     def forward(self, x):
@@ -44,16 +44,17 @@ class Down(nn.Module):
 class Up(nn.Module):
     """Upscaling then double conv"""
 
-    def __init__(self, in_channels, out_channels, bilinear=True):
+    def __init__(self, in_channels, out_channels, bilinear=True, bias=False, halve_mid_channels=True):
         super().__init__()
 
         # if bilinear, use the normal convolutions to reduce the number of channels
         if bilinear:
             self.up = nn.Upsample(scale_factor=2, mode='bilinear', align_corners=True)
-            self.conv = DoubleConv(in_channels, out_channels, in_channels // 2)
+            mid_channels = in_channels // 2 if halve_mid_channels else None
+            self.conv = DoubleConv(in_channels, out_channels, mid_channels, bias=bias)
         else:
             self.up = nn.ConvTranspose2d(in_channels, in_channels // 2, kernel_size=2, stride=2)
-            self.conv = DoubleConv(in_channels, out_channels)
+            self.conv = DoubleConv(in_channels, out_channels, bias=bias)
 
     def forward(self, x1, x2):
         x1 = self.up(x1)
@@ -79,25 +80,44 @@ class OutConv(nn.Module):
         return self.conv(x)
 
 
+# Named presets for the checkpoint layouts we ship:
+# - standard: this module's original network (bias-free convs, transposed-conv upsampling)
+# - legacy: the network trained in `Model training files/` (biased convs, bilinear
+#   upsampling, decoder DoubleConvs without the halved middle width)
+UNET_LAYOUTS = {
+    'standard': {'bilinear': False, 'conv_bias': False, 'halve_mid_channels': True},
+    'legacy': {'bilinear': True, 'conv_bias': True, 'halve_mid_channels': False},
+}
+
+
 class UNet(nn.Module):
-    def __init__(self, n_channels, n_classes, bilinear=False):
+    def __init__(self, n_channels, n_classes, bilinear=False, conv_bias=False, halve_mid_channels=True):
         super(UNet, self).__init__()
         self.n_channels = n_channels
         self.n_classes = n_classes
         self.bilinear = bilinear
+        self.conv_bias = conv_bias
+        self.halve_mid_channels = halve_mid_channels
 
-        self.inc = DoubleConv(n_channels, 64)
-        self.down1 = Down(64, 128)
-        self.down2 = Down(128, 256)
-        self.down3 = Down(256, 512)
+        self.inc = DoubleConv(n_channels, 64, bias=conv_bias)
+        self.down1 = Down(64, 128, conv_bias)
+        self.down2 = Down(128, 256, conv_bias)
+        self.down3 = Down(256, 512, conv_bias)
         factor = 2 if bilinear else 1
-        self.down4 = Down(512, 1024 // factor)
-        self.up1 = Up(1024, 512 // factor, bilinear)
-        self.up2 = Up(512, 256 // factor, bilinear)
-        self.up3 = Up(256, 128 // factor, bilinear)
-        self.up4 = Up(128, 64, bilinear)
+        self.down4 = Down(512, 1024 // factor, conv_bias)
+        self.up1 = Up(1024, 512 // factor, bilinear, conv_bias, halve_mid_channels)
+        self.up2 = Up(512, 256 // factor, bilinear, conv_bias, halve_mid_channels)
+        self.up3 = Up(256, 128 // factor, bilinear, conv_bias, halve_mid_channels)
+        self.up4 = Up(128, 64, bilinear, conv_bias, halve_mid_channels)
         self.outc = OutConv(64, n_classes)
 
+    @classmethod
+    def from_layout(cls, layout='standard', n_channels=3, n_classes=1):
+        """Build a UNet from one of the named UNET_LAYOUTS presets"""
+        if layout not in UNET_LAYOUTS:
+            raise ValueError(f"Unknown UNet layout '{layout}'. Expected one of: {', '.join(UNET_LAYOUTS)}")
+        return cls(n_channels, n_classes, **UNET_LAYOUTS[layout])
+
     def forward(self, x):
         x1 = self.inc(x)
         x2 = self.down1(x1)
@@ -109,4 +129,55 @@ class UNet(nn.Module):
         x = self.up3(x, x2)
         x = self.up4(x, x1)
         logits = self.outc(x)
-        return logits
\ No newline at end of file
+        return logits
+
+
+# Prefixes added by nn.DataParallel / DistributedDataParallel and torch.compile
+_STATE_DICT_PREFIXES = ('module.', '_orig_mod.')
+
+
+def remap_unet_state_dict(state_dict):
+    """Strip wrapper prefixes so checkpoints saved from wrapped models load into UNet"""
+    remapped = {}
+    for key, value in state_dict.items():
+        stripped = True
+        while stripped:
+            stripped = False
+            for prefix in _STATE_DICT_PREFIXES:
+                if key.startswith(prefix):
+                    key = key[len(prefix):]
+                    stripped = True
+        remapped[key] = value
+    return remapped
+
+
+def infer_unet_config(state_dict):
+    """
+    Recover the UNet constructor arguments from a (remapped) state dict.
+
+    Works from tensor shapes and key names only, so it covers both shipped
+    layouts and any mix of their options.
+
+    Raises:
+        ValueError: for the training script's bilinear=False layout, whose
+            ConvTranspose2d(in // 2, in // 2) up-sampling takes half the
+            channels its encoder produces, so no UNet can run those weights
+    """
+    bilinear = 'up1.up.weight' not in state_dict
+    if not bilinear and state_dict['up1.up.weight'].shape[0] != state_dict['up1.conv.double_conv.0.weight'].shape[1]:
+        raise ValueError(
+            "Checkpoint uses the legacy training-script UNet layout with bilinear=False "
+            "(ConvTranspose2d(in_channels // 2, in_channels // 2) up-sampling). That decoder "
+            "expects half the channels the encoder produces and cannot run; retrain with "
+            "bilinear=True ('legacy' layout) or the 'standard' layout"
+        )
+    up1_mid = state_dict['up1.conv.double_conv.0.weight'].shape[0]
+    up1_out = state_dict['up1.conv.double_conv.3.weight'].shape[0]
+    return {
+        'n_channels': state_dict['inc.double_conv.0.weight'].shape[1],
+        'n_classes': state_dict['outc.conv.weight'].shape[0],
+        'bilinear': bilinear,
+        'conv_bias': 'inc.double_conv.0.bias' in state_dict,
+        # Only bilinear decoders have a choice of middle width
+        'halve_mid_channels': up1_mid != up1_out if bilinear else True,
+    }